@@ -0,0 +1,89 @@
+##############################################
+# Title: Backfill Benchmark Script
+# Author: Christopher Romanillos
+# Description: Runs a month-sliced backfill
+# against the mock server, interrupts it and
+# resumes it from the manifest checkpoints.
+# Usage (from src/):
+#   python -m benchmarks.bench_backfill --symbols 5 --months 24 --interrupt-after 30
+# ! WITH --database-url ROWS ARE UPSERTED INTO
+# intraday_data; OTHERWISE THEY ARE ONLY COUNTED !
+# Date: 03/01/25
+# Version: 1.1
+##############################################
+import time
+import logging
+import argparse
+import tempfile
+from pathlib import Path
+from datetime import datetime
+from benchmarks.mock_server import MockAlphaVantage
+from utils.manifest import FileManifest
+from utils.backfill import backfill_slices, run_backfill
+
+REQUIRED_FIELDS = ["1. open", "2. high", "3. low", "4. close", "5. volume"]
+
+class SimulatedCrash(Exception):
+    """Raised by the loader to fail every slice after the first few."""
+
+def make_loader(database_url, interrupt_after=None):
+    """Loader callback: upsert into Postgres, or just count rows without a database."""
+    state = {"slices": 0}
+    if database_url:
+        from sqlalchemy import create_engine
+        from utils.db_loader import upsert_records
+        engine = create_engine(database_url)
+
+    def load_slice(symbol, interval, batch):
+        if interrupt_after is not None and state["slices"] >= interrupt_after:
+            raise SimulatedCrash("simulated crash")
+        state["slices"] += 1
+        if database_url:
+            counts = upsert_records(engine, batch, symbol=symbol, interval=interval)
+            return counts['inserted'] + counts['updated']
+        return len(batch)
+
+    return load_slice
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark and resume a month-sliced backfill.")
+    parser.add_argument("--symbols", type=int, default=5)
+    parser.add_argument("--months", type=int, default=24)
+    parser.add_argument("--bars", type=int, default=2000, help="Bars per monthly response.")
+    parser.add_argument("--rpm", type=int, default=600, help="Token bucket requests per minute.")
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--latency", type=float, default=0.05, help="Mock server latency (s).")
+    parser.add_argument("--interrupt-after", type=int, default=30, help="Slices loaded before the simulated crash.")
+    parser.add_argument("--database-url", help="Upsert into this Postgres instead of counting rows.")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.WARNING)
+
+    symbols = [f"SYM{i:04d}" for i in range(args.symbols)]
+    end = datetime(2024, 12, 1)
+    first = end.year * 12 + end.month - 1 - (args.months - 1)
+    slices = backfill_slices(symbols, ["5min"], datetime(first // 12, first % 12 + 1, 1), end)
+
+    with MockAlphaVantage(args.bars, args.latency) as mock, tempfile.TemporaryDirectory() as workdir:
+        config = {
+            'api': {
+                'endpoint': mock.endpoint,
+                'timeout': 10,
+                'rate_limit': {'requests_per_minute': args.rpm, 'burst': args.concurrency},
+                'retry': {'max_attempts': 5, 'backoff_base': 0.2, 'backoff_max': 2},
+            },
+            'backfill': {'concurrency': args.concurrency, 'queue_size': 8},
+            'required_fields': REQUIRED_FIELDS,
+        }
+        with FileManifest(Path(workdir) / 'manifest.db') as manifest:
+            for label, loader in (
+                ("first run (fails)", make_loader(args.database_url, args.interrupt_after)),
+                ("resumed run", make_loader(args.database_url)),
+                ("rerun", make_loader(args.database_url)),
+            ):
+                requests_before = mock.requests
+                begin = time.perf_counter()
+                summary = run_backfill(config, 'demo', slices, loader, manifest)
+                elapsed = time.perf_counter() - begin
+                print(f"{label:>20}: {summary['loaded']:>4} slices loaded, {summary['already_done']:>4} already done, "
+                      f"{summary['failed']:>4} failed, {summary['rows']:>8} rows, "
+                      f"{mock.requests - requests_before:>4} requests in {elapsed:.2f}s")
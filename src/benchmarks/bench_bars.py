@@ -0,0 +1,90 @@
+##############################################
+# Title: Bar Representation Benchmark Script
+# Author: Christopher Romanillos
+# Description: Memory held between transform
+# and load per bar representation (record dicts,
+# dicts through a JSON handoff, BarBatch arrays)
+# and the time to transform and COPY-encode them.
+# Usage (from src/):
+#   python -m benchmarks.bench_bars --bars 100000 1000000
+# Date: 04/19/25
+# Version: 1.0
+##############################################
+import gc
+import json
+import time
+import argparse
+import tracemalloc
+import multiprocessing
+from datetime import datetime
+from benchmarks.synthetic import make_intraday_payload
+from benchmarks.suite import _NullCopyCursor
+from utils.payloads import get_descriptor
+from utils.data_validation import transform_time_series
+from utils.bar_batch import transform_batch
+from utils.db_loader import stage_rows
+
+DESCRIPTOR = get_descriptor('TIME_SERIES_INTRADAY', '1min')
+
+def build_dicts(series):
+    return transform_time_series(series, descriptor=DESCRIPTOR)[0]
+
+def build_json_handoff(series):
+    # Processed JSON file written by transform and read back by load_data
+    return json.loads(json.dumps(transform_time_series(series, descriptor=DESCRIPTOR)[0], default=str))
+
+def build_batch(series):
+    return transform_batch(series, "IBM", "1min", DESCRIPTOR)[0]
+
+MODES = {"dicts": build_dicts, "json_handoff": build_json_handoff, "bar_batch": build_batch}
+
+def run_mode(mode, bars):
+    """Measure one representation in this (fresh) process."""
+    series = make_intraday_payload("IBM", bars, interval="1min", seed=1)["Time Series (1min)"]
+    build = MODES[mode]
+    cursor = _NullCopyCursor()
+    created_at = datetime.utcnow()
+
+    # Timing, without tracemalloc overhead
+    start = time.perf_counter()
+    data = build(series)
+    built = time.perf_counter()
+    stage_rows(cursor, data, created_at, symbol="IBM", interval="1min")
+    encoded = time.perf_counter()
+    del data
+    gc.collect()
+
+    # Memory: bytes still held by the representation once built, and peak while encoding it
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    data = build(series)
+    held = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.reset_peak()
+    stage_rows(cursor, data, created_at, symbol="IBM", interval="1min")
+    encode_peak = tracemalloc.get_traced_memory()[1] - before
+    tracemalloc.stop()
+
+    return {
+        "mode": mode,
+        "bars": len(data),
+        "held_mb": held / 2 ** 20,
+        "bytes_per_bar": held / len(data),
+        "encode_peak_mb": encode_peak / 2 ** 20,
+        "transform_s": built - start,
+        "encode_s": encoded - built,
+    }
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark memory of bar representations between transform and load.")
+    parser.add_argument("--bars", type=int, nargs="+", default=[100000, 1000000])
+    parser.add_argument("--modes", nargs="+", default=list(MODES), choices=list(MODES))
+    args = parser.parse_args()
+
+    context = multiprocessing.get_context("spawn")
+    for bars in args.bars:
+        for mode in args.modes:
+            with context.Pool(1) as pool:
+                result = pool.apply(run_mode, (mode, bars))
+            print(f"{bars:>8} bars {mode:>12}: held {result['held_mb']:8.1f} MB ({result['bytes_per_bar']:6.0f} B/bar), "
+                  f"encode peak {result['encode_peak_mb']:7.1f} MB, "
+                  f"transform {result['transform_s']:6.2f}s, COPY encode {result['encode_s']:6.2f}s")
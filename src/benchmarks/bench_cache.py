@@ -0,0 +1,98 @@
+##############################################
+# Title: Response Cache Benchmark Script
+# Author: Christopher Romanillos
+# Description: Offline check of the response
+# cache against the local mock server: cold,
+# revalidated (304), hash-unchanged, revised
+# and fresh runs, with requests, bytes and time.
+# Usage (from src/):
+#   python -m benchmarks.bench_cache --symbols 50 --bars 2000
+# Date: 04/26/25
+# Version: 1.0
+##############################################
+import time
+import argparse
+import tempfile
+from pathlib import Path
+from benchmarks.mock_server import MockAlphaVantage
+from utils.async_extract import run_extraction
+from utils.api_requests import ApiClient, fetch_api_data
+from utils.response_cache import ResponseCache, UNCHANGED, request_key
+
+def run(mock, symbols, settings, cache):
+    """One extraction pass; returns the payloads that would reach transform/load."""
+    handed_on = []
+    requests_before, not_modified_before = mock.requests, mock.not_modified
+    params = {'function': 'TIME_SERIES_INTRADAY', 'interval': '5min', 'apikey': 'demo'}
+
+    def on_result(symbol, data):
+        # Stands in for a successful load, after which the response is cached
+        handed_on.append(symbol)
+        cache.commit(request_key(dict(params, symbol=symbol)))
+
+    start = time.perf_counter()
+    results = run_extraction(symbols, mock.endpoint, params, settings, on_result=on_result, cache=cache)
+    return {
+        "seconds": time.perf_counter() - start,
+        "requests": mock.requests - requests_before,
+        "not_modified": mock.not_modified - not_modified_before,
+        "handed_on": len(handed_on),
+        "unchanged": sum(1 for result in results.values() if result is UNCHANGED),
+        "failed": sum(1 for result in results.values() if isinstance(result, Exception)),
+    }
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Check and time the response cache against the mock server.")
+    parser.add_argument("--symbols", type=int, default=50, help="Number of synthetic symbols.")
+    parser.add_argument("--bars", type=int, default=2000, help="Bars per response.")
+    parser.add_argument("--latency", type=float, default=0.02, help="Mock server latency (s).")
+    args = parser.parse_args()
+
+    symbols = [f"SYM{i:04d}" for i in range(args.symbols)]
+    settings = {
+        'timeout': 10,
+        'concurrency': 10,
+        'rate_limit': {'requests_per_minute': 60000, 'burst': 50},
+        'retry': {'max_attempts': 3, 'backoff_base': 0.1, 'backoff_max': 1},
+    }
+    # (scenario, server sends validators, revise content first, cache fresh_seconds, payloads expected downstream)
+    scenarios = [
+        ("cold", True, False, 0, args.symbols),
+        ("revalidated (304)", True, False, 0, 0),
+        ("no validators, same hash", False, False, 0, 0),
+        ("revised content", False, True, 0, args.symbols),
+        ("fresh (no requests)", True, False, 3600, 0),
+    ]
+
+    failures = 0
+    with tempfile.TemporaryDirectory() as workdir, MockAlphaVantage(args.bars, args.latency) as mock:
+        db_path = Path(workdir) / 'response_cache.db'
+        for name, validators, revise, fresh_seconds, expected in scenarios:
+            mock.validators = validators
+            if revise:
+                mock.revise()
+            with ResponseCache(db_path, fresh_seconds=fresh_seconds) as cache:
+                result = run(mock, symbols, settings, cache)
+            status = "ok" if result["handed_on"] == expected and not result["failed"] else "FAIL"
+            failures += status == "FAIL"
+            print(f"{name:>26}: {result['requests']:4} requests ({result['not_modified']:4} x 304), "
+                  f"{result['handed_on']:4} to transform/load, {result['unchanged']:4} unchanged, "
+                  f"{result['seconds']:6.2f}s [{status}]")
+
+        # Synchronous path (main_api_extract.py) and LRU eviction down to a one-body budget
+        mock.validators = True
+        with ResponseCache(db_path, max_bytes=1) as cache, ApiClient(log_timings=False) as client:
+            params = {'function': 'TIME_SERIES_INTRADAY', 'symbol': 'IBM', 'interval': '5min'}
+            url = f"{mock.endpoint}?function=TIME_SERIES_INTRADAY&symbol=IBM&interval=5min&apikey=demo"
+            first = fetch_api_data(url, 10, client=client, cache=cache, cache_key=request_key(params))
+            cache.commit(request_key(params))
+            second = fetch_api_data(url, 10, client=client, cache=cache, cache_key=request_key(params))
+            evicted = cache.evict()
+            remaining = cache.connection.execute("SELECT count(*) FROM entries").fetchone()[0]
+        status = "ok" if first is not UNCHANGED and second is UNCHANGED and remaining <= 1 else "FAIL"
+        failures += status == "FAIL"
+        print(f"{'sync fetch + eviction':>26}: second fetch unchanged={second is UNCHANGED}, "
+              f"{evicted} evicted, {remaining} entries kept [{status}]")
+
+    if failures:
+        raise SystemExit(f"{failures} scenario(s) did not behave as expected.")
@@ -0,0 +1,60 @@
+##############################################
+# Title: Dead Letter Benchmark Script
+# Author: Christopher Romanillos
+# Description: Transform time with a bad share
+# of bars when every reject is logged (the old
+# behaviour) versus buffered dead letters
+# written in bulk to each sink.
+# Usage (from src/):
+#   python -m benchmarks.bench_dead_letters --bars 200000 --bad-share 0.3
+# Date: 05/03/25
+# Version: 1.0
+##############################################
+import time
+import logging
+import argparse
+import tempfile
+import utils.dead_letter as dead_letter
+from benchmarks.synthetic import make_intraday_payload
+from utils.dead_letter import DeadLetterQueue, JsonlSink, ParquetSink
+from utils.bar_batch import transform_batch
+from utils.payloads import get_descriptor
+from utils.utils import setup_logging
+
+DESCRIPTOR = get_descriptor('TIME_SERIES_INTRADAY', '1min')
+
+class PerRecordLogQueue(DeadLetterQueue):
+    """One synchronous log line per reject, carrying the record, as before dead letters."""
+
+    def add_many(self, stage, code, items, error=None, symbol=None, interval=None, function=None):
+        for bar_timestamp, payload in items:
+            logging.error(f"Error validating data for timestamp {bar_timestamp}: {error} {payload}")
+
+def make_queue(mode, workdir):
+    if mode == 'log_each':
+        return PerRecordLogQueue()
+    sink = {'none': None, 'jsonl': JsonlSink(workdir, 'bench'), 'parquet': ParquetSink(workdir, 'bench')}[mode]
+    return DeadLetterQueue(sink, buffer_size=10000, log_interval=60)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark reject handling during transform.")
+    parser.add_argument("--bars", type=int, default=200000)
+    parser.add_argument("--bad-share", type=float, default=0.3, help="Fraction of bars that fail validation.")
+    parser.add_argument("--engines", nargs="+", default=["threaded", "vectorized"], choices=["threaded", "vectorized"])
+    parser.add_argument("--modes", nargs="+", default=["log_each", "none", "jsonl", "parquet"],
+                        choices=["log_each", "none", "jsonl", "parquet"])
+    args = parser.parse_args()
+
+    series = make_intraday_payload("IBM", args.bars, interval="1min", seed=1, bad_share=args.bad_share)["Time Series (1min)"]
+    with tempfile.TemporaryDirectory() as workdir:
+        # Log to a real file, as the entry points do
+        setup_logging(f"{workdir}/bench.log")
+        for engine in args.engines:
+            for mode in args.modes:
+                dead_letter._queue = make_queue(mode, workdir)
+                start = time.perf_counter()
+                batch, rejected = transform_batch(series, "IBM", "1min", DESCRIPTOR, engine)
+                dead_letter._queue.close()
+                elapsed = time.perf_counter() - start
+                print(f"{engine:>10} {mode:>8}: {len(batch):>8} kept, {rejected:>7} rejected in {elapsed:6.2f}s "
+                      f"({args.bars / elapsed:,.0f} bars/sec)")
@@ -0,0 +1,47 @@
+##############################################
+# Title: Extraction Benchmark Script
+# Author: Christopher Romanillos
+# Description: Runs the concurrent extractor
+# against a local mock server, reports
+# symbols/minute.
+# Usage (from src/):
+#   python -m benchmarks.bench_extract --symbols 200 --rpm 600
+# Date: 01/11/25
+# Version: 1.0
+##############################################
+import time
+import argparse
+from benchmarks.mock_server import MockAlphaVantage
+from utils.async_extract import run_extraction
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the concurrent extractor.")
+    parser.add_argument("--symbols", type=int, default=200, help="Number of synthetic symbols.")
+    parser.add_argument("--bars", type=int, default=100, help="Bars per response.")
+    parser.add_argument("--rpm", type=int, default=600, help="Token bucket requests per minute.")
+    parser.add_argument("--burst", type=int, default=10)
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--latency", type=float, default=0.05, help="Mock server latency (s).")
+    parser.add_argument("--rate-limit-every", type=int, default=50,
+                        help="Mock answers every Nth request with a rate-limit Note (0 disables).")
+    args = parser.parse_args()
+
+    symbols = [f"SYM{i:04d}" for i in range(args.symbols)]
+    settings = {
+        'timeout': 10,
+        'concurrency': args.concurrency,
+        'rate_limit': {'requests_per_minute': args.rpm, 'burst': args.burst},
+        'retry': {'max_attempts': 5, 'backoff_base': 0.2, 'backoff_max': 2},
+    }
+    params = {'function': 'TIME_SERIES_INTRADAY', 'interval': '5min', 'apikey': 'demo'}
+
+    with MockAlphaVantage(args.bars, args.latency, args.rate_limit_every) as mock:
+        start = time.perf_counter()
+        results = run_extraction(symbols, mock.endpoint, params, settings)
+        elapsed = time.perf_counter() - start
+        requests_made = mock.requests
+
+    succeeded = sum(1 for r in results.values() if not isinstance(r, Exception))
+    print(f"{succeeded}/{len(symbols)} symbols in {elapsed:.2f}s "
+          f"({succeeded / elapsed * 60:.1f} symbols/minute, {requests_made} requests, "
+          f"limit {args.rpm} requests/minute)")
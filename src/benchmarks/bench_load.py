@@ -0,0 +1,113 @@
+##############################################
+# Title: Load Benchmark Script
+# Author: Christopher Romanillos
+# Description: Compares rows/sec of the COPY,
+# ORM and parallel upsert loaders against a
+# local Postgres.
+# Usage (from src/):
+#   python -m benchmarks.bench_load --rows 10000 100000 1000000
+#   python -m benchmarks.bench_load --rows 1000000 --modes parallel --workers 1 2 4 8
+# ! USES POSTGRES_DATABASE_URL (OR --database-url)
+# AND TRUNCATES intraday_data BETWEEN RUNS. !
+# Date: 01/04/25
+# Version: 1.2
+##############################################
+import os
+import json
+import time
+import argparse
+from datetime import datetime, timedelta
+from dotenv import load_dotenv
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import sessionmaker
+from schema import Base
+from utils.db_loader import copy_records, orm_load_records
+from utils.parallel_load import parallel_upsert
+from utils.partitions import ensure_partitions
+
+def generate_records(count, start=datetime(2000, 1, 3, 9, 30)):
+    """Generate processed-style records with unique, increasing timestamps."""
+    step = timedelta(minutes=1)
+    return [
+        {
+            "symbol": "BENCH",
+            "interval": "1min",
+            "timestamp": str(start + step * i),
+            "open": 100.0 + (i % 50) * 0.01,
+            "high": 101.0 + (i % 50) * 0.01,
+            "low": 99.0 + (i % 50) * 0.01,
+            "close": 100.5 + (i % 50) * 0.01,
+            "volume": 1000 + i % 500,
+        }
+        for i in range(count)
+    ]
+
+def run_benchmark(engine, row_counts, modes, workers=(4,)):
+    """Time each loader at each row count (and each worker count for parallel) and return the results."""
+    Session = sessionmaker(bind=engine)
+    Base.metadata.create_all(engine)
+    results = []
+
+    for count in row_counts:
+        data = generate_records(count)
+
+        # Plain COPY does not create partitions, so cover the generated range up front
+        connection = engine.raw_connection()
+        try:
+            first, last = (datetime.fromisoformat(data[i]["timestamp"]) for i in (0, -1))
+            ensure_partitions(connection.cursor(), first, last)
+            connection.commit()
+        finally:
+            connection.close()
+
+        runs = [(mode, None) for mode in modes if mode != 'parallel']
+        if 'parallel' in modes:
+            runs += [('parallel', count) for count in workers]
+
+        for mode, worker_count in runs:
+            with engine.begin() as connection:
+                connection.execute(text("TRUNCATE intraday_data"))
+
+            start = time.perf_counter()
+            if mode == 'copy':
+                loaded = copy_records(engine, data)
+            elif mode == 'parallel':
+                summary = parallel_upsert(engine, data, workers=worker_count)
+                loaded = summary['inserted'] + summary['updated']
+            else:
+                loaded = orm_load_records(Session, data)
+            elapsed = time.perf_counter() - start
+
+            results.append({
+                "mode": mode,
+                "workers": worker_count,
+                "rows": loaded,
+                "seconds": round(elapsed, 3),
+                "rows_per_sec": round(loaded / elapsed) if elapsed else None,
+            })
+            label = f"{mode} x{worker_count}" if worker_count else mode
+            print(f"{label:>11} {loaded:>9} rows {elapsed:8.2f}s {loaded / elapsed:12,.0f} rows/sec")
+
+    with engine.begin() as connection:
+        connection.execute(text("TRUNCATE intraday_data"))
+    return results
+
+if __name__ == "__main__":
+    load_dotenv()
+    parser = argparse.ArgumentParser(description="Benchmark COPY vs ORM loading.")
+    parser.add_argument("--database-url", default=os.getenv("POSTGRES_DATABASE_URL"))
+    parser.add_argument("--rows", type=int, nargs="+", default=[10000, 100000, 1000000])
+    parser.add_argument("--modes", nargs="+", default=["copy", "orm"], choices=["copy", "orm", "parallel"])
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8],
+                        help="Connection counts to try for the parallel mode.")
+    parser.add_argument("--output", help="Optional path to write JSON results.")
+    args = parser.parse_args()
+
+    if not args.database_url:
+        raise SystemExit("POSTGRES_DATABASE_URL is not set and --database-url was not given.")
+
+    engine = create_engine(args.database_url, pool_size=max(args.workers))
+    results = run_benchmark(engine, args.rows, args.modes, args.workers)
+    if args.output:
+        with open(args.output, 'w') as file:
+            json.dump(results, file, indent=2)
@@ -0,0 +1,82 @@
+##############################################
+# Title: Parse Benchmark Script
+# Author: Christopher Romanillos
+# Description: Compares json.load of whole raw
+# files with streaming (ijson) parsing in chunks,
+# each writing Parquet output: throughput and
+# peak memory per payload size.
+# Usage (from src/):
+#   python -m benchmarks.bench_parse --bars 10000 100000 500000
+# Date: 03/08/25
+# Version: 1.1
+##############################################
+import json
+import time
+import argparse
+import tempfile
+import multiprocessing
+from pathlib import Path
+from benchmarks.synthetic import make_intraday_payload
+from benchmarks.suite import peak_rss_mb
+from utils.stream_parse import open_time_series, iter_chunks
+from utils.vectorized_transform import transform_columnar
+from utils.parquet_store import columns_to_table, save_processed_parquet, ParquetChunkWriter
+
+REQUIRED_FIELDS = ["1. open", "2. high", "3. low", "4. close", "5. volume"]
+SERIES_KEY = "Time Series (1min)"
+
+def parse_whole(path, chunk_size, output_dir):
+    """json parser: json.load the file, transform the whole series, then save it."""
+    with open(path, "r") as file:
+        time_series = json.load(file)[SERIES_KEY]
+    columns, reject = transform_columnar(time_series, REQUIRED_FIELDS)
+    table = columns_to_table(columns, reject, "IBM", "1min")
+    save_processed_parquet(table, output_dir, stem="whole")
+    return table.num_rows
+
+def parse_streamed(path, chunk_size, output_dir):
+    """stream parser: parse bars incrementally, transform and write them chunk by chunk."""
+    writer = ParquetChunkWriter(output_dir, "streamed")
+    with open(path, "rb") as file:
+        _, _, bars = open_time_series(file)
+        for chunk in iter_chunks(bars, chunk_size):
+            columns, reject = transform_columnar(chunk, REQUIRED_FIELDS)
+            writer.write(columns_to_table(columns, reject, "IBM", "1min"))
+    writer.close()
+    return writer.records
+
+MODES = {"json": parse_whole, "stream": parse_streamed}
+
+def write_payload(path, bars):
+    # Runs in a child so the payload never inflates this process's peak RSS,
+    # which spawned children would otherwise inherit
+    Path(path).write_text(json.dumps(make_intraday_payload("IBM", bars, interval="1min", seed=1)))
+
+def run_mode(mode, path, chunk_size):
+    """Run one mode in this (fresh) process and report time and memory above the idle process."""
+    idle = peak_rss_mb()
+    start = time.perf_counter()
+    with tempfile.TemporaryDirectory() as output_dir:
+        rows = MODES[mode](path, chunk_size, output_dir)
+    elapsed = time.perf_counter() - start
+    return {"rows": rows, "seconds": elapsed, "peak_rss_mb": peak_rss_mb(), "extra_rss_mb": peak_rss_mb() - idle}
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark whole-file vs streaming JSON parsing.")
+    parser.add_argument("--bars", type=int, nargs="+", default=[10000, 100000, 500000])
+    parser.add_argument("--chunk-size", type=int, default=10000, help="Bars per streamed chunk.")
+    args = parser.parse_args()
+
+    context = multiprocessing.get_context("spawn")
+    with tempfile.TemporaryDirectory() as workdir:
+        for bars in args.bars:
+            path = Path(workdir) / f"data_{bars}.json"
+            with context.Pool(1) as pool:
+                pool.apply(write_payload, (path, bars))
+            size_mb = path.stat().st_size / (1024 * 1024)
+            for mode in MODES:
+                with context.Pool(1) as pool:
+                    result = pool.apply(run_mode, (mode, path, args.chunk_size))
+                print(f"{bars:>8} bars ({size_mb:7.1f} MB) {mode:>6}: {result['seconds']:7.2f}s "
+                      f"{result['rows'] / result['seconds']:>10,.0f} bars/s  "
+                      f"peak {result['peak_rss_mb']:7.1f} MB (+{result['extra_rss_mb']:.1f} MB)")
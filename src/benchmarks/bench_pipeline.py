@@ -0,0 +1,102 @@
+##############################################
+# Title: Pipeline Latency Benchmark Script
+# Author: Christopher Romanillos
+# Description: Compares API-response-to-commit
+# latency of the streaming pipeline with the
+# disk handoff between separate stages.
+# Usage (from src/):
+#   python -m benchmarks.bench_pipeline --symbols 50
+# ! USES POSTGRES_DATABASE_URL (OR --database-url)
+# AND TRUNCATES intraday_data BETWEEN RUNS. !
+# Date: 01/18/25
+# Version: 1.0
+##############################################
+import os
+import json
+import time
+import argparse
+import tempfile
+from pathlib import Path
+from dotenv import load_dotenv
+from sqlalchemy import create_engine, text
+from schema import Base
+from benchmarks.mock_server import MockAlphaVantage
+from utils.utils import save_to_file
+from utils.file_handler import save_processed_data
+from utils.data_validation import transform_time_series
+from utils.async_extract import run_extraction
+from utils.db_loader import upsert_records
+from utils.pipeline import run_pipeline, _percentile
+
+def run_handoff(config, engine, workdir):
+    """Extract everything, then transform everything, then load everything via JSON files."""
+    api_config = config['api']
+    interval = api_config['interval']
+    raw_dir = Path(workdir) / 'raw'
+    processed_dir = Path(workdir) / 'processed'
+    raw_dir.mkdir()
+    received = {}
+
+    def on_result(symbol, data):
+        received[symbol] = time.monotonic()
+        save_to_file(data, raw_dir / f"data_{symbol}.json")
+
+    params = {'function': 'TIME_SERIES_INTRADAY', 'interval': interval, 'apikey': 'demo'}
+    run_extraction(api_config['symbols'], api_config['endpoint'], params, api_config, on_result)
+
+    for raw_file in raw_dir.glob('*.json'):
+        symbol = raw_file.stem.split('_', 1)[1]
+        with open(raw_file) as file:
+            series = json.load(file)[f"Time Series ({interval})"]
+        records, _ = transform_time_series(series, config['required_fields'])
+        save_processed_data(records, processed_dir, symbol=symbol)
+
+    latencies = []
+    for processed_file in processed_dir.glob('*.json'):
+        symbol = processed_file.stem.split('_')[2]
+        with open(processed_file) as file:
+            upsert_records(engine, json.load(file), symbol=symbol, interval=interval)
+        latencies.append(time.monotonic() - received[symbol])
+    return latencies
+
+if __name__ == "__main__":
+    load_dotenv()
+    parser = argparse.ArgumentParser(description="Benchmark streaming vs disk-handoff latency.")
+    parser.add_argument("--database-url", default=os.getenv("POSTGRES_DATABASE_URL"))
+    parser.add_argument("--symbols", type=int, default=50)
+    parser.add_argument("--bars", type=int, default=100)
+    parser.add_argument("--latency", type=float, default=0.05, help="Mock server latency (s).")
+    args = parser.parse_args()
+
+    if not args.database_url:
+        raise SystemExit("POSTGRES_DATABASE_URL is not set and --database-url was not given.")
+
+    engine = create_engine(args.database_url)
+    Base.metadata.create_all(engine)
+
+    with MockAlphaVantage(args.bars, args.latency) as mock:
+        config = {
+            'api': {
+                'endpoint': mock.endpoint,
+                'interval': '5min',
+                'symbols': [f"SYM{i:04d}" for i in range(args.symbols)],
+                'timeout': 10,
+                'concurrency': 10,
+                'rate_limit': {'requests_per_minute': 6000, 'burst': 10},
+            },
+            'required_fields': ["1. open", "2. high", "3. low", "4. close", "5. volume"],
+        }
+
+        for mode in ('handoff', 'streaming'):
+            with engine.begin() as connection:
+                connection.execute(text("TRUNCATE intraday_data"))
+            start = time.monotonic()
+            if mode == 'handoff':
+                with tempfile.TemporaryDirectory() as workdir:
+                    latencies = run_handoff(config, engine, workdir)
+                p50, p99 = _percentile(latencies, 50), _percentile(latencies, 99)
+            else:
+                summary = run_pipeline(config, engine, api_key='demo')
+                p50, p99 = summary['latency_p50'], summary['latency_p99']
+            elapsed = time.monotonic() - start
+            print(f"{mode:>9}: total {elapsed:.2f}s, response->commit p50 {p50 * 1000:.0f}ms p99 {p99 * 1000:.0f}ms")
@@ -0,0 +1,69 @@
+##############################################
+# Title: Process Transform Benchmark Script
+# Author: Christopher Romanillos
+# Description: Transform throughput over a batch
+# of raw files with the thread executor versus
+# the process pool at several worker counts
+# (the scaling curve).
+# Usage (from src/):
+#   python -m benchmarks.bench_process_transform --files 32 --bars 20000 --workers 1 2 4 8
+# Date: 05/10/25
+# Version: 1.0
+##############################################
+import os
+import json
+import time
+import logging
+import argparse
+import tempfile
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+from benchmarks.synthetic import make_intraday_payload
+from utils.process_transform import transform_raw_file, transform_files_in_processes
+
+def write_raw_files(directory, files, bars, bad_share):
+    paths = []
+    for i in range(files):
+        path = Path(directory) / f"data_BENCH{i:04d}.json"
+        with open(path, 'w') as file:
+            json.dump(make_intraday_payload(f"BENCH{i:04d}", bars, interval="1min", seed=i, bad_share=bad_share), file)
+        paths.append(path)
+    return paths
+
+def run_threads(paths, settings, workers):
+    """The transform.executor: thread path (one file per thread, results as BarBatch)."""
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        return sum(len(batch) for batch, _ in executor.map(lambda path: transform_raw_file(path, settings, {}), paths))
+
+def run_processes(paths, settings, workers, files_per_task):
+    return sum(table.num_rows for _, table, _, error in
+               transform_files_in_processes(paths, settings, workers=workers, files_per_task=files_per_task)
+               if error is None)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark thread vs process transform executors.")
+    parser.add_argument("--files", type=int, default=32)
+    parser.add_argument("--bars", type=int, default=20000, help="Bars per raw file.")
+    parser.add_argument("--bad-share", type=float, default=0.0)
+    parser.add_argument("--engine", default="vectorized", choices=["threaded", "vectorized"])
+    parser.add_argument("--workers", nargs="+", type=int, default=[1, 2, 4, 8])
+    parser.add_argument("--files-per-task", type=int, default=8)
+    args = parser.parse_args()
+    logging.disable(logging.WARNING)
+
+    settings = {"engine": args.engine, "parser": "json", "stream_chunk_size": 10000,
+                "default_symbol": "IBM", "default_interval": "1min"}
+    total = args.files * args.bars
+    print(f"{args.files} files x {args.bars} bars, engine {args.engine}, {os.cpu_count()} CPUs")
+
+    with tempfile.TemporaryDirectory() as workdir:
+        paths = write_raw_files(workdir, args.files, args.bars, args.bad_share)
+        runs = [("thread", workers, lambda workers=workers: run_threads(paths, settings, workers))
+                for workers in args.workers]
+        runs += [("process", workers, lambda workers=workers: run_processes(paths, settings, workers, args.files_per_task))
+                 for workers in args.workers]
+        for executor, workers, run in runs:
+            start = time.perf_counter()
+            kept = run()
+            elapsed = time.perf_counter() - start
+            print(f"{executor:>8} x{workers:<2}: {kept:>9} bars in {elapsed:6.2f}s ({total / elapsed:,.0f} bars/sec)")
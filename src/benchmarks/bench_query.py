@@ -0,0 +1,109 @@
+##############################################
+# Title: Bar Query Benchmark Script
+# Author: Christopher Romanillos
+# Description: Latency of "last N bars" and
+# time-range reads through BarQuery, uncached
+# versus cached, and how soon a committed load
+# is visible through the cache.
+# Usage (from src/):
+#   python -m benchmarks.bench_query --database-url postgresql://... --symbols 20 --bars 20000
+# ! WRITES BENCHQ* SYMBOLS TO intraday_data AND
+# DELETES THEM AFTERWARDS !
+# Date: 05/24/25
+# Version: 1.0
+##############################################
+import time
+import random
+import logging
+import argparse
+from datetime import timedelta
+from sqlalchemy import create_engine, text
+from benchmarks.synthetic import make_intraday_payload
+from utils.bar_batch import transform_batch
+from utils.bar_query import BarQuery
+from utils.config import load_env_variables
+from utils.db_loader import upsert_records
+from utils.payloads import get_descriptor
+
+DESCRIPTOR = get_descriptor('TIME_SERIES_INTRADAY', '1min')
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+def seed_bars(engine, symbols, bars):
+    """Load `bars` 1min bars per symbol; returns the BarBatch of each."""
+    batches = {}
+    for i, symbol in enumerate(symbols):
+        series = make_intraday_payload(symbol, bars, interval="1min", seed=i)["Time Series (1min)"]
+        batches[symbol], _ = transform_batch(series, symbol, "1min", DESCRIPTOR)
+        upsert_records(engine, batches[symbol], symbol=symbol, interval="1min")
+    return batches
+
+def run_queries(calls):
+    """Latency (ms) of each call in `calls` (a list of zero-argument callables)."""
+    latencies = []
+    for call in calls:
+        start = time.perf_counter()
+        call()
+        latencies.append((time.perf_counter() - start) * 1000)
+    return latencies
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark cached vs uncached bar queries.")
+    parser.add_argument("--database-url", default=None, help="Default: POSTGRES_DATABASE_URL.")
+    parser.add_argument("--symbols", type=int, default=20)
+    parser.add_argument("--bars", type=int, default=20000, help="1min bars stored per symbol.")
+    parser.add_argument("--queries", type=int, default=2000)
+    parser.add_argument("--window", type=int, default=390, help="Bars per 'last N bars' query (a trading day of 1min bars).")
+    parser.add_argument("--ttl", type=float, default=30)
+    args = parser.parse_args()
+    logging.disable(logging.WARNING)
+
+    database_url = args.database_url or load_env_variables('POSTGRES_DATABASE_URL')
+    if not database_url:
+        raise SystemExit("Pass --database-url or set POSTGRES_DATABASE_URL.")
+    engine = create_engine(database_url)
+    symbols = [f"BENCHQ{i:04d}" for i in range(args.symbols)]
+    cleanup = text("DELETE FROM intraday_data WHERE symbol LIKE 'BENCHQ%'")
+
+    try:
+        batches = seed_bars(engine, symbols, args.bars)
+        rng = random.Random(1)
+        picks = [rng.choice(symbols) for _ in range(args.queries)]
+        day = timedelta(days=1)
+
+        for name, cache_size in (("uncached", 0), ("cached", 256)):
+            with BarQuery(engine, cache_size=cache_size, ttl=args.ttl) as query:
+                first = {symbol: batches[symbol].time_range()[0] for symbol in symbols}
+                workloads = {
+                    "last_bars": [lambda symbol=symbol: query.last_bars(symbol, "1min", args.window) for symbol in picks],
+                    "range_day": [lambda symbol=symbol: query.bars(symbol, "1min", first[symbol], first[symbol] + day)
+                                  for symbol in picks],
+                }
+                for workload, calls in workloads.items():
+                    latencies = run_queries(calls)
+                    print(f"{name:>8} {workload:>9}: p50 {percentile(latencies, 50):7.3f} ms, "
+                          f"p99 {percentile(latencies, 99):7.3f} ms, {len(calls) / (sum(latencies) / 1000):,.0f} queries/sec "
+                          f"({query.hits} hits, {query.misses} misses)")
+
+        # A load commits one new bar: the cached window must show it on the next call, not after the TTL
+        with BarQuery(engine, ttl=args.ttl) as query:
+            symbol = symbols[0]
+            before = query.last_bars(symbol, "1min", args.window)
+            latest = before.datetimes()[-1].item() + timedelta(minutes=1)
+            series = {latest.strftime('%Y-%m-%d %H:%M:%S'): {"1. open": "1", "2. high": "2", "3. low": "0.5",
+                                                               "4. close": "1.5", "5. volume": "10"}}
+            batch, _ = transform_batch(series, symbol, "1min", DESCRIPTOR)
+            upsert_records(engine, batch, symbol=symbol, interval="1min")
+            start = time.perf_counter()
+            deadline = start + args.ttl
+            while query.last_bars(symbol, "1min", args.window).datetimes()[-1].item() != latest:
+                if time.perf_counter() > deadline:
+                    break
+                time.sleep(0.001)
+            print(f"new bar visible through the cache after {(time.perf_counter() - start) * 1000:.1f} ms")
+    finally:
+        with engine.begin() as connection:
+            connection.execute(cleanup)
+        engine.dispose()
@@ -0,0 +1,93 @@
+##############################################
+# Title: CLI Startup Benchmark Script
+# Author: Christopher Romanillos
+# Description: Cold start of each etl.py
+# subcommand in a fresh interpreter, with a
+# -X importtime report of the slowest imports.
+# Fails if a subcommand imports pyarrow (or any
+# other --deferred module) before it runs.
+# Usage (from src/):
+#   python -m benchmarks.bench_startup --commands extract transform load --target-ms 200
+# Date: 05/17/25
+# Version: 1.0
+##############################################
+import sys
+import time
+import argparse
+import subprocess
+from pathlib import Path
+from statistics import median
+
+SRC_DIR = Path(__file__).resolve().parent.parent
+
+def startup_code(command):
+    """Interpreter start-up plus the imports `etl.py <command>` pulls in before running."""
+    return f"import etl; etl.command_main({command!r})"
+
+def cold_start_ms(code, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, "-c", code], cwd=SRC_DIR, check=True)
+        timings.append((time.perf_counter() - start) * 1000)
+    return median(timings)
+
+def loaded_modules(code, modules):
+    """Which of `modules` are imported once `code` has run (in a fresh interpreter)."""
+    check = f"{code}; import sys; print(' '.join(m for m in {list(modules)!r} if m in sys.modules))"
+    result = subprocess.run([sys.executable, "-c", check], cwd=SRC_DIR, check=True, capture_output=True, text=True)
+    return result.stdout.split()
+
+def import_report(code, top):
+    """
+    Slowest top-level imports from one `-X importtime` run.
+
+    Returns:
+        tuple: (total import ms, [(module, cumulative ms)] for the `top` slowest).
+    """
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", code],
+                            cwd=SRC_DIR, check=True, capture_output=True, text=True)
+    modules = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        # Nested imports are indented under the module that triggered them
+        if not name[1:].startswith(" "):
+            modules.append((name.strip(), int(cumulative) / 1000))
+    total = sum(ms for _, ms in modules)
+    return total, sorted(modules, key=lambda module: module[1], reverse=True)[:top]
+
+if __name__ == "__main__":
+    sys.path.insert(0, str(SRC_DIR))
+    from etl import COMMANDS
+
+    parser = argparse.ArgumentParser(description="Benchmark etl.py subcommand cold start.")
+    parser.add_argument("--commands", nargs="+", default=list(COMMANDS), choices=list(COMMANDS))
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--top", type=int, default=8, help="Slowest imports listed per command.")
+    parser.add_argument("--target-ms", type=float, default=200, help="Cold start budget for extract.")
+    parser.add_argument("--deferred", nargs="+", default=["pyarrow"],
+                        help="Modules no subcommand may import at startup (they are imported on first use).")
+    args = parser.parse_args()
+
+    baseline = cold_start_ms("pass", args.repeat)
+    print(f"{'python':>14}: {baseline:6.1f} ms (bare interpreter)")
+    over_budget = False
+    eager = False
+    for command in args.commands:
+        code = startup_code(command)
+        elapsed = cold_start_ms(code, args.repeat)
+        total, slowest = import_report(code, args.top)
+        verdict = ""
+        if command == "extract":
+            over_budget = elapsed > args.target_ms
+            verdict = f" [{'over' if over_budget else 'within'} {args.target_ms:.0f} ms budget]"
+        print(f"{command:>14}: {elapsed:6.1f} ms cold start, {total:6.1f} ms importing{verdict}")
+        for module, ms in slowest:
+            print(f"{'':>16}{ms:7.1f} ms  {module}")
+        loaded = loaded_modules(code, args.deferred)
+        if loaded:
+            eager = True
+            print(f"{'':>16}imported at startup: {', '.join(loaded)}")
+    sys.exit(1 if over_budget or eager else 0)
@@ -0,0 +1,67 @@
+##############################################
+# Title: Storage Format Benchmark Script
+# Author: Christopher Romanillos
+# Description: Compares file size and read/write
+# throughput of JSON and Parquet processed data.
+# Usage (from src/):
+#   python -m benchmarks.bench_storage --bars 100000
+# Date: 02/08/25
+# Version: 1.0
+##############################################
+import json
+import time
+import logging
+import argparse
+import tempfile
+from datetime import datetime
+from pathlib import Path
+from benchmarks.synthetic import make_intraday_payload
+from utils.vectorized_transform import transform_columnar, columns_to_records
+from utils.parquet_store import columns_to_table, save_processed_parquet, read_processed_parquet
+from utils.file_handler import save_processed_data
+
+REQUIRED_FIELDS = ["1. open", "2. high", "3. low", "4. close", "5. volume"]
+
+def bench_json(records, workdir):
+    start = time.perf_counter()
+    save_processed_data(records, workdir, file_name="processed.json")
+    write = time.perf_counter() - start
+    path = Path(workdir) / "processed.json"
+
+    start = time.perf_counter()
+    with open(path) as file:
+        data = json.load(file)
+    # load_data parses timestamps back from strings
+    for record in data:
+        datetime.fromisoformat(record["timestamp"])
+    read = time.perf_counter() - start
+    return [path], write, read
+
+def bench_parquet(table, workdir):
+    start = time.perf_counter()
+    paths = save_processed_parquet(table, workdir, stem="processed")
+    write = time.perf_counter() - start
+
+    start = time.perf_counter()
+    rows = sum(read_processed_parquet(path).num_rows for path in paths)
+    read = time.perf_counter() - start
+    assert rows == table.num_rows
+    return paths, write, read
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark JSON vs Parquet processed data.")
+    parser.add_argument("--bars", type=int, default=100000)
+    args = parser.parse_args()
+    logging.disable(logging.INFO)
+
+    series = make_intraday_payload("IBM", args.bars, interval="1min", seed=1)["Time Series (1min)"]
+    columns, reject = transform_columnar(series, REQUIRED_FIELDS)
+    records = columns_to_records(columns, reject)
+    table = columns_to_table(columns, reject, "IBM", "1min")
+
+    for name, func, data in (("json", bench_json, records), ("parquet", bench_parquet, table)):
+        with tempfile.TemporaryDirectory() as workdir:
+            paths, write, read = func(data, workdir)
+            size = sum(path.stat().st_size for path in paths)
+        print(f"{name:>8}: {size / 1e6:7.2f} MB in {len(paths)} file(s), "
+              f"write {len(records) / write:12,.0f} rows/sec, read {len(records) / read:12,.0f} rows/sec")
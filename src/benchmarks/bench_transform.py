@@ -0,0 +1,51 @@
+##############################################
+# Title: Transform Benchmark Script
+# Author: Christopher Romanillos
+# Description: Compares the ThreadPoolExecutor
+# transform with the vectorized transform.
+# Usage (from src/):
+#   python -m benchmarks.bench_transform --bars 100000
+# Date: 01/25/25
+# Version: 1.0
+##############################################
+import time
+import logging
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+from benchmarks.synthetic import make_intraday_payload
+from utils.data_validation import transform_and_validate_data
+from utils.vectorized_transform import transform_columnar
+
+REQUIRED_FIELDS = ["1. open", "2. high", "3. low", "4. close", "5. volume"]
+
+def run_threaded(time_series):
+    """The executor path used by main_transform.process_raw_data."""
+    with ThreadPoolExecutor() as executor:
+        results = executor.map(lambda item: transform_and_validate_data(item, REQUIRED_FIELDS), time_series.items())
+        return [result for result in results if result is not None]
+
+def run_vectorized(time_series):
+    columns, reject = transform_columnar(time_series, REQUIRED_FIELDS)
+    return int((~reject).sum())
+
+def best_of(func, arg, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(arg)
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark threaded vs vectorized transform.")
+    parser.add_argument("--bars", type=int, default=100000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+    logging.disable(logging.WARNING)
+
+    # 1-minute bars so 100k bars have unique timestamps
+    series = make_intraday_payload("IBM", args.bars, interval="1min", seed=1)["Time Series (1min)"]
+
+    for name, func in (("threaded", run_threaded), ("vectorized", run_vectorized)):
+        seconds = best_of(func, series, args.repeat)
+        print(f"{name:>10}: {seconds:.3f}s ({args.bars / seconds:,.0f} bars/sec)")
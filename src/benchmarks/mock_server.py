@@ -0,0 +1,157 @@
+##############################################
+# Title: Mock Alpha Vantage Server Script
+# Author: Christopher Romanillos
+# Description: Local HTTP server that answers
+# TIME_SERIES_INTRADAY requests for benchmarks.
+# Date: 01/11/25
+# Version: 1.3
+##############################################
+import gzip
+import json
+import time
+import zlib
+import threading
+from datetime import datetime
+from email.utils import formatdate
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs
+from benchmarks.synthetic import make_intraday_payload
+
+class MockAlphaVantage:
+    """
+    Serve synthetic intraday payloads on localhost in a background thread.
+
+    Args:
+        bars (int): Bars per response.
+        latency (float): Artificial server latency per request, in seconds.
+        rate_limit_every (int): Answer every Nth request with a rate-limit "Note" (0 disables).
+        bad_share (float): Fraction of bars per response that fail validation.
+        validators (bool): Send ETag/Last-Modified and answer matching conditional requests with 304.
+        too_many_every (int): Answer every Nth request with HTTP 429 and Retry-After (0 disables).
+        error_symbols (iterable): Symbols answered with an API "Error Message" payload.
+    """
+
+    def __init__(self, bars=100, latency=0.0, rate_limit_every=0, bad_share=0.0, validators=False,
+                 too_many_every=0, error_symbols=()):
+        self.bars = bars
+        self.validators = validators
+        self.revision = 0
+        self.not_modified = 0
+        self.bad_share = bad_share
+        self.latency = latency
+        self.rate_limit_every = rate_limit_every
+        self.too_many_every = too_many_every
+        self.error_symbols = set(error_symbols)
+        self.requests = 0
+        # Query parameters of every request, in arrival order
+        self.received = []
+        self.too_many = 0
+        # Requests being answered right now, and the most seen at once
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        self._lock = threading.Lock()
+        self._cache = {}
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), self._handler())
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    @property
+    def endpoint(self):
+        host, port = self.server.server_address
+        return f"http://{host}:{port}/query"
+
+    def payload(self, symbol, interval, month=None):
+        """
+        Encoded payload for a symbol (bars starting in `month`, "YYYY-MM", when
+        given), cached so the server is not the bottleneck.
+        """
+        key = (symbol, interval, month, self.revision)
+        if key not in self._cache:
+            start = datetime.strptime(month, '%Y-%m').replace(hour=4) if month else datetime(2024, 11, 1, 4, 0)
+            data = make_intraday_payload(symbol, self.bars, interval, start=start,
+                                         seed=zlib.crc32((symbol + (month or "")).encode()) + self.revision,
+                                         bad_share=self.bad_share)
+            self._cache[key] = (json.dumps(data).encode(), formatdate(usegmt=True))
+        return self._cache[key][0]
+
+    def revise(self):
+        """Serve new series content from now on (as if new bars had been published)."""
+        with self._lock:
+            self.revision += 1
+
+    def _handler(self):
+        mock = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            disable_nagle_algorithm = True
+
+            def do_GET(self):
+                params = {k: v[0] for k, v in parse_qs(urlparse(self.path).query).items()}
+                with mock._lock:
+                    mock.requests += 1
+                    mock.received.append(params)
+                    count = mock.requests
+                    mock.in_flight += 1
+                    mock.peak_in_flight = max(mock.peak_in_flight, mock.in_flight)
+                try:
+                    self._respond(params, count)
+                finally:
+                    with mock._lock:
+                        mock.in_flight -= 1
+
+            def _respond(self, params, count):
+                if mock.latency:
+                    time.sleep(mock.latency)
+
+                if mock.too_many_every and count % mock.too_many_every == 0:
+                    with mock._lock:
+                        mock.too_many += 1
+                    self.send_response(429)
+                    self.send_header('Retry-After', '0')
+                    self.send_header('Content-Length', '0')
+                    self.end_headers()
+                    return
+
+                validators = {}
+                if mock.rate_limit_every and count % mock.rate_limit_every == 0:
+                    body = json.dumps({"Note": "Thank you for using Alpha Vantage! Rate limit reached."}).encode()
+                elif params.get('symbol') in mock.error_symbols:
+                    body = json.dumps({"Error Message": "Invalid API call. Please retry or visit the documentation."}).encode()
+                else:
+                    body = mock.payload(params.get('symbol', 'IBM'), params.get('interval', '5min'), params.get('month'))
+                    if mock.validators:
+                        key = (params.get('symbol', 'IBM'), params.get('interval', '5min'), params.get('month'), mock.revision)
+                        validators = {'ETag': f'"{zlib.crc32(body):08x}"', 'Last-Modified': mock._cache[key][1]}
+
+                if validators and self.headers.get('If-None-Match') == validators['ETag']:
+                    with mock._lock:
+                        mock.not_modified += 1
+                    self.send_response(304)
+                    for name, value in validators.items():
+                        self.send_header(name, value)
+                    self.end_headers()
+                    return
+
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/json')
+                for name, value in validators.items():
+                    self.send_header(name, value)
+                if 'gzip' in self.headers.get('Accept-Encoding', ''):
+                    body = gzip.compress(body, compresslevel=1)
+                    self.send_header('Content-Encoding', 'gzip')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.server.shutdown()
+        self.server.server_close()
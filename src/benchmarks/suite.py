@@ -0,0 +1,290 @@
+##############################################
+# Title: ETL Benchmark Suite Script
+# Author: Christopher Romanillos
+# Description: Runs every ETL stage on synthetic
+# payloads, reports throughput, p50/p99 latency
+# and peak RSS, and compares with a baseline.
+# Usage (from src/):
+#   python -m benchmarks.suite --symbols 20 --bars 5000 --bad-share 0.01 --save-baseline
+#   python -m benchmarks.suite --symbols 20 --bars 5000 --bad-share 0.01
+# ! WITH --database-url THE LOAD STAGE WRITES
+# BENCH* SYMBOLS TO intraday_data AND DELETES
+# THEM AFTERWARDS !
+# Date: 02/22/25
+# Version: 1.0
+##############################################
+import sys
+import json
+import time
+import logging
+import platform
+import resource
+import argparse
+import multiprocessing
+from datetime import datetime
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+from benchmarks.synthetic import make_intraday_payload
+
+REQUIRED_FIELDS = ["1. open", "2. high", "3. low", "4. close", "5. volume"]
+DEFAULT_BASELINE = Path(__file__).resolve().parent / "baseline.json"
+
+# Higher is better for throughput; lower is better for latency and memory
+COMPARED_METRICS = (
+    ("records_per_sec", 1),
+    ("latency_p99_ms", -1),
+    ("peak_rss_mb", -1),
+)
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+def symbol_names(count):
+    return [f"BENCH{i:04d}" for i in range(count)]
+
+def make_payloads(args):
+    """One deterministic payload per symbol (same seeds every run)."""
+    return {
+        symbol: make_intraday_payload(symbol, args["bars"], interval="1min", seed=i, bad_share=args["bad_share"])
+        for i, symbol in enumerate(symbol_names(args["symbols"]))
+    }
+
+def peak_rss_mb():
+    """Peak resident set size of this process (ru_maxrss is KiB on Linux, bytes on macOS)."""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+def summarize(latencies, records, rejected=0, bytes_in=0):
+    """Stage result from per-unit latencies (seconds) and counts."""
+    seconds = sum(latencies)
+    return {
+        "units": len(latencies),
+        "records": records,
+        "rejected": rejected,
+        "bytes_in": bytes_in,
+        "seconds": round(seconds, 4),
+        "records_per_sec": round(records / seconds, 1) if seconds else None,
+        "latency_p50_ms": round(percentile(latencies, 50) * 1000, 3),
+        "latency_p99_ms": round(percentile(latencies, 99) * 1000, 3),
+    }
+
+def timed(units, func):
+    """Run func(unit) for every unit, returning (results, per-unit latencies)."""
+    results, latencies = [], []
+    for unit in units:
+        start = time.perf_counter()
+        results.append(func(unit))
+        latencies.append(time.perf_counter() - start)
+    return results, latencies
+
+# --- Stages (each runs in its own process so peak RSS is per stage) ---
+
+def stage_extract(args):
+    """fetch_api_data against the local mock server, one request per symbol."""
+    from benchmarks.mock_server import MockAlphaVantage
+    from utils.api_requests import ApiClient, fetch_api_data
+
+    symbols = symbol_names(args["symbols"])
+    with MockAlphaVantage(args["bars"], bad_share=args["bad_share"]) as mock, ApiClient(log_timings=False) as client:
+        # Warm the server's payload cache outside the timed loop
+        bytes_in = sum(len(mock.payload(symbol, "1min")) for symbol in symbols)
+        url = f"{mock.endpoint}?function=TIME_SERIES_INTRADAY&interval=1min&apikey=demo&symbol="
+        responses, latencies = timed(symbols, lambda symbol: fetch_api_data(url + symbol, 30, client=client))
+
+    records = sum(len(data["Time Series (1min)"]) for data in responses)
+    return summarize(latencies, records, bytes_in=bytes_in)
+
+def stage_parse(args):
+    """json.loads of raw response bodies (the cost of reading raw files)."""
+    bodies = [json.dumps(payload) for payload in make_payloads(args).values()]
+    parsed, latencies = timed(bodies, json.loads)
+    records = sum(len(data["Time Series (1min)"]) for data in parsed)
+    return summarize(latencies, records, bytes_in=sum(len(body) for body in bodies))
+
+def stage_transform_threaded(args):
+    """transform_and_validate_data over a ThreadPoolExecutor, as main_transform's threaded engine."""
+    from utils.data_validation import transform_and_validate_data
+
+    series = [payload["Time Series (1min)"] for payload in make_payloads(args).values()]
+
+    def run(time_series):
+        with ThreadPoolExecutor() as executor:
+            results = executor.map(lambda item: transform_and_validate_data(item, REQUIRED_FIELDS), time_series.items())
+            return [result for result in results if result is not None]
+
+    processed, latencies = timed(series, run)
+    total = sum(len(time_series) for time_series in series)
+    kept = sum(len(records) for records in processed)
+    return summarize(latencies, total, rejected=total - kept)
+
+def stage_transform_vectorized(args):
+    """transform_columnar, as main_transform's vectorized engine."""
+    from utils.vectorized_transform import transform_columnar
+
+    series = [payload["Time Series (1min)"] for payload in make_payloads(args).values()]
+    results, latencies = timed(series, lambda time_series: transform_columnar(time_series, REQUIRED_FIELDS))
+    total = sum(len(time_series) for time_series in series)
+    rejected = sum(int(reject.sum()) for _, reject in results)
+    return summarize(latencies, total, rejected=rejected)
+
+def _processed_batches(args):
+    from utils.data_validation import transform_time_series
+
+    return [
+        (symbol, transform_time_series(payload["Time Series (1min)"], REQUIRED_FIELDS)[0])
+        for symbol, payload in make_payloads(args).items()
+    ]
+
+class _NullCopyCursor:
+    """Cursor stand-in that drains COPY buffers, measuring encoding cost without a database."""
+
+    def copy_expert(self, sql, file, size=8192):
+        while file.read(size):
+            pass
+
+def stage_load(args):
+    """upsert_records into Postgres, or COPY encoding into a null sink without --database-url."""
+    from utils.db_loader import stage_rows, upsert_records
+
+    batches = _processed_batches(args)
+    records = sum(len(batch) for _, batch in batches)
+
+    if not args["database_url"]:
+        cursor = _NullCopyCursor()
+        created_at = datetime.utcnow()
+
+        _, latencies = timed(
+            batches,
+            lambda batch: stage_rows(cursor, batch[1], created_at, symbol=batch[0], interval="1min"),
+        )
+        return summarize(latencies, records)
+
+    from sqlalchemy import create_engine, text
+    from schema import Base
+
+    engine = create_engine(args["database_url"])
+    Base.metadata.create_all(engine)
+    cleanup = text("DELETE FROM intraday_data WHERE symbol LIKE 'BENCH%'")
+    with engine.begin() as connection:
+        connection.execute(cleanup)
+    try:
+        _, latencies = timed(
+            batches,
+            lambda batch: upsert_records(engine, batch[1], symbol=batch[0], interval="1min"),
+        )
+    finally:
+        with engine.begin() as connection:
+            connection.execute(cleanup)
+        engine.dispose()
+    return summarize(latencies, records)
+
+STAGES = {
+    "extract.fetch": stage_extract,
+    "extract.parse": stage_parse,
+    "transform.threaded": stage_transform_threaded,
+    "transform.vectorized": stage_transform_vectorized,
+    "load.upsert": stage_load,
+    "load.copy_encode": stage_load,
+}
+
+def _run_stage(name, args):
+    logging.getLogger().addHandler(logging.NullHandler())  # Rejected bars log, as in real runs, but quietly
+    result = STAGES[name](args)
+    result["peak_rss_mb"] = round(peak_rss_mb(), 1)
+    return result
+
+def run_suite(args, stages, repeat=3):
+    """
+    Run each stage `repeat` times, each in a fresh (spawned) process, and keep
+    the run with the median throughput to damp scheduler noise.
+    """
+    context = multiprocessing.get_context("spawn")
+    results = {}
+    for name in stages:
+        runs = []
+        for _ in range(repeat):
+            with context.Pool(1) as pool:
+                runs.append(pool.apply(_run_stage, (name, args)))
+        runs.sort(key=lambda run: run["records_per_sec"] or 0)
+        result = results[name] = runs[len(runs) // 2]
+        print(f"{name:>22}: {result['records_per_sec'] or 0:>12,.0f} rec/s  "
+              f"p50 {result['latency_p50_ms']:>9.2f}ms  p99 {result['latency_p99_ms']:>9.2f}ms  "
+              f"rss {result['peak_rss_mb']:>7.1f}MB")
+    return results
+
+def compare(results, baseline, tolerance):
+    """
+    Compare stage results with a baseline.
+
+    Returns:
+        list: Human-readable regressions (metric worse than baseline by more than tolerance).
+    """
+    if baseline["meta"]["workload"] != results["meta"]["workload"]:
+        print(f"Warning: baseline workload {baseline['meta']['workload']} differs from this run.")
+
+    regressions = []
+    for stage, current in results["stages"].items():
+        previous = baseline["stages"].get(stage)
+        if not previous:
+            continue
+        for metric, direction in COMPARED_METRICS:
+            old, new = previous.get(metric), current.get(metric)
+            if not old or new is None:
+                continue
+            change = (new - old) / old
+            marker = ""
+            if change * direction < -tolerance:
+                marker = "  REGRESSION"
+                regressions.append(f"{stage} {metric}: {old} -> {new} ({change:+.1%})")
+            print(f"{stage:>22} {metric:>16}: {old:>12} -> {new:>12} ({change:+7.1%}){marker}")
+    return regressions
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark every ETL stage on synthetic payloads.")
+    parser.add_argument("--symbols", type=int, default=20)
+    parser.add_argument("--bars", type=int, default=5000, help="Bars per symbol.")
+    parser.add_argument("--bad-share", type=float, default=0.01, help="Fraction of bars that fail validation.")
+    parser.add_argument("--database-url", help="Load into this Postgres; otherwise time COPY encoding only.")
+    parser.add_argument("--stages", nargs="+", help="Subset of stages to run.")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per stage; the median run is reported.")
+    parser.add_argument("--output", help="Write JSON results to this path.")
+    parser.add_argument("--baseline", default=str(DEFAULT_BASELINE), help="Baseline results to compare with.")
+    parser.add_argument("--save-baseline", action="store_true", help="Store this run as the new baseline.")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed relative slowdown before failing.")
+    args = parser.parse_args()
+
+    workload = {"symbols": args.symbols, "bars": args.bars, "bad_share": args.bad_share, "repeat": args.repeat}
+    load_stage = "load.upsert" if args.database_url else "load.copy_encode"
+    stages = args.stages or ["extract.fetch", "extract.parse", "transform.threaded", "transform.vectorized", load_stage]
+    unknown = [stage for stage in stages if stage not in STAGES]
+    if unknown:
+        raise SystemExit(f"Unknown stages: {', '.join(unknown)}. Choose from {', '.join(STAGES)}.")
+
+    results = {
+        "meta": {
+            "workload": workload,
+            "created": datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+        },
+        "stages": run_suite(dict(workload, database_url=args.database_url), stages, args.repeat),
+    }
+
+    if args.output:
+        Path(args.output).write_text(json.dumps(results, indent=2))
+
+    baseline_path = Path(args.baseline)
+    if args.save_baseline:
+        baseline_path.write_text(json.dumps(results, indent=2))
+        print(f"Baseline saved to {baseline_path}.")
+    elif baseline_path.exists():
+        regressions = compare(results, json.loads(baseline_path.read_text()), args.tolerance)
+        if regressions:
+            print(f"{len(regressions)} regression(s) beyond {args.tolerance:.0%}:")
+            for regression in regressions:
+                print(f"  {regression}")
+            raise SystemExit(1)
+        print("No regressions against baseline.")
+    else:
+        print(f"No baseline at {baseline_path}; run with --save-baseline to create one.")
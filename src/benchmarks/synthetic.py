@@ -0,0 +1,65 @@
+##############################################
+# Title: Synthetic Payload Script
+# Author: Christopher Romanillos
+# Description: Generates TIME_SERIES_INTRADAY
+# shaped payloads for benchmarks.
+# Date: 01/11/25
+# Version: 1.1
+##############################################
+import random
+from datetime import datetime, timedelta
+
+def make_intraday_payload(symbol, bars, interval='5min', start=datetime(2024, 11, 1, 4, 0), seed=None, bad_share=0.0):
+    """
+    Build an Alpha Vantage style TIME_SERIES_INTRADAY response.
+
+    Args:
+        symbol (str): Ticker symbol for the Meta Data block.
+        bars (int): Number of bars in the time series.
+        interval (str): Interval label, e.g. "5min".
+        start (datetime): Timestamp of the oldest bar.
+        seed (int): Optional random seed for reproducible prices.
+        bad_share (float): Fraction of bars (0-1) corrupted so validation rejects
+            them, alternating between a missing field and a non-numeric value.
+
+    Returns:
+        dict: Payload with "Meta Data" and "Time Series (<interval>)".
+    """
+    rng = random.Random(seed)
+    step = timedelta(minutes=int(interval.rstrip('min')))
+    price = 100.0
+    series = {}
+    bad_every = round(1 / bad_share) if bad_share else 0
+
+    for i in range(bars):
+        open_ = price
+        close = max(0.01, open_ + rng.uniform(-0.5, 0.5))
+        high = max(open_, close) + rng.uniform(0, 0.25)
+        low = max(0.01, min(open_, close) - rng.uniform(0, 0.25))
+        series[(start + step * i).strftime('%Y-%m-%d %H:%M:%S')] = {
+            "1. open": f"{open_:.4f}",
+            "2. high": f"{high:.4f}",
+            "3. low": f"{low:.4f}",
+            "4. close": f"{close:.4f}",
+            "5. volume": str(rng.randint(100, 100000)),
+        }
+        if bad_every and i % bad_every == bad_every - 1:
+            bar = series[(start + step * i).strftime('%Y-%m-%d %H:%M:%S')]
+            if (i // bad_every) % 2:
+                bar["2. high"] = "N/A"
+            else:
+                del bar["5. volume"]
+        price = close
+
+    return {
+        "Meta Data": {
+            "1. Information": f"Intraday ({interval}) open, high, low, close prices and volume",
+            "2. Symbol": symbol,
+            "3. Last Refreshed": (start + step * (bars - 1)).strftime('%Y-%m-%d %H:%M:%S'),
+            "4. Interval": interval,
+            "5. Output Size": "Compact",
+            "6. Time Zone": "US/Eastern",
+        },
+        # Alpha Vantage returns newest bars first
+        f"Time Series ({interval})": dict(reversed(list(series.items()))),
+    }
@@ -0,0 +1,51 @@
+##############################################
+# Title: ETL Command Line
+# Author: Christopher Romanillos
+# Description: Single entry point for every ETL
+#   step. Only the chosen subcommand's module is
+#   imported, and config, logging and database
+#   engines are created when it runs.
+# Usage (from src/):
+#   python etl.py extract
+#   python etl.py transform
+#   python etl.py load --mode copy
+#   python etl.py backfill --start 2022-01 --symbols IBM
+# Date: 05/17/25
+# Version: 1.0
+##############################################
+import sys
+import argparse
+import importlib
+
+# Subcommand -> (module with a main(argv) function, help)
+COMMANDS = {
+    "extract": ("main_api_extract", "Extract api.symbol / api.interval to data/raw_data."),
+    "multi-extract": ("main_multi_extract", "Extract every configured symbol/interval concurrently."),
+    "transform": ("main_transform", "Transform pending raw files to data/processed_data."),
+    "load": ("load_data", "Load pending processed files into intraday_data."),
+    "pipeline": ("main_pipeline", "Streaming extract -> transform -> load in one process."),
+    "scheduler": ("main_scheduler", "Run the streaming pipeline after every bar closes."),
+    "backfill": ("main_backfill", "Backfill a date range month by month."),
+    "rollups": ("main_rollups", "Rebuild or verify the rollup tables."),
+    "dead-letters": ("main_dead_letters", "Summarize or replay rejected bars/records."),
+}
+
+def command_main(command):
+    """Import a subcommand's module (and with it, only the dependencies it needs)."""
+    module_name, _ = COMMANDS[command]
+    return importlib.import_module(module_name).main
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="etl.py",
+        description="Alpha Vantage ETL. `python etl.py <command> --help` for a command's options.",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="commands:\n" + "\n".join(f"  {name:<14}{help_}" for name, (_, help_) in COMMANDS.items()),
+    )
+    parser.add_argument("command", choices=list(COMMANDS), metavar="command", help="One of the commands below.")
+    parser.add_argument("args", nargs=argparse.REMAINDER, help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+    return command_main(args.command)(args.args)
+
+if __name__ == "__main__":
+    sys.exit(main())
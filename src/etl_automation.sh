@@ -1,5 +1,8 @@
 #!/bin/bash
 
+# One-shot run for cron. For a resident process that keeps the HTTP client,
+# database pool and config warm between runs, use `etl.py scheduler` instead.
+
 # Load the .env file if it exists
 if [ -f $SCRIPT_DIR/.env ]; then
     source $SCRIPT_DIR/.env
@@ -8,27 +11,27 @@ else
     exit 1
 fi
 
-# Run main_api_extract.py
-echo "Running main_api_extract.py..."
-python3 $SCRIPT_DIR/main_api_extract.py
+# Run the extract step
+echo "Running etl.py extract..."
+python3 $SCRIPT_DIR/etl.py extract
 if [ $? -ne 0 ]; then
-    echo "Error running main_api_extract.py"
+    echo "Error running etl.py extract"
     exit 1
 fi
 
-# Run main_transform.py
-echo "Running main_transform.py..."
-python3 $SCRIPT_DIR/main_transform.py
+# Run the transform step
+echo "Running etl.py transform..."
+python3 $SCRIPT_DIR/etl.py transform
 if [ $? -ne 0 ]; then
-    echo "Error running main_transform.py"
+    echo "Error running etl.py transform"
     exit 1
 fi
 
-# Run load_data.py
-echo "Running load_data.py..."
-python3 $SCRIPT_DIR/load_data.py
+# Run the load step
+echo "Running etl.py load..."
+python3 $SCRIPT_DIR/etl.py load
 if [ $? -ne 0 ]; then
-    echo "Error running load_data.py"
+    echo "Error running etl.py load"
     exit 1
 fi
 
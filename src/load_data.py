@@ -6,103 +6,275 @@
 # ! ASSUMES DATABASE FROM POSTGRES_DATABAS_URL 
 # ALREADY EXISTS. MAKE MANUALLY OR VIA SCRIPT !
 # Date: 12/08/24
-# Version: 1.0
+# Version: 2.0
 ##############################################
-import os
 import json
 import logging
-from datetime import datetime
+import argparse
 from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
 from sqlalchemy.orm import sessionmaker
 from sqlalchemy import create_engine
-from dotenv import load_dotenv
 from utils.utils import setup_logging
-from schema import IntradayData
-from utils.file_handler import get_latest_file
-
-# Set your PostgreSQL database URL
-load_dotenv()
-
-# Get the database URL from env variables.
-DATABASE_URL = os.getenv("POSTGRES_DATABASE_URL") 
-if not DATABASE_URL:
-    logging.error("DATABASE_URL is not set in the environment variables.")
-    exit(1) 
-
-# Set up logging
-log_file = Path(__file__).resolve().parent.parent / 'logs' / 'data_load.log'
-setup_logging(log_file) 
-
-# Set up database connection
-try:
-    engine = create_engine(DATABASE_URL)
-    Session = sessionmaker(bind=engine)
-    logging.info("Database connection established successfully.")
-except Exception as e:
-    logging.error(f"Failed to create database engine: {e}")
-    exit(1)
-
-def load_data():
-    """Load processed JSON data into the database."""
-    data_dir = Path(__file__).parent.parent / 'data' / 'processed_data'
+from utils.config import load_config, load_env_variables
+from utils.manifest import FileManifest
+from utils.db_loader import copy_records, upsert_records, orm_load_records
+from utils.parallel_load import parallel_upsert
+from utils.instrumentation import configure_metrics, span
+from utils.delta import HighWaterMarks, latest_by_pair
+from utils.rollups import ROLLUP_TARGETS, refresh_rollups, time_ranges_by_pair
+from utils.dead_letter import configure_dead_letters, get_dead_letters
 
-    if not data_dir.exists() or not data_dir.is_dir():
-        logging.error(f"Processed data directory does not exist: {data_dir}")
-        return
+# Settings from config.yaml and the database engine, created by configure() when the
+# command runs rather than at import
+LOAD_MODE = 'upsert'
+ON_CONFLICT = 'update'
+COPY_CHUNK_SIZE = 50000
+FILE_WORKERS = 4
+PARALLEL_SETTINGS = {}
+PARALLEL_WORKERS = 4
+QUALITY_SETTINGS = {}
+DEFAULT_SYMBOL = None
+DEFAULT_INTERVAL = '5min'
+DELTA_SETTINGS = {}
+ROLLUP_SETTINGS = {}
+MANIFEST_PATH = None
+engine = None
+Session = None
 
-    most_recent_file = get_latest_file(data_dir)
-    if not most_recent_file:
-        return
+def configure():
+    """Set up logging, read config.yaml and create the database engine; exits 1 without a database URL."""
+    global LOAD_MODE, ON_CONFLICT, COPY_CHUNK_SIZE, FILE_WORKERS, PARALLEL_SETTINGS, PARALLEL_WORKERS, QUALITY_SETTINGS
+    global DEFAULT_SYMBOL, DEFAULT_INTERVAL, DELTA_SETTINGS, ROLLUP_SETTINGS, MANIFEST_PATH, engine, Session
+
+    # Set up logging
+    log_file = Path(__file__).resolve().parent.parent / 'logs' / 'data_load.log'
+    setup_logging(log_file)
+
+    # Get the database URL from env variables (and the .env file)
+    database_url = load_env_variables("POSTGRES_DATABASE_URL")
+    if not database_url:
+        logging.error("DATABASE_URL is not set in the environment variables.")
+        raise SystemExit(1)
+
+    # Load settings (mode: "upsert" merges via a staging table, "parallel" runs
+    # sharded upserts over several connections, "copy" appends with COPY, "orm"
+    # uses bulk_save_objects)
+    config_path = Path(__file__).resolve().parent.parent / 'config' / 'config.yaml'
+    config = load_config(config_path)
+    load_settings = config.get('load', {})
+    LOAD_MODE = load_settings.get('mode', 'upsert')
+    ON_CONFLICT = load_settings.get('on_conflict', 'update')
+    COPY_CHUNK_SIZE = load_settings.get('copy_chunk_size', 50000)
+    FILE_WORKERS = load_settings.get('file_workers', 4)
+    PARALLEL_SETTINGS = load_settings.get('parallel', {})
+    PARALLEL_WORKERS = PARALLEL_SETTINGS.get('workers', 4)
+    # Set-based checks run on each batch's staging table (utils/quality.py)
+    QUALITY_SETTINGS = config.get('quality', {})
+
+    # Per-stage timing spans (no-ops unless metrics.enabled)
+    configure_metrics(config.get('metrics', {}), process='load')
+
+    # Symbol/interval assumed for processed files written before records carried them
+    DEFAULT_SYMBOL = config['api']['symbol']
+    DEFAULT_INTERVAL = config['api'].get('interval', '5min')
+
+    # Delta mode: keep the cached high-water marks current after every load
+    DELTA_SETTINGS = config.get('delta', {})
+
+    # Rollups: refresh the downsampled buckets each batch touched
+    ROLLUP_SETTINGS = config.get('rollups', {})
 
-    # Load and validate JSON data
-    data = []
+    # Manifest of processed files already loaded (path relative to src/, like config directories)
+    MANIFEST_PATH = Path(__file__).resolve().parent / config.get('manifest', {}).get('path', '../data/manifest.db')
+
+    # Set up database connection
     try:
-        with open(most_recent_file, 'r') as file:
-            data = json.load(file)
-            logging.info(f"Loaded data from {most_recent_file}.")
+        # Pool sized so every parallel load worker holds its own connection
+        engine = create_engine(database_url, pool_size=max(5, PARALLEL_WORKERS), pool_pre_ping=True)
+        Session = sessionmaker(bind=engine)
+        logging.info("Database connection established successfully.")
+    except Exception as e:
+        logging.error(f"Failed to create database engine: {e}")
+        raise SystemExit(1)
+
+    # Records the loader rejects are buffered with error codes and written in bulk (see utils/dead_letter.py)
+    configure_dead_letters(config.get('dead_letter', {}), process='load', engine=engine,
+                           base_dir=Path(__file__).resolve().parent)
+
+def read_processed_file(file_path):
+    """
+    Read one processed file, returning its contents (or None if unreadable).
+
+    JSON files yield a list of record dicts; Parquet files are memory-mapped
+    into a typed Arrow table that the COPY loaders consume without per-row objects.
+    Either way every row carries the file name as `source`, so the quality
+    checks reject only copies of a bar that conflict within one file.
+    """
+    # Imported on first use, so `etl.py load` starts without pyarrow (see etl.py)
+    import pyarrow as pa
+    from utils.parquet_store import read_processed_parquet
+
+    try:
+        with span('load.read', file=file_path.name) as read_span:
+            if file_path.suffix == '.parquet':
+                data = read_processed_parquet(file_path)
+                data = data.append_column('source', pa.repeat(pa.scalar(file_path.name), data.num_rows))
+            else:
+                with open(file_path, 'r') as file:
+                    data = json.load(file)
+                if isinstance(data, list):
+                    for record in data:
+                        record['source'] = file_path.name
+            read_span.add(bytes_in=file_path.stat().st_size, records_out=len(data))
+        logging.info(f"Loaded data from {file_path}.")
+        return data
     except FileNotFoundError:
-        logging.error(f"File not found: {most_recent_file}")
-        return
+        logging.error(f"File not found: {file_path}")
     except json.JSONDecodeError as e:
-        logging.error(f"Failed to decode JSON: {e}")
-        return
+        logging.error(f"Failed to decode JSON in {file_path}: {e}")
+    except pa.ArrowException as e:
+        logging.error(f"Failed to read Parquet file {file_path}: {e}")
+    return None
 
-    # Validate JSON structure and insert records
-    new_records = []
-    required_keys = {'timestamp', 'open', 'high', 'low', 'close', 'volume'}
-    for record in data:
-        missing_keys = required_keys - record.keys()
-        if missing_keys:
-            logging.warning(f"Skipping invalid record: {record}. Missing keys: {missing_keys}")
-            continue
+def load_batch(data, mode):
+    """Insert one batch (record dicts or an Arrow table) with the given loader mode."""
+    if mode in ('upsert', 'parallel', 'copy'):
         try:
-            new_records.append(
-                IntradayData(
-                    timestamp=datetime.fromisoformat(record['timestamp']),
-                    open=float(record['open']),
-                    high=float(record['high']),
-                    low=float(record['low']),
-                    close=float(record['close']),
-                    volume=int(record['volume']),
-                    created_at=datetime.utcnow() 
-                )
-            )
-        except Exception as e:
-            logging.warning(f"Failed to process record: {record}, error: {e}")
-        
-    # Bulk insert and handle database errors
+            with span('load.db', mode=mode) as db_span:
+                if mode == 'parallel':
+                    summary = parallel_upsert(
+                        engine, data,
+                        workers=PARALLEL_WORKERS,
+                        on_conflict=ON_CONFLICT,
+                        chunk_size=COPY_CHUNK_SIZE,
+                        symbol=DEFAULT_SYMBOL,
+                        interval=DEFAULT_INTERVAL,
+                        max_attempts=PARALLEL_SETTINGS.get('max_attempts', 3),
+                        backoff_base=PARALLEL_SETTINGS.get('backoff_base', 1.0),
+                        quality=QUALITY_SETTINGS,
+                    )
+                    if summary['failed']:
+                        # Committed shards stay; the files are retried (idempotently) next run
+                        raise RuntimeError(f"{summary['failed']} of {summary['shards']} shards failed.")
+                    written = summary['inserted'] + summary['updated']
+                elif mode == 'upsert':
+                    counts = upsert_records(engine, data, on_conflict=ON_CONFLICT, chunk_size=COPY_CHUNK_SIZE,
+                                            symbol=DEFAULT_SYMBOL, interval=DEFAULT_INTERVAL,
+                                            quality=QUALITY_SETTINGS)
+                    written = counts['inserted'] + counts['updated']
+                else:
+                    written = copy_records(engine, data, chunk_size=COPY_CHUNK_SIZE,
+                                           symbol=DEFAULT_SYMBOL, interval=DEFAULT_INTERVAL,
+                                           quality=QUALITY_SETTINGS)
+                db_span.add(records_in=len(data), records_out=written)
+            return
+        except NotImplementedError as e:
+            logging.warning(f"{e} Falling back to ORM bulk load.")
+    with span('load.db', mode='orm') as db_span:
+        written = orm_load_records(Session, data, symbol=DEFAULT_SYMBOL, interval=DEFAULT_INTERVAL)
+        db_span.add(records_in=len(data), records_out=written)
+
+def refresh_batch_rollups(data):
+    """Refresh the rollup buckets covering a committed batch (a failure leaves the load in place)."""
     try:
-        with Session() as session:
-            session.bulk_save_objects(new_records)
-            session.commit()
-            logging.info(f"Successfully loaded {len(new_records)} records into the database.")
+        with span('load.rollups') as rollup_span:
+            written = refresh_rollups(
+                engine,
+                time_ranges_by_pair(data, DEFAULT_SYMBOL, DEFAULT_INTERVAL),
+                ROLLUP_SETTINGS.get('targets', list(ROLLUP_TARGETS)),
+            )
+            rollup_span.add(records_in=len(data), records_out=sum(written.values()))
     except Exception as e:
-        logging.error(f"Database operation failed: {e}")
+        logging.error(f"Rollup refresh failed: {e}. Run `python etl.py rollups rebuild` for the affected months.")
+
+def load_data(mode=None):
+    """
+    Load every processed file (JSON or Parquet) not yet recorded in the manifest.
+
+    All pending files are read concurrently and loaded in a single batch per
+    format, so catching up after missed runs is one bulk load.
+
+    Args:
+        mode (str): "upsert" (default), "parallel", "copy" or "orm". Falls back to
+            the LOAD_MODE setting from config.yaml when not given.
+    """
+    mode = mode or LOAD_MODE
+    data_dir = Path(__file__).parent.parent / 'data' / 'processed_data'
+
+    if not data_dir.exists() or not data_dir.is_dir():
+        logging.error(f"Processed data directory does not exist: {data_dir}")
+        return
+
+    with FileManifest(MANIFEST_PATH) as manifest:
+        candidates = list(data_dir.glob('*.json')) + list(data_dir.glob('symbol=*/date=*/*.parquet'))
+        pending = manifest.pending('load', candidates)
+        if not pending:
+            logging.info("No pending processed files. Nothing to load.")
+            return
+
+        # Read and decode pending files concurrently
+        with ThreadPoolExecutor(max_workers=FILE_WORKERS) as executor:
+            contents = list(executor.map(read_processed_file, [path for path, _ in pending]))
+
+        loaded_files = [(path, checksum, data) for (path, checksum), data in zip(pending, contents) if data is not None]
+        json_files = [entry for entry in loaded_files if isinstance(entry[2], list)]
+        parquet_files = [entry for entry in loaded_files if not isinstance(entry[2], list)]
+
+        high_water_marks = None
+        if DELTA_SETTINGS.get('enabled', False):
+            high_water_marks = HighWaterMarks(
+                manifest,
+                engine=engine,
+                overlap_minutes=DELTA_SETTINGS.get('overlap_minutes', 30),
+                cache_ttl=DELTA_SETTINGS.get('cache_ttl', 3600),
+            )
+
+        batches = []
+        if json_files:
+            batches.append((json_files, [record for _, _, records in json_files for record in records]))
+        if parquet_files:
+            import pyarrow as pa
+            batches.append((parquet_files, pa.concat_tables([table for _, _, table in parquet_files])))
+
+        for files, data in batches:
+            if not len(data):
+                logging.error("No readable records in pending processed files.")
+                continue
+
+            # Validate records and insert them with the configured loader
+            try:
+                load_batch(data, mode)
+            except Exception as e:
+                logging.error(f"Database operation failed: {e}")
+                continue
+
+            for path, checksum, contents in files:
+                manifest.record('load', path, checksum, len(contents))
+            if high_water_marks:
+                for (symbol, interval), latest in latest_by_pair(data, DEFAULT_SYMBOL, DEFAULT_INTERVAL).items():
+                    high_water_marks.advance(symbol, interval, latest)
+                high_water_marks.save()
+            if ROLLUP_SETTINGS.get('enabled', False):
+                refresh_batch_rollups(data)
+            logging.info(f"Loaded {len(data)} records from {len(files)} processed file(s).")
+
+    # Write rejected records and log their counts per error code
+    get_dead_letters().close()
+
+def main(argv=None):
+    """Load pending processed files (`python etl.py load`)."""
+    arg_parser = argparse.ArgumentParser(prog="etl.py load", description="Load pending processed files.")
+    arg_parser.add_argument("--mode", choices=["upsert", "parallel", "copy", "orm"], help="Loader (default: load.mode).")
+    args = arg_parser.parse_args(argv)
+    configure()
 
-if __name__ == "__main__":
     logging.info("Starting data load process...")
     try:
-        load_data()
+        load_data(args.mode)
         logging.info("Data load process completed successfully.")
     except Exception as e:
         logging.error(f"An unexpected error occurred during the data load process: {e}")
+
+if __name__ == "__main__":
+    main()
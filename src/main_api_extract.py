@@ -3,8 +3,10 @@
 # Author: Christopher Romanillos
 # Description: Extract data from Alpha Vantage
 #   REST API, timestamp, save the file
+# Usage (from src/):
+#   python etl.py extract
 # Date: 10/27/24
-# Version: 1.1
+# Version: 1.7
 ##############################################
 
 from utils.utils import (
@@ -14,73 +16,136 @@ from utils.utils import (
     check_api_errors
 )
 from utils.config import load_config, load_env_variables
-from utils.api_requests import fetch_api_data
+from utils.api_requests import ApiClient, fetch_api_data, download_api_data
+from utils.stream_parse import inspect_payload, append_top_level_key
+from utils.instrumentation import configure_metrics, span
+from utils.payloads import get_descriptor
+from utils.response_cache import ResponseCache, UNCHANGED, request_key
+from urllib.parse import urlencode
 from datetime import datetime
 from pathlib import Path
 import logging
-
-# Set logging configuration to directory logs/extraction_record.log
-log_file_path = Path(__file__).resolve().parent.parent / 'logs' / 'extraction_record.log'
-setup_logging(log_file_path)
-
-try:
-    # Load configuration from config.yaml to a variable
-    config = load_config('../config/config.yaml')
-
-    # Retrieve API type for validation (i.e. "alpha_vantage_intraday")
-    api_type = 'alpha_vantage_intraday' # Validation type via config.yaml
-
-    # Load validation rules for the specific API type
-    validation_rules = config.get('validation', {}).get(api_type, {})
-    required_keys = validation_rules.get('required_keys', [])
-
-    # Validate required configuration keys are present
-    missing_keys = [key for key in required_keys if key not in config['api']]
-    if missing_keys:
-        raise ValueError(f"Missing required config keys: {', '.join(missing_keys)}")
-
-    # Load environment variables
-    api_key = load_env_variables('API_KEY')
-
-    # Build API URL with variables
-    api_endpoint = config['api']['endpoint']
-    timeout_value = config['api']['timeout']
-    symbol = config['api']['symbol']
-    interval = config['api'].get('interval', '5min')
-
-    # Finished API URL
-    url = f"{api_endpoint}?function=TIME_SERIES_INTRADAY&symbol={symbol}&interval={interval}&adjusted=false&apikey={api_key}"
-
-    # Create a timestamp variable for filenames and data tracking
-    timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-
-    # Fetch data from API
-    data = fetch_api_data(url, timeout_value)
-    
-    # Check for API errors
-    if not check_api_errors(data):
-        raise ValueError("API returned an error. See logs for details.")
-
-    # Validate data structure
-    required_fields = ['Meta Data', 'Time Series (5min)']
-    if not validate_data(data, required_fields):
-        raise ValueError("Data validation failed. Required fields not found or invalid.")
-
-    # Add extraction timestamp
-    data['extraction_time'] = timestamp
-
-    # Determine file save path
-    raw_data_dir = Path(__file__).resolve().parent.parent / 'data' / 'raw_data'
-    output_file_path = raw_data_dir / f"data_{timestamp}.json"
-
-    # Save the data
-    save_to_file(data, output_file_path)
-
-    logging.info(f"All tests passed. Data extracted and saved successfully to path {output_file_path}")
-
-except ValueError as ve:
-    logging.error(f"Validation error: {ve}")
-except KeyError as ke:
-    logging.error(f"KeyError: Missing key in the configuration or response. {ke}")
-except Exception as e:
-    logging.error(f"An unexpected error occurred: {e}")
+import argparse
+
+def main(argv=None):
+    """Extract one payload (api.symbol, api.interval) and save it to data/raw_data."""
+    argparse.ArgumentParser(prog="etl.py extract", description="Extract api.symbol / api.interval.").parse_args(argv)
+
+    # Set logging configuration to directory logs/extraction_record.log
+    log_file_path = Path(__file__).resolve().parent.parent / 'logs' / 'extraction_record.log'
+    setup_logging(log_file_path)
+
+    try:
+        # Load configuration from config.yaml to a variable
+        config = load_config('../config/config.yaml')
+
+        # Per-stage timing spans (no-ops unless metrics.enabled)
+        configure_metrics(config.get('metrics', {}), process='extract')
+
+        # Retrieve API type for validation (i.e. "alpha_vantage_intraday")
+        api_type = 'alpha_vantage_intraday' # Validation type via config.yaml
+
+        # Load validation rules for the specific API type
+        validation_rules = config.get('validation', {}).get(api_type, {})
+        required_keys = validation_rules.get('required_keys', [])
+
+        # Validate required configuration keys are present
+        missing_keys = [key for key in required_keys if key not in config['api']]
+        if missing_keys:
+            raise ValueError(f"Missing required config keys: {', '.join(missing_keys)}")
+
+        # Load environment variables
+        api_key = load_env_variables('API_KEY')
+
+        # Build API URL with variables
+        api_endpoint = config['api']['endpoint']
+        timeout_value = config['api']['timeout']
+        symbol = config['api']['symbol']
+        interval = config['api'].get('interval', '5min')
+
+        # Payload layout for api.function/api.interval (see utils/payloads.py)
+        descriptor = get_descriptor(config['api'].get('function', 'TIME_SERIES_INTRADAY'), interval)
+
+        # Finished API URL
+        params = dict(descriptor.request_params, symbol=symbol)
+        url = f"{api_endpoint}?{urlencode(dict(params, apikey=api_key))}"
+
+        # Create a timestamp variable for filenames and data tracking
+        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+
+        # Determine file save path
+        raw_data_dir = Path(__file__).resolve().parent.parent / 'data' / 'raw_data'
+        output_file_path = raw_data_dir / f"data_{timestamp}.json"
+
+        # Revalidate against the response cache when enabled (see utils/response_cache.py)
+        cache = ResponseCache.from_config(config, Path(__file__).resolve().parent)
+        cache_key = request_key(params)
+        try:
+            if config['api'].get('stream_response', False):
+                # Stream the body to disk unparsed, then check it incrementally (see utils/stream_parse.py)
+                partial_file_path = output_file_path.with_suffix('.part')
+                with ApiClient.from_config(config) as client:
+                    written = download_api_data(url, timeout_value, partial_file_path, client=client,
+                                                cache=cache, cache_key=cache_key)
+
+                # Unchanged since the last extraction: no raw file, so nothing to transform or load
+                if written is UNCHANGED:
+                    partial_file_path.unlink(missing_ok=True)
+                    logging.info(f"Response for {symbol} unchanged since the last extraction; nothing saved.")
+                    return
+
+                header, series_key = inspect_payload(partial_file_path)
+                if series_key is None:
+                    partial_file_path.unlink()
+                    if not check_api_errors(header):
+                        raise ValueError("API returned an error. See logs for details.")
+                    raise ValueError("Data validation failed. Required fields not found or invalid.")
+
+                # Add extraction timestamp (in place, the payload is never loaded)
+                append_top_level_key(partial_file_path, 'extraction_time', timestamp)
+                partial_file_path.replace(output_file_path)
+            else:
+                # Fetch data from API over a pooled, keep-alive session
+                with ApiClient.from_config(config) as client:
+                    data = fetch_api_data(url, timeout_value, client=client, cache=cache, cache_key=cache_key)
+
+                # Unchanged since the last extraction: no raw file, so nothing to transform or load
+                if data is UNCHANGED:
+                    logging.info(f"Response for {symbol} unchanged since the last extraction; nothing saved.")
+                    return
+
+                # Check for API errors
+                if not check_api_errors(data):
+                    raise ValueError("API returned an error. See logs for details.")
+
+                # Validate data structure
+                required_fields = ['Meta Data', descriptor.series_key]
+                if not validate_data(data, required_fields):
+                    raise ValueError("Data validation failed. Required fields not found or invalid.")
+
+                # Add extraction timestamp
+                data['extraction_time'] = timestamp
+
+                # Save the data
+                with span("extract.save", symbol=symbol) as save_span:
+                    save_to_file(data, output_file_path)
+                    save_span.add(records_in=1, bytes_out=output_file_path.stat().st_size)
+
+            # The raw file is pending in the manifest until loaded, so the response can be cached now
+            if cache is not None:
+                cache.commit(cache_key)
+        finally:
+            if cache is not None:
+                cache.close()
+
+        logging.info(f"All tests passed. Data extracted and saved successfully to path {output_file_path}")
+
+    except ValueError as ve:
+        logging.error(f"Validation error: {ve}")
+    except KeyError as ke:
+        logging.error(f"KeyError: Missing key in the configuration or response. {ke}")
+    except Exception as e:
+        logging.error(f"An unexpected error occurred: {e}")
+
+if __name__ == "__main__":
+    main()
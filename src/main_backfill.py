@@ -0,0 +1,91 @@
+##############################################
+# Title: Historical Backfill
+# Author: Christopher Romanillos
+# Description: Backfill a date range month by
+#   month (month= / outputsize=full) straight
+#   into intraday_data, resumable.
+# Usage (from src/):
+#   python etl.py backfill --start 2022-01 --end 2024-12 --symbols IBM MSFT --intervals 5min
+# ! ASSUMES DATABASE FROM POSTGRES_DATABASE_URL
+# ALREADY EXISTS (SEE setup.py) !
+# Date: 03/01/25
+# Version: 1.5
+##############################################
+import logging
+import argparse
+from datetime import datetime
+from pathlib import Path
+from sqlalchemy import create_engine
+from utils.utils import setup_logging
+from utils.config import load_config, load_env_variables
+from utils.manifest import FileManifest
+from utils.db_loader import upsert_records
+from utils.backfill import parse_month, backfill_slices, run_backfill
+from utils.instrumentation import configure_metrics
+from utils.dead_letter import configure_dead_letters
+from utils.rollups import ROLLUP_TARGETS, refresh_rollups, time_ranges_by_pair
+
+base_dir = Path(__file__).resolve().parent.parent
+
+def main(argv=None):
+    # Set up logging
+    log_file_path = base_dir / 'logs' / 'backfill.log'
+    setup_logging(log_file_path)
+
+    parser = argparse.ArgumentParser(prog="etl.py backfill", description="Backfill intraday history month by month.")
+    parser.add_argument("--start", required=True, type=parse_month, help="First month, YYYY-MM.")
+    parser.add_argument("--end", type=parse_month, default=datetime.now(), help="Last month, YYYY-MM (default: this month).")
+    parser.add_argument("--symbols", nargs="+", help="Symbols to backfill (default: api.symbols).")
+    parser.add_argument("--intervals", nargs="+", help="Intervals to backfill (default: api.interval).")
+    args = parser.parse_args(argv)
+
+    logging.info("Starting backfill...")
+    try:
+        config = load_config(base_dir / 'config' / 'config.yaml')
+        configure_metrics(config.get('metrics', {}), process='backfill')
+        api_config = config['api']
+        load_settings = config.get('load', {})
+        rollup_settings = config.get('rollups', {})
+
+        database_url = load_env_variables('POSTGRES_DATABASE_URL')
+        if not database_url:
+            raise ValueError("DATABASE_URL is not set in the environment variables.")
+        engine = create_engine(database_url)
+        # Rejected bars/records are buffered with error codes and written in bulk
+        configure_dead_letters(config.get('dead_letter', {}), process='backfill', engine=engine,
+                               base_dir=Path(__file__).resolve().parent)
+
+        def load_slice(symbol, interval, batch):
+            counts = upsert_records(
+                engine, batch,
+                on_conflict=load_settings.get('on_conflict', 'update'),
+                chunk_size=load_settings.get('copy_chunk_size', 50000),
+                symbol=symbol,
+                interval=interval,
+                quality=config.get('quality', {}),
+            )
+            if rollup_settings.get('enabled', False):
+                # A failure here fails the slice, so it is retried (and its buckets refreshed) on rerun
+                refresh_rollups(engine, time_ranges_by_pair(batch),
+                                rollup_settings.get('targets', list(ROLLUP_TARGETS)))
+            return counts['inserted'] + counts['updated']
+
+        slices = backfill_slices(
+            args.symbols or api_config.get('symbols') or [api_config['symbol']],
+            args.intervals or [api_config.get('interval', '5min')],
+            args.start,
+            args.end,
+        )
+        manifest_path = Path(__file__).resolve().parent / config.get('manifest', {}).get('path', '../data/manifest.db')
+        with FileManifest(manifest_path) as manifest:
+            summary = run_backfill(config, load_env_variables('API_KEY'), slices, load_slice, manifest)
+
+        if summary['failed']:
+            raise RuntimeError(f"{summary['failed']} slices failed; rerun to retry them. See logs for details.")
+        logging.info("Backfill completed successfully.")
+    except Exception as e:
+        logging.error(f"Backfill failed: {e}")
+        raise SystemExit(1)
+
+if __name__ == "__main__":
+    main()
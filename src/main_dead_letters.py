@@ -0,0 +1,82 @@
+##############################################
+# Title: Dead Letter Maintenance
+# Author: Christopher Romanillos
+# Description: Summarize the bars/records that
+#   transform and load rejected, or replay them
+#   into intraday_data once they are fixed.
+# Usage (from src/):
+#   python etl.py dead-letters summary
+#   python etl.py dead-letters replay --dry-run
+#   python etl.py dead-letters replay
+# ! ASSUMES DATABASE FROM POSTGRES_DATABASE_URL
+# ALREADY EXISTS (SEE setup.py) !
+# Date: 05/03/25
+# Version: 1.2
+##############################################
+import logging
+import argparse
+from pathlib import Path
+from sqlalchemy import create_engine
+from utils.utils import setup_logging
+from utils.config import load_config, load_env_variables
+from utils.dead_letter import configure_dead_letters, open_source, summarize, replay_dead_letters
+from utils.rollups import ROLLUP_TARGETS, refresh_rollups
+
+base_dir = Path(__file__).resolve().parent.parent
+
+def main(argv=None):
+    # Set up logging
+    log_file_path = base_dir / 'logs' / 'dead_letters.log'
+    setup_logging(log_file_path)
+
+    parser = argparse.ArgumentParser(prog="etl.py dead-letters",
+                                     description="Summarize or replay dead letters (rejected bars and records).")
+    parser.add_argument("command", choices=["summary", "replay"])
+    parser.add_argument("--dry-run", action="store_true", help="Replay: count what would be recovered, load nothing.")
+    parser.add_argument("--allow-outliers", action="store_true",
+                        help="Replay: load bars rejected as outlier returns (after confirming the moves are real).")
+    args = parser.parse_args(argv)
+
+    try:
+        config = load_config(base_dir / 'config' / 'config.yaml')
+        settings = config.get('dead_letter', {})
+
+        engine = None
+        database_url = load_env_variables('POSTGRES_DATABASE_URL')
+        if database_url:
+            engine = create_engine(database_url)
+        elif settings.get('sink') == 'postgres' or (args.command == 'replay' and not args.dry_run):
+            raise ValueError("DATABASE_URL is not set in the environment variables.")
+
+        source = open_source(settings, engine=engine, base_dir=Path(__file__).resolve().parent)
+
+        if args.command == "summary":
+            # A read-only report: print it (logging only reaches logs/dead_letters.log)
+            entries, _ = source.read()
+            for (stage, code), count in sorted(summarize(entries).items()):
+                print(f"{stage + '/' + code:<32} {count:>8}")
+                logging.info(f"{stage}/{code}: {count}")
+            print(f"{len(entries)} dead letters pending replay.")
+            logging.info(f"{len(entries)} dead letters pending replay.")
+        else:
+            if not args.dry_run:
+                # Entries that fail again are written to a new file (or new rows) by this run
+                configure_dead_letters(settings, process='replay', engine=engine,
+                                       base_dir=Path(__file__).resolve().parent)
+            summary = replay_dead_letters(
+                source,
+                engine,
+                transform_engine=config.get('transform', {}).get('engine', 'vectorized'),
+                on_conflict=config.get('load', {}).get('on_conflict', 'update'),
+                dry_run=args.dry_run,
+                quality=dict(config.get('quality', {}), **({'reject_outliers': False} if args.allow_outliers else {})),
+            )
+            rollup_settings = config.get('rollups', {})
+            if summary['ranges'] and rollup_settings.get('enabled', False):
+                refresh_rollups(engine, summary['ranges'], rollup_settings.get('targets', list(ROLLUP_TARGETS)))
+    except Exception as e:
+        logging.error(f"Dead letter {args.command} failed: {e}")
+        raise SystemExit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+##############################################
+# Title: Alpha Vantage Multi-Symbol Intraday Extract
+# Author: Christopher Romanillos
+# Description: Concurrently extract every symbol
+#   listed in config.yaml, save one file each
+# Usage (from src/):
+#   python etl.py multi-extract
+# Date: 01/11/25
+# Version: 1.3
+##############################################
+
+from utils.utils import setup_logging, save_to_file, validate_data
+from utils.config import load_config, load_env_variables
+from utils.async_extract import run_requests
+from utils.payloads import configured_descriptors
+from utils.instrumentation import configure_metrics, span
+from utils.response_cache import ResponseCache, UNCHANGED, request_key
+from datetime import datetime
+from pathlib import Path
+import logging
+import argparse
+
+def main(argv=None):
+    """Extract every configured symbol/interval and save one raw file each."""
+    argparse.ArgumentParser(prog="etl.py multi-extract", description="Extract every configured symbol/interval.").parse_args(argv)
+
+    # Set logging configuration to directory logs/extraction_record.log
+    log_file_path = Path(__file__).resolve().parent.parent / 'logs' / 'extraction_record.log'
+    setup_logging(log_file_path)
+
+    try:
+        # Load configuration from config.yaml to a variable
+        config = load_config('../config/config.yaml')
+        api_config = config['api']
+
+        # Per-stage timing spans (no-ops unless metrics.enabled)
+        configure_metrics(config.get('metrics', {}), process='extract')
+
+        # Symbol universe, falling back to the single configured symbol
+        symbols = api_config.get('symbols') or [api_config['symbol']]
+
+        # Payloads to fetch per symbol: api.function with each of api.intervals (or api.interval)
+        descriptors = configured_descriptors(api_config)
+
+        # Load environment variables
+        api_key = load_env_variables('API_KEY')
+
+        requests = {
+            (symbol, descriptor): dict(descriptor.request_params, symbol=symbol, apikey=api_key)
+            for symbol in symbols
+            for descriptor in descriptors
+        }
+
+        # Create a timestamp variable for filenames and data tracking
+        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+
+        # Fetch every symbol/interval concurrently, revalidating against the
+        # response cache when enabled (see utils/response_cache.py)
+        cache = ResponseCache.from_config(config, Path(__file__).resolve().parent)
+        try:
+            results = run_requests(requests, api_config['endpoint'], api_config, cache=cache)
+
+            raw_data_dir = Path(__file__).resolve().parent.parent / 'data' / 'raw_data'
+            failed = []
+            unchanged = 0
+
+            for (symbol, descriptor), data in results.items():
+                interval = descriptor.interval
+                if data is UNCHANGED:
+                    # Same time series as the last extraction: no file, so nothing to transform or load
+                    unchanged += 1
+                    continue
+                if isinstance(data, Exception) or not validate_data(data, ['Meta Data', descriptor.series_key]):
+                    failed.append(f"{symbol}/{interval}")
+                    continue
+
+                # Add extraction timestamp and save one file per symbol/interval
+                data['extraction_time'] = timestamp
+                output_file_path = raw_data_dir / f"data_{symbol}_{interval}_{timestamp}.json"
+                with span("extract.save", symbol=symbol, interval=interval) as save_span:
+                    save_to_file(data, output_file_path)
+                    save_span.add(records_in=1, bytes_out=output_file_path.stat().st_size)
+
+                # Cache the response only once its raw file is saved (pending in the manifest until loaded)
+                if cache is not None:
+                    cache.commit(request_key(requests[symbol, descriptor]))
+        finally:
+            if cache is not None:
+                cache.close()
+
+        if failed:
+            raise ValueError(f"Extraction failed for symbols: {', '.join(failed)}")
+
+        logging.info(f"All tests passed. {len(requests) - unchanged} symbol/interval payloads extracted and saved to "
+                     f"{raw_data_dir} ({unchanged} unchanged).")
+
+    except ValueError as ve:
+        logging.error(f"Validation error: {ve}")
+    except KeyError as ke:
+        logging.error(f"KeyError: Missing key in the configuration or response. {ke}")
+    except Exception as e:
+        logging.error(f"An unexpected error occurred: {e}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+##############################################
+# Title: Streaming ETL Pipeline
+# Author: Christopher Romanillos
+# Description: Single-process extract ->
+#   transform -> load. Raw/processed files
+#   are optional side-outputs.
+# Usage (from src/):
+#   python etl.py pipeline
+# ! ASSUMES DATABASE FROM POSTGRES_DATABASE_URL
+# ALREADY EXISTS (SEE setup.py) !
+# Date: 01/18/25
+# Version: 1.4
+##############################################
+import logging
+import argparse
+from pathlib import Path
+from sqlalchemy import create_engine
+from utils.utils import setup_logging
+from utils.config import load_config, load_env_variables
+from utils.pipeline import run_pipeline
+from utils.instrumentation import configure_metrics
+from utils.dead_letter import configure_dead_letters
+from utils.manifest import FileManifest
+from utils.delta import HighWaterMarks
+from utils.response_cache import ResponseCache
+
+base_dir = Path(__file__).resolve().parent.parent
+
+def main(argv=None):
+    # Set up logging
+    log_file_path = base_dir / 'logs' / 'pipeline.log'
+    setup_logging(log_file_path)
+
+    argparse.ArgumentParser(prog="etl.py pipeline", description="Streaming extract -> transform -> load.").parse_args(argv)
+
+    logging.info("Starting streaming ETL pipeline...")
+    try:
+        config = load_config(base_dir / 'config' / 'config.yaml')
+        configure_metrics(config.get('metrics', {}), process='pipeline')
+
+        database_url = load_env_variables('POSTGRES_DATABASE_URL')
+        if not database_url:
+            raise ValueError("DATABASE_URL is not set in the environment variables.")
+        engine = create_engine(database_url)
+        # Rejected bars/records are buffered with error codes and written in bulk
+        configure_dead_letters(config.get('dead_letter', {}), process='pipeline', engine=engine,
+                               base_dir=Path(__file__).resolve().parent)
+
+        delta_settings = config.get('delta', {})
+        manifest_path = Path(__file__).resolve().parent / config.get('manifest', {}).get('path', '../data/manifest.db')
+        cache = ResponseCache.from_config(config, Path(__file__).resolve().parent)
+        with FileManifest(manifest_path) as manifest:
+            high_water_marks = None
+            if delta_settings.get('enabled', False):
+                high_water_marks = HighWaterMarks(
+                    manifest,
+                    engine=engine,
+                    overlap_minutes=delta_settings.get('overlap_minutes', 30),
+                    cache_ttl=delta_settings.get('cache_ttl', 3600),
+                )
+            summary = run_pipeline(
+                config,
+                engine,
+                api_key=load_env_variables('API_KEY'),
+                raw_data_dir=base_dir / 'data' / 'raw_data',
+                processed_data_dir=base_dir / 'data' / 'processed_data',
+                high_water_marks=high_water_marks,
+                cache=cache,
+            )
+        if cache is not None:
+            cache.close()
+        if summary['errors']:
+            raise RuntimeError(f"Pipeline finished with {summary['errors']} errors. See logs for details.")
+        logging.info("Streaming ETL pipeline completed successfully.")
+    except Exception as e:
+        logging.error(f"Pipeline failed: {e}")
+        raise SystemExit(1)
+
+if __name__ == "__main__":
+    main()
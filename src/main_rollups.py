@@ -0,0 +1,67 @@
+##############################################
+# Title: Rollup Maintenance
+# Author: Christopher Romanillos
+# Description: Rebuild the 15min/60min/daily
+#   rollup tables from intraday_data history,
+#   or verify them against recomputation.
+# Usage (from src/):
+#   python etl.py rollups rebuild --start 2022-01 --end 2024-12
+#   python etl.py rollups verify --start 2024-01 --end 2024-12 --targets daily
+# ! ASSUMES DATABASE FROM POSTGRES_DATABASE_URL
+# ALREADY EXISTS (SEE setup.py) !
+# Date: 04/05/25
+# Version: 1.1
+##############################################
+import logging
+import argparse
+from datetime import datetime
+from pathlib import Path
+from sqlalchemy import create_engine
+from utils.utils import setup_logging
+from utils.config import load_config, load_env_variables
+from utils.backfill import parse_month
+from utils.partitions import next_month
+from utils.rollups import ROLLUP_TARGETS, rebuild_rollups, verify_rollups
+
+base_dir = Path(__file__).resolve().parent.parent
+
+def main(argv=None):
+    # Set up logging
+    log_file_path = base_dir / 'logs' / 'rollups.log'
+    setup_logging(log_file_path)
+
+    parser = argparse.ArgumentParser(prog="etl.py rollups", description="Rebuild or verify the rollup tables.")
+    parser.add_argument("command", choices=["rebuild", "verify"])
+    parser.add_argument("--start", required=True, type=parse_month, help="First month, YYYY-MM.")
+    parser.add_argument("--end", type=parse_month, default=datetime.now(), help="Last month, YYYY-MM (default: this month).")
+    parser.add_argument("--targets", nargs="+", choices=list(ROLLUP_TARGETS), help="Rollups to process (default: rollups.targets).")
+    parser.add_argument("--symbols", nargs="+", help="Limit to these symbols (default: all).")
+    args = parser.parse_args(argv)
+
+    try:
+        config = load_config(base_dir / 'config' / 'config.yaml')
+        targets = args.targets or config.get('rollups', {}).get('targets', list(ROLLUP_TARGETS))
+
+        database_url = load_env_variables('POSTGRES_DATABASE_URL')
+        if not database_url:
+            raise ValueError("DATABASE_URL is not set in the environment variables.")
+        engine = create_engine(database_url)
+
+        if args.command == "rebuild":
+            logging.info(f"Rebuilding rollups {targets} for {args.start:%Y-%m} to {args.end:%Y-%m}...")
+            written = rebuild_rollups(engine, args.start, args.end, targets, symbols=args.symbols)
+            logging.info(f"Rollup rebuild completed: {written}.")
+        else:
+            results = verify_rollups(engine, args.start, next_month(args.end), targets, symbols=args.symbols)
+            bad = [target for target, counts in results.items()
+                   if counts['missing'] or counts['extra'] or counts['mismatched']]
+            if bad:
+                raise RuntimeError(f"Rollups do not match recomputation for: {', '.join(bad)}. "
+                                   f"Run `python etl.py rollups rebuild` for the range.")
+            logging.info("All rollups match recomputation.")
+    except Exception as e:
+        logging.error(f"Rollup {args.command} failed: {e}")
+        raise SystemExit(1)
+
+if __name__ == "__main__":
+    main()
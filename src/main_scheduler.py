@@ -0,0 +1,107 @@
+##############################################
+# Title: Resident ETL Scheduler
+# Author: Christopher Romanillos
+# Description: Long-running replacement for
+#   cron + etl_automation.sh. Runs the streaming
+#   pipeline just after every bar closes with a
+#   warm HTTP client, engine pool and config.
+# Usage (from src/):
+#   python etl.py scheduler
+# ! ASSUMES DATABASE FROM POSTGRES_DATABASE_URL
+# ALREADY EXISTS (SEE setup.py) !
+# Date: 03/22/25
+# Version: 1.3
+##############################################
+import logging
+import argparse
+from pathlib import Path
+from sqlalchemy import create_engine
+from utils.utils import setup_logging
+from utils.config import load_config, load_env_variables
+from utils.instrumentation import configure_metrics, export_metrics
+from utils.dead_letter import configure_dead_letters, get_dead_letters
+from utils.manifest import FileManifest
+from utils.delta import HighWaterMarks
+from utils.async_extract import AsyncExtractor
+from utils.response_cache import ResponseCache
+from utils.pipeline import run_pipeline
+from utils.scheduler import IntervalScheduler, interval_minutes
+
+base_dir = Path(__file__).resolve().parent.parent
+
+def main(argv=None):
+    # Set up logging
+    log_file_path = base_dir / 'logs' / 'scheduler.log'
+    setup_logging(log_file_path)
+
+    argparse.ArgumentParser(prog="etl.py scheduler", description="Run the streaming pipeline after every bar closes.").parse_args(argv)
+
+    logging.info("Starting ETL scheduler...")
+    try:
+        # Everything below is loaded once and reused by every cycle
+        config = load_config(base_dir / 'config' / 'config.yaml')
+        configure_metrics(config.get('metrics', {}), process='scheduler')
+        api_config = config['api']
+        settings = config.get('scheduler', {})
+        delta_settings = config.get('delta', {})
+
+        api_key = load_env_variables('API_KEY')
+        database_url = load_env_variables('POSTGRES_DATABASE_URL')
+        if not database_url:
+            raise ValueError("DATABASE_URL is not set in the environment variables.")
+        # pre_ping replaces connections the server dropped between cycles
+        engine = create_engine(database_url, pool_pre_ping=True)
+        # Rejected bars/records are buffered with error codes and written in bulk
+        configure_dead_letters(config.get('dead_letter', {}), process='scheduler', engine=engine,
+                               base_dir=Path(__file__).resolve().parent)
+
+        manifest_path = Path(__file__).resolve().parent / config.get('manifest', {}).get('path', '../data/manifest.db')
+        # Unchanged responses skip transform and load (no-op when response_cache is disabled)
+        cache = ResponseCache.from_config(config, Path(__file__).resolve().parent)
+        with FileManifest(manifest_path) as manifest, AsyncExtractor(api_config, cache=cache) as extractor:
+            high_water_marks = None
+            if delta_settings.get('enabled', False):
+                high_water_marks = HighWaterMarks(
+                    manifest,
+                    engine=engine,
+                    overlap_minutes=delta_settings.get('overlap_minutes', 30),
+                    cache_ttl=delta_settings.get('cache_ttl', 3600),
+                )
+
+            def run_cycle(trigger):
+                summary = run_pipeline(
+                    config,
+                    engine,
+                    api_key=api_key,
+                    raw_data_dir=base_dir / 'data' / 'raw_data',
+                    processed_data_dir=base_dir / 'data' / 'processed_data',
+                    high_water_marks=high_water_marks,
+                    extractor=extractor,
+                )
+                if summary['errors']:
+                    logging.warning(f"Cycle finished with {summary['errors']} errors. See logs for details.")
+                if cache is not None:
+                    cache.evict()
+                # Each cycle's rejects reach the sink without waiting for a full buffer
+                get_dead_letters().flush()
+                if settings.get('export_metrics_every_cycle', True):
+                    export_metrics()
+
+            scheduler = IntervalScheduler(
+                run_cycle,
+                interval_minutes(api_config.get('interval', '5min')),
+                delay_seconds=settings.get('delay_seconds', 5),
+            )
+            scheduler.install_signal_handlers()
+            scheduler.run()
+
+        if cache is not None:
+            cache.close()
+        engine.dispose()
+        logging.info("ETL scheduler stopped.")
+    except Exception as e:
+        logging.error(f"Scheduler failed: {e}")
+        raise SystemExit(1)
+
+if __name__ == "__main__":
+    main()
@@ -3,89 +3,401 @@
 # Author: Christopher Romanillos
 # Description: ETL pipeline to validate, process, and store time series data.
 # Date: 11/02/24
-# Version: 2.0
+# Version: 2.9
 ##############################################
 import logging
 import json
-from datetime import datetime
+import argparse
+from pathlib import Path
+from functools import partial
 from concurrent.futures import ThreadPoolExecutor
 from utils.utils import setup_logging, load_config
-from utils.file_handler import get_latest_file, save_processed_data
+from utils.file_handler import save_processed_data, JsonChunkWriter
 from utils.data_validation import transform_and_validate_data
+from utils.manifest import FileManifest
+from utils.instrumentation import configure_metrics, span
+from utils.stream_parse import open_time_series, iter_chunks
+from utils.config import load_env_variables
+from utils.delta import HighWaterMarks
+from utils.payloads import describe_payload, detect_descriptor, meta_symbol_interval, configured_descriptors
+from utils.dead_letter import configure_dead_letters, get_dead_letters, TRANSFORM_ERROR
 
-# Load configuration
-config = load_config("../config/config.yaml")
+# Settings from config.yaml, read by configure() when the command runs rather than at import
+config = None
+transform_engine = "threaded"
+manifest_path = "../data/manifest.db"
+file_workers = 4
+file_executor = "thread"
+process_workers = None
+files_per_task = 8
+parser = "json"
+stream_chunk_size = 10000
+delta_settings = {}
+output_format = "json"
 
-# Ensure required config keys exist
-required_keys = ["log_file", "directories", "required_fields"]
-for key in required_keys:
-    if key not in config:
-        logging.error(f"Missing required configuration key: {key}")
-        raise ValueError(f"Missing required configuration key: {key}")
+def configure(config_path="../config/config.yaml"):
+    """Load config.yaml, set up logging, metrics and dead letters, and read the transform settings."""
+    global config, transform_engine, manifest_path, file_workers, file_executor, process_workers, files_per_task
+    global parser, stream_chunk_size, delta_settings, output_format
 
-# Set up logging
-log_file = config.get("log_file", "default_log_file.log")
-setup_logging(log_file)
+    # Load configuration
+    config = load_config(config_path)
 
-# Main pipeline
-def process_raw_data():
-    try:
-        # Get the latest raw data file
-        raw_data_file = get_latest_file(config["directories"]["raw_data"])
-        if not raw_data_file:
-            raise FileNotFoundError("No raw data files found.")
-        
-        with open(raw_data_file, 'r') as file:
-            raw_data = json.load(file)
+    # Ensure required config keys exist
+    required_keys = ["log_file", "directories"]
+    for key in required_keys:
+        if key not in config:
+            logging.error(f"Missing required configuration key: {key}")
+            raise ValueError(f"Missing required configuration key: {key}")
 
-        # Extract the time series data
-        time_series_data = raw_data.get("Time Series (5min)")
-        if not time_series_data:
-            raise ValueError("Missing 'Time Series (5min)' in raw data.")
+    # Set up logging
+    log_file = config.get("log_file", "default_log_file.log")
+    setup_logging(log_file)
+
+    # Per-stage timing spans (no-ops unless metrics.enabled)
+    configure_metrics(config.get("metrics", {}), process="transform")
+
+    # Rejected bars are buffered with error codes and written in bulk (see utils/dead_letter.py)
+    configure_dead_letters(config.get("dead_letter", {}), process="transform", base_dir=Path(__file__).resolve().parent)
+
+    # Transform engine: "threaded" (per-item executor) or "vectorized" (columnar NumPy)
+    transform_engine = config.get("transform", {}).get("engine", "threaded")
+
+    # Manifest of raw files already transformed, and how many files to transform at once
+    manifest_path = config.get("manifest", {}).get("path", "../data/manifest.db")
+    file_workers = config.get("transform", {}).get("file_workers", 4)
+
+    # File executor: "thread" (file_workers threads, one file each) or "process" (a process
+    # pool over chunks of files_per_task files, for CPU-bound batches)
+    file_executor = config.get("transform", {}).get("executor", "thread")
+    process_workers = config.get("transform", {}).get("process_workers") or None
+    files_per_task = config.get("transform", {}).get("files_per_task", 8)
+
+    # Raw file parsing: "json" (json.load the whole file) or "stream" (incremental, bars in chunks)
+    parser = config.get("transform", {}).get("parser", "json")
+    stream_chunk_size = config.get("transform", {}).get("stream_chunk_size", 10000)
+
+    # Delta mode: drop bars already loaded (minus an overlap window) before transforming
+    delta_settings = config.get("delta", {})
+
+    # Processed output: "json" (list of records) or "parquet" (typed, partitioned by symbol/date)
+    output_format = config.get("transform", {}).get("output_format", "json")
+
+def transform_series(time_series_data, symbol, interval, descriptor):
+    """
+    Transform one "Time Series (...)" mapping (or a chunk of it) with the configured engine.
+
+    The descriptor (utils/payloads.py) supplies the field names and timestamp
+    format, so files of different intervals/functions share one batch.
+
+    Returns:
+        tuple: (processed records, or an Arrow table for Parquet output, number of rejected bars).
+    """
+    # NumPy and pyarrow are imported on first use, so `etl.py transform` starts without them (see etl.py)
+    if transform_engine == "vectorized":
+        from utils.vectorized_transform import transform_columnar, columns_to_records
 
-        # Process data with parallelism
-        processed_data = [] 
-        failed_items = []
-        
-        def safe_transform(item, required_fields):
+        # Columnar transform with bulk parsing and OHLC sanity checks
+        columns, reject = transform_columnar(time_series_data, descriptor=descriptor, symbol=symbol, interval=interval)
+        if output_format == "parquet":
+            from utils.parquet_store import columns_to_table
+
+            processed_data = columns_to_table(columns, reject, symbol, interval)
+        else:
+            processed_data = columns_to_records(columns, reject)
+        rejected = int(reject.sum())
+    else:
+        # Process data with parallelism; invalid bars go to the dead letter queue
+        def safe_transform(item):
             try:
-                return transform_and_validate_data(item, required_fields)
+                return transform_and_validate_data(item, descriptor=descriptor, symbol=symbol, interval=interval)
             except Exception as e:
-                # Log and track failed items
-                logging.error(f"Error transforming item {item}: {e}")
-                failed_items.append({"item": item, "error": str(e)})
+                get_dead_letters().add("transform", TRANSFORM_ERROR, item[1], str(e), symbol, interval,
+                                       descriptor.function, item[0])
                 return None
-        
+
         with ThreadPoolExecutor() as executor:
-            results = executor.map(
-                lambda item: safe_transform(item, config["required_fields"]),
-                time_series_data.items()
-            )
+            results = executor.map(safe_transform, time_series_data.items())
             processed_data = [result for result in results if result is not None]
+        rejected = len(time_series_data) - len(processed_data)
+
+    if output_format == "parquet":
+        if isinstance(processed_data, list):
+            from utils.parquet_store import records_to_table
+
+            processed_data = records_to_table(processed_data, symbol, interval)
+    else:
+        # Tag records so the loader can place multi-symbol batches
+        for record in processed_data:
+            record["symbol"] = symbol
+            record["interval"] = interval
+
+    return processed_data, rejected
+
+class WrittenOutput:
+    """Processed output the streamed transform already saved: the files written and their record count."""
+
+    def __init__(self, paths, records):
+        self.paths = paths
+        self.records = records
+
+    def __len__(self):
+        return self.records
+
+def processed_name(raw_data_file):
+    """Processed file name mirroring the raw file, so a batch never collides."""
+    return raw_data_file.name.replace("data_", "processed_data_", 1)
+
+def open_chunk_writer(raw_data_file):
+    """Writer saving a raw file's processed output chunk by chunk, in transform.output_format."""
+    if output_format == "parquet":
+        from utils.parquet_store import ParquetChunkWriter
+
+        return ParquetChunkWriter(config["directories"]["processed_data"], Path(processed_name(raw_data_file)).stem)
+    return JsonChunkWriter(config["directories"]["processed_data"], processed_name(raw_data_file))
+
+def transform_file_streamed(raw_data_file, high_water_marks=None):
+    """
+    Transform a raw data file without loading it whole.
+
+    Bars are parsed incrementally and transformed `transform.stream_chunk_size`
+    at a time, and each chunk's output is written as soon as it is ready
+    (appended to the JSON list, or as Parquet row groups), so memory follows
+    the chunk size rather than the size of the payload or of its output.
+
+    Returns:
+        tuple: (WrittenOutput, number of rejected bars).
+    """
+    rejected = 0
+    writer = None
+    try:
+        with span("transform.stream", file=raw_data_file.name, engine=transform_engine) as stream_span:
+            with open(raw_data_file, 'rb') as file:
+                header, series_key, bars = open_time_series(file)
+                if series_key is None:
+                    raise ValueError(f"Missing 'Time Series' in raw data file {raw_data_file}.")
+                meta_data = header.get("Meta Data", {})
+                descriptor = detect_descriptor(series_key, meta_data)
+                if descriptor is None:
+                    raise ValueError(f"Unsupported series '{series_key}' in raw data file {raw_data_file}.")
+                symbol, interval = meta_symbol_interval(
+                    meta_data, descriptor, config["api"]["symbol"], config["api"].get("interval", "5min")
+                )
+                if high_water_marks:
+                    bars = high_water_marks.filter_bars(symbol, interval, bars)
+
+                for chunk in iter_chunks(bars, stream_chunk_size):
+                    processed, chunk_rejected = transform_series(chunk, symbol, interval, descriptor)
+                    writer = writer or open_chunk_writer(raw_data_file)
+                    writer.write(processed)
+                    rejected += chunk_rejected
+                    stream_span.add(records_in=len(chunk), records_out=len(processed))
+            stream_span.add(bytes_in=raw_data_file.stat().st_size)
+    except Exception:
+        if writer:
+            writer.abort()
+        raise
 
-        if not processed_data:
-            raise ValueError("No valid data was processed.")
-
-        # Save processed data
-        try:
-            save_processed_data(processed_data, config["directories"]["processed_data"])
-        except Exception as e:
-            logging.error(f"Error saving processed data: {e}")
-            raise
-        
-        # Log failed items to a file for review
-        if failed_items:
-            failed_items_file = f"{config['directories']['logs']}/failed_items_{datetime.now().strftime('%Y%m%d_%H%M%S')}.log"
-            with open(failed_items_file, "w") as f:
-                for failure in failed_items:
-                    f.write(f"{failure}\n")
-            logging.warning(f"Some items failed processing. Details saved in {failed_items_file}")
-            
-        logging.info("All tests passed. ETL pipeline completed successfully.")
+    if writer is None:
+        if high_water_marks:
+            return WrittenOutput([], 0), rejected  # Nothing newer than what is already loaded
+        raise ValueError(f"Missing '{series_key}' in raw data file {raw_data_file}.")
+    if not writer.records:
+        writer.abort()  # Every bar rejected: no processed file
+        return WrittenOutput([], 0), rejected
+    return WrittenOutput(writer.close(), writer.records), rejected
+
+def transform_file(raw_data_file, high_water_marks=None):
+    """
+    Transform a single raw data file.
+
+    Args:
+        raw_data_file (Path): Raw JSON file written by the extract step.
+        high_water_marks (HighWaterMarks): In delta mode, drops bars already loaded.
+
+    Returns:
+        tuple: (processed records, an Arrow table for Parquet output or, with
+            the stream parser, the WrittenOutput already saved; number of rejected bars).
+    """
+    if parser == "stream":
+        return transform_file_streamed(raw_data_file, high_water_marks)
+
+    with span("transform.parse", file=raw_data_file.name) as parse_span:
+        with open(raw_data_file, 'r') as file:
+            raw_data = json.load(file)
+        parse_span.add(bytes_in=raw_data_file.stat().st_size)
+    # Work out which payload this is (intraday interval, daily, adjusted...)
+    descriptor = describe_payload(raw_data)
+    if descriptor is None:
+        raise ValueError(f"Missing 'Time Series' in raw data file {raw_data_file}.")
+    meta_data = raw_data.get("Meta Data", {})
+    symbol, interval = meta_symbol_interval(
+        meta_data, descriptor, config["api"]["symbol"], config["api"].get("interval", "5min")
+    )
+
+    # Extract the time series data
+    time_series_data = raw_data.get(descriptor.series_key)
+    if not time_series_data:
+        raise ValueError(f"Missing '{descriptor.series_key}' in raw data file {raw_data_file}.")
+    if high_water_marks:
+        time_series_data = high_water_marks.filter(symbol, interval, time_series_data)
+        if not time_series_data:
+            return [], 0
+
+    with span("transform.records", file=raw_data_file.name, engine=transform_engine) as transform_span:
+        processed_data, rejected = transform_series(time_series_data, symbol, interval, descriptor)
+        transform_span.add(records_in=len(time_series_data), records_out=len(processed_data))
+    return processed_data, rejected
+
+def _outcome(data, rejected, error):
+    if error:
+        raise ValueError(error)
+    return data, rejected
+
+def transform_in_processes(pending, high_water_marks=None):
+    """
+    Transform pending files on a process pool (transform.executor: process).
+
+    Bars come back from the workers as Arrow tables; JSON output converts
+    them to records here. In delta mode the cutoffs are resolved up front for
+    the configured symbols/intervals (files for other pairs keep every bar).
+
+    Yields:
+        tuple: (raw file, checksum, callable returning (processed data, rejected bars) or raising).
+    """
+    from utils.process_transform import transform_files_in_processes
+
+    cutoffs = {}
+    if high_water_marks:
+        symbols = config["api"].get("symbols") or [config["api"]["symbol"]]
+        pairs = [(symbol, descriptor.interval) for symbol in symbols for descriptor in configured_descriptors(config["api"])]
+        high_water_marks.prefetch(pairs)
+        cutoffs = {pair: high_water_marks.cutoff(*pair) for pair in pairs}
+
+    settings = {
+        "engine": transform_engine,
+        "parser": parser,
+        "stream_chunk_size": stream_chunk_size,
+        "default_symbol": config["api"]["symbol"],
+        "default_interval": config["api"].get("interval", "5min"),
+    }
+    checksums = {str(path): (path, checksum) for path, checksum in pending}
+    with span("transform.processes", files=len(pending), workers=process_workers or 0) as process_span:
+        for path, table, rejected, error in transform_files_in_processes(
+            list(checksums), settings, cutoffs,
+            workers=process_workers,
+            files_per_task=files_per_task,
+            dead_letter_settings=config.get("dead_letter", {}),
+            base_dir=Path(__file__).resolve().parent,
+        ):
+            raw_data_file, checksum = checksums[path]
+            if table is not None:
+                process_span.add(records_out=table.num_rows)
+                if output_format != "parquet":
+                    table = table.to_pylist()
+            yield raw_data_file, checksum, partial(_outcome, table, rejected, error)
+
+# Main pipeline
+def process_raw_data():
+    """Transform every raw data file not yet recorded in the manifest."""
+    try:
+        raw_files = list(Path(config["directories"]["raw_data"]).glob("*.json"))
+        if not raw_files:
+            raise FileNotFoundError("No raw data files found.")
+
+        with FileManifest(manifest_path) as manifest:
+            pending = manifest.pending("transform", raw_files)
+            if not pending:
+                logging.info("No pending raw data files. Nothing to do.")
+                return
+
+            high_water_marks = None
+            if delta_settings.get("enabled", False):
+                # The database is only read when the cached marks are missing or expired
+                from sqlalchemy import create_engine
+
+                database_url = load_env_variables("POSTGRES_DATABASE_URL")
+                high_water_marks = HighWaterMarks(
+                    manifest,
+                    engine=create_engine(database_url) if database_url else None,
+                    overlap_minutes=delta_settings.get("overlap_minutes", 30),
+                    cache_ttl=delta_settings.get("cache_ttl", 3600),
+                )
+
+            # Transform pending files concurrently, then save and record them in order
+            if file_executor == "process":
+                outcomes = transform_in_processes(pending, high_water_marks)
+            else:
+                with ThreadPoolExecutor(max_workers=file_workers) as executor:
+                    outcomes = [
+                        (path, checksum, executor.submit(transform_file, path, high_water_marks).result)
+                        for path, checksum in pending
+                    ]
+
+            rejected = 0
+            failed_files = []
+            for raw_data_file, checksum, outcome in outcomes:
+                try:
+                    processed_data, file_rejected = outcome()
+                    if not len(processed_data) and high_water_marks and not file_rejected:
+                        manifest.record("transform", raw_data_file, checksum, 0)
+                        logging.info(f"No bars in {raw_data_file} newer than the high-water mark.")
+                        continue
+                    if not len(processed_data):
+                        raise ValueError("No valid data was processed.")
+
+                    with span("transform.save", file=raw_data_file.name, format=output_format) as save_span:
+                        if isinstance(processed_data, WrittenOutput):
+                            written = processed_data.paths  # Saved chunk by chunk while streaming
+                        elif output_format == "parquet":
+                            from utils.parquet_store import save_processed_parquet
+
+                            written = save_processed_parquet(
+                                processed_data,
+                                config["directories"]["processed_data"],
+                                stem=Path(processed_name(raw_data_file)).stem,
+                            )
+                        else:
+                            written = [save_processed_data(
+                                processed_data,
+                                config["directories"]["processed_data"],
+                                file_name=processed_name(raw_data_file),
+                            )]
+                        save_span.add(
+                            records_in=len(processed_data),
+                            bytes_out=sum(path.stat().st_size for path in written),
+                        )
+                except Exception as e:
+                    logging.error(f"Error processing {raw_data_file}: {e}")
+                    failed_files.append(raw_data_file)
+                    continue
+
+                manifest.record("transform", raw_data_file, checksum, len(processed_data))
+                rejected += file_rejected
+                logging.info(f"Transformed {raw_data_file} ({len(processed_data)} records).")
+
+            if high_water_marks:
+                high_water_marks.save()
+
+        # Rejected bars were buffered as dead letters; write them and log the counts per error code
+        get_dead_letters().close()
+        if rejected:
+            logging.warning(f"{rejected} bars rejected. Fix and reprocess them with `python etl.py dead-letters replay`.")
+
+        if failed_files:
+            raise ValueError(f"{len(failed_files)} of {len(pending)} raw files failed to transform.")
+
+        logging.info(f"All tests passed. ETL pipeline completed successfully ({len(pending)} files).")
 
     except Exception as e:
         logging.error(f"Pipeline failed: {e}")
         raise
 
-if __name__ == "__main__":
+def main(argv=None):
+    """Transform pending raw files (`python etl.py transform`)."""
+    argparse.ArgumentParser(prog="etl.py transform", description="Transform pending raw files.").parse_args(argv)
+    configure()
     process_raw_data()
+
+if __name__ == "__main__":
+    main()
@@ -2,12 +2,12 @@
 # Title: Schema Script
 # Author: Christopher Romanillos
 # Description: Defines schema for postgres
-# ETL pipeline. 
+# ETL pipeline.
 # Date: 11/23/24
-# Version: 1.0
+# Version: 2.3
 ##############################################
-from sqlalchemy import Column, Integer, BigInteger, Float, DateTime
-from sqlalchemy.ext.declarative import declarative_base
+from sqlalchemy import Column, BigInteger, Integer, Float, DateTime, String, Text, Index, UniqueConstraint
+from sqlalchemy.ext.declarative import declarative_base, declared_attr
 from datetime import datetime
 
 Base = declarative_base()
@@ -15,12 +15,23 @@ Base = declarative_base()
 class IntradayData(Base):
     """
     SQLAlchemy model for intraday time-series data.
-    Defines schema for storing OHLCV data with timestamps.
+    Defines schema for storing OHLCV bars per symbol and interval.
+
+    The table is range partitioned by month on `timestamp` (see
+    utils/partitions.py and setup.py for partition maintenance), so the
+    primary key and unique key both include the partition column.
     """
     __tablename__ = 'intraday_data'  # Table name in PostgreSQL
+    __table_args__ = (
+        UniqueConstraint('symbol', 'interval', 'timestamp', name='uq_intraday_data_symbol_interval_timestamp'),
+        Index('ix_intraday_data_timestamp_brin', 'timestamp', postgresql_using='brin'),  # Cheap range scans
+        {'postgresql_partition_by': 'RANGE (timestamp)'},
+    )
 
     id = Column(BigInteger, primary_key=True, autoincrement=True)  # Scalable ID
-    timestamp = Column(DateTime, nullable=False, unique=True, index=True)  # Unique time-series data
+    symbol = Column(String(16), nullable=False)  # Ticker, e.g. IBM
+    interval = Column(String(16), nullable=False)  # Bar size, e.g. 5min
+    timestamp = Column(DateTime, primary_key=True, nullable=False)  # Partition key
     open = Column(Float, nullable=False)  # OHLC and volume data
     high = Column(Float, nullable=False)
     low = Column(Float, nullable=False)
@@ -28,6 +39,85 @@ class IntradayData(Base):
     volume = Column(BigInteger, nullable=False)
     created_at = Column(DateTime, default=datetime.utcnow)  # When record was first inserted
 
+class RollupColumns:
+    """
+    Columns shared by the downsampled bar tables (see utils/rollups.py).
+
+    Bars are aggregated per source interval, so a symbol extracted at both
+    1min and 5min never has its volume counted twice.
+    """
+    @declared_attr
+    def __table_args__(cls):
+        return (
+            UniqueConstraint('symbol', 'source_interval', 'bucket', name=f'uq_{cls.__tablename__}_symbol_source_bucket'),
+        )
+
+    id = Column(BigInteger, primary_key=True, autoincrement=True)
+    symbol = Column(String(16), nullable=False)
+    source_interval = Column(String(16), nullable=False)  # intraday_data interval aggregated, e.g. 5min
+    bucket = Column(DateTime, nullable=False)  # Bucket start
+    open = Column(Float, nullable=False)  # First open in the bucket
+    high = Column(Float, nullable=False)  # Max high
+    low = Column(Float, nullable=False)  # Min low
+    close = Column(Float, nullable=False)  # Last close
+    volume = Column(BigInteger, nullable=False)  # Sum of volume
+    bar_count = Column(Integer, nullable=False)  # Source bars aggregated
+    updated_at = Column(DateTime, default=datetime.utcnow)
+
+class Rollup15Min(RollupColumns, Base):
+    __tablename__ = 'intraday_rollup_15min'
+
+class Rollup60Min(RollupColumns, Base):
+    __tablename__ = 'intraday_rollup_60min'
+
+class RollupDaily(RollupColumns, Base):
+    __tablename__ = 'intraday_rollup_daily'
+
+class RejectedRecord(Base):
+    """
+    Dead letters: bars and records rejected by transform or load (see
+    utils/dead_letter.py), kept with their error code and original payload
+    until `main_dead_letters.py replay` reprocesses them.
+    """
+    __tablename__ = 'rejected_records'
+    __table_args__ = (
+        Index('ix_rejected_records_pending', 'stage', 'code', postgresql_where='replayed_at IS NULL'),
+    )
+
+    id = Column(BigInteger, primary_key=True, autoincrement=True)
+    rejected_at = Column(DateTime, nullable=False)
+    stage = Column(String(16), nullable=False)  # transform or load
+    code = Column(String(32), nullable=False)  # Error code, e.g. missing_fields
+    symbol = Column(String(16))
+    interval = Column(String(16))
+    function = Column(String(64))  # API function of a raw bar (selects its payload descriptor)
+    bar_timestamp = Column(String(32))  # Timestamp as received
+    payload = Column(Text, nullable=False)  # Raw bar (transform) or processed record (load) as JSON
+    error = Column(Text)
+    replayed_at = Column(DateTime)  # Set once a replay has reprocessed the record
+
+class LoadQualityReport(Base):
+    """
+    Findings of the set-based checks run on every COPY/upsert batch (see
+    utils/quality.py): one row per batch, code and symbol/interval.
+    """
+    __tablename__ = 'load_quality_reports'
+    __table_args__ = (
+        Index('ix_load_quality_reports_symbol_checked', 'symbol', 'interval', 'checked_at'),
+    )
+
+    id = Column(BigInteger, primary_key=True, autoincrement=True)
+    batch_id = Column(String(36), nullable=False)  # One load batch (staging table)
+    checked_at = Column(DateTime, nullable=False)
+    code = Column(String(32), nullable=False)  # Dead letter code, e.g. outlier_return or missing_bars
+    symbol = Column(String(16))
+    interval = Column(String(16))
+    rows = Column(Integer, nullable=False)  # Rows rejected or merged, or bars missing
+    first_timestamp = Column(DateTime)
+    last_timestamp = Column(DateTime)
+    action = Column(String(16), nullable=False)  # rejected, merged (identical duplicates) or reported
+
 # To create the table:
 # - Import 'Base' into a setup script.
-# Use `Base.metadata.create_all(engine)` with a properly configured engine.
+# Use `Base.metadata.create_all(engine)` with a properly configured engine,
+# then create monthly partitions (setup.py does both).
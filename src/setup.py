@@ -1,17 +1,24 @@
 ##############################################
 # Title: Database setup script
 # Author: Christopher Romanillos
-# Description: Creates 
+# Description: Creates tables, maintains
+# monthly partitions, migrates legacy data.
 # Date: 11/23/24
-# Version: 1.0
+# Version: 2.0
 ##############################################
 import logging
+import argparse
+from datetime import datetime
 from sqlalchemy import create_engine
 from sqlalchemy.exc import SQLAlchemyError
 from schema import Base 
 from dotenv import load_dotenv
 import os 
 from pathlib import Path
+from utils.config import load_config
+from utils.partitions import ensure_partitions, is_partitioned, month_start, next_month, rename_legacy_table, copy_legacy_rows
+
+LEGACY_TABLE = 'intraday_data_legacy'
 
 # Load enviornment variables from a .env file
 load_dotenv()
@@ -49,12 +56,67 @@ def create_tables(drop_existing=False):
     	logging.error(f"Error dropping tables: {e}")
     	raise
 
+def maintain_partitions(months_ahead=3):
+    """Pre-create monthly partitions from the current month through `months_ahead` months."""
+    end = month_start(datetime.utcnow())
+    for _ in range(months_ahead):
+        end = next_month(end)
+
+    connection = engine.raw_connection()
+    try:
+        cursor = connection.cursor()
+        if not is_partitioned(cursor):
+            raise RuntimeError("intraday_data is not partitioned. Run `python setup.py --migrate` first.")
+        created = ensure_partitions(cursor, datetime.utcnow(), end)
+        connection.commit()
+        logging.info(f"Partition maintenance complete. Created: {created or 'none'}.")
+    except Exception:
+        connection.rollback()
+        raise
+    finally:
+        connection.close()
+
+def migrate_legacy_data(symbol, interval):
+    """
+    Move an unpartitioned, single-symbol intraday_data table to the partitioned schema.
+
+    The rename, the creation of the partitioned tables and the copy run in one
+    transaction, so a failed migration leaves the old table where it was. If
+    intraday_data_legacy is still there (for example after a migration that
+    stopped before its copy), its rows are copied again; rows already present
+    are skipped. The old table is kept as intraday_data_legacy until dropped by hand.
+    """
+    with engine.begin() as connection:
+        cursor = connection.connection.cursor()
+        if not rename_legacy_table(cursor, LEGACY_TABLE):
+            cursor.execute("SELECT to_regclass(%s)", (LEGACY_TABLE,))
+            if cursor.fetchone()[0] is None:
+                logging.info("No unpartitioned intraday_data table found. Nothing to migrate.")
+                return
+            logging.info(f"{LEGACY_TABLE} still exists; copying its rows again.")
+
+        # Same transaction as the rename: PostgreSQL DDL rolls back with the copy
+        Base.metadata.create_all(connection)
+        copy_legacy_rows(cursor, LEGACY_TABLE, symbol, interval)
+
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(prog="setup.py", description="Create and maintain the intraday_data schema.")
+    parser.add_argument("--migrate", action="store_true",
+                        help="Migrate an unpartitioned intraday_data table to the partitioned schema.")
+    parser.add_argument("--months-ahead", type=int, help="Months of partitions to pre-create.")
+    args = parser.parse_args()
+
+    config = load_config(Path(__file__).resolve().parent.parent / 'config' / 'config.yaml')
+
     # Run the setup process
     logging.info("Starting database setup...")
     try:
+        if args.migrate:
+            migrate_legacy_data(config['api']['symbol'], config['api'].get('interval', '5min'))
         create_tables(drop_existing=False)
+        months_ahead = args.months_ahead or config.get('partitions', {}).get('months_ahead', 3)
+        maintain_partitions(months_ahead)
         logging.info("Database setup completed successfully.")
     except Exception as e:
         logging.error(f"An error occurred during setup: {e}")
-      
+
@@ -3,17 +3,291 @@
 # Author: Christopher Romanillos
 # Description: modular api_request script
 # Date: 11/23/24
-# Version: 1.0
+# Version: 2.2
 ##############################################
-import requests
+import time
+import socket
 import logging
+import threading
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+from utils.instrumentation import span
+from utils.response_cache import UNCHANGED
+
+# Per-thread timings of the connection opened by the current request (if any)
+_connection_timings = threading.local()
+
+class _TimedConnectionMixin:
+    """Record DNS, TCP connect and TLS handshake durations for new connections."""
+
+    def _new_conn(self):
+        host = self._dns_host
+        start = time.perf_counter()
+        try:
+            address = socket.getaddrinfo(host, self.port, type=socket.SOCK_STREAM)[0][4][0]
+        except OSError:
+            address = None
+        resolved = time.perf_counter()
+        _connection_timings.dns = resolved - start
+
+        try:
+            if address:
+                # Connect to the address we just resolved so DNS is not timed twice
+                self._dns_host = address
+            try:
+                sock = super()._new_conn()
+            except OSError:
+                if not address:
+                    raise
+                self._dns_host = host
+                sock = super()._new_conn()
+        finally:
+            self._dns_host = host
+        _connection_timings.connect = time.perf_counter() - resolved
+        return sock
+
+    def connect(self):
+        start = time.perf_counter()
+        super().connect()
+        elapsed = time.perf_counter() - start
+        _connection_timings.tls = max(0.0, elapsed - _connection_timings.dns - _connection_timings.connect)
+
+class _TimedHTTPConnection(_TimedConnectionMixin, HTTPConnection):
+    pass
+
+class _TimedHTTPSConnection(_TimedConnectionMixin, HTTPSConnection):
+    pass
+
+class _TimedHTTPConnectionPool(HTTPConnectionPool):
+    ConnectionCls = _TimedHTTPConnection
+
+class _TimedHTTPSConnectionPool(HTTPSConnectionPool):
+    ConnectionCls = _TimedHTTPSConnection
+
+class _TimedHTTPAdapter(HTTPAdapter):
+    """HTTPAdapter whose pools build connections that report their setup timings."""
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            'http': _TimedHTTPConnectionPool,
+            'https': _TimedHTTPSConnectionPool,
+        }
+
+class ApiClient:
+    """
+    Reusable HTTP client holding a pooled keep-alive session.
+
+    Args:
+        pool_connections (int): Number of host pools to cache.
+        pool_maxsize (int): Maximum connections kept alive per host.
+        connect_timeout (float): Seconds to wait for a connection.
+        read_timeout (float): Seconds to wait between bytes of the response.
+        retry (dict): urllib3 Retry settings (total, backoff_factor, status_forcelist).
+        log_timings (bool): Log DNS/connect/TLS/TTFB/download timings per request.
+    """
+
+    def __init__(self, pool_connections=10, pool_maxsize=10, connect_timeout=5,
+                 read_timeout=30, retry=None, log_timings=True):
+        retry = retry or {}
+        self.timeout = (connect_timeout, read_timeout)
+        self.log_timings = log_timings
+        self.session = requests.Session()
+        self.session.headers.update({'Accept-Encoding': 'gzip, deflate'})
+
+        adapter = _TimedHTTPAdapter(
+            pool_connections=pool_connections,
+            pool_maxsize=pool_maxsize,
+            max_retries=Retry(
+                total=retry.get('total', 3),
+                backoff_factor=retry.get('backoff_factor', 0.5),
+                status_forcelist=retry.get('status_forcelist', [429, 500, 502, 503, 504]),
+                allowed_methods=['GET'],
+            ),
+        )
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+    @classmethod
+    def from_config(cls, config):
+        """Build a client from the `http` section of config.yaml."""
+        http = config.get('http', {})
+        return cls(
+            pool_connections=http.get('pool_connections', 10),
+            pool_maxsize=http.get('pool_maxsize', 10),
+            connect_timeout=http.get('connect_timeout', 5),
+            read_timeout=http.get('read_timeout', config.get('api', {}).get('timeout', 30)),
+            retry=http.get('retry'),
+            log_timings=http.get('log_timings', True),
+        )
+
+    def get(self, url, params=None, timeout=None, headers=None):
+        """
+        Send a GET request and read the full body, recording timings.
+        `headers` adds per-request headers (e.g. conditional request validators).
+
+        Returns:
+            requests.Response: The response with its body already downloaded.
+        """
+        _connection_timings.dns = _connection_timings.connect = _connection_timings.tls = 0.0
+        response = self.session.get(url, params=params, headers=headers, timeout=timeout or self.timeout, stream=True)
+        headers_received = time.perf_counter()
+        try:
+            response.content  # Download (and decompress) the body
+        finally:
+            response.close()
+        download = time.perf_counter() - headers_received
+
+        if self.log_timings:
+            self._log_timings(response, download, len(response.content))
+        return response
+
+    def download(self, url, file_obj, params=None, timeout=None, headers=None, chunk_size=1 << 16):
+        """
+        Send a GET request and stream the (decompressed) body into a file
+        chunk by chunk, without holding it in memory. `headers` adds
+        per-request headers, as for get().
+
+        Returns:
+            requests.Response: The response (body not retained).
+            int: Bytes written.
+        """
+        _connection_timings.dns = _connection_timings.connect = _connection_timings.tls = 0.0
+        response = self.session.get(url, params=params, headers=headers, timeout=timeout or self.timeout, stream=True)
+        headers_received = time.perf_counter()
+        written = 0
+        try:
+            response.raise_for_status()
+            for chunk in response.iter_content(chunk_size):
+                file_obj.write(chunk)
+                written += len(chunk)
+        finally:
+            response.close()
+        download = time.perf_counter() - headers_received
+
+        if self.log_timings:
+            self._log_timings(response, download, written)
+        return response, written
+
+    def _log_timings(self, response, download, decoded_bytes):
+        dns = _connection_timings.dns
+        connect = _connection_timings.connect
+        tls = _connection_timings.tls
+        # requests' elapsed covers connection setup through response headers
+        ttfb = max(0.0, response.elapsed.total_seconds() - dns - connect - tls)
+        wire_bytes = response.raw.tell() if hasattr(response.raw, 'tell') else decoded_bytes
+        reused = "reused" if not (dns or connect) else "new"
+        logging.info(
+            f"HTTP {response.status_code} {response.url.split('?')[0]} ({reused} connection): "
+            f"dns={dns * 1000:.1f}ms connect={connect * 1000:.1f}ms tls={tls * 1000:.1f}ms "
+            f"ttfb={ttfb * 1000:.1f}ms download={download * 1000:.1f}ms "
+            f"bytes={wire_bytes} decoded={decoded_bytes} "
+            f"encoding={response.headers.get('Content-Encoding', 'identity')}"
+        )
+
+    def close(self):
+        self.session.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+_default_client = None
+
+def get_default_client():
+    """Return the process-wide ApiClient, creating it on first use."""
+    global _default_client
+    if _default_client is None:
+        _default_client = ApiClient()
+    return _default_client
+
+def fetch_api_data(url, timeout, client=None, cache=None, cache_key=None):
+    """
+    Send a GET request to the API and return the data.
+
+    With a ResponseCache, the request is skipped while the cached response is
+    fresh and otherwise revalidated with If-None-Match/If-Modified-Since;
+    UNCHANGED is returned instead of the data when the server answers 304 or
+    the "Time Series" body hashes the same as the cached one. Error and
+    rate-limit payloads carry no series and are never cached. A changed
+    response is only staged: call `cache.commit(cache_key)` once it is saved.
+    """
+    client = client or get_default_client()
+    headers = {}
+    if cache is not None:
+        fresh, headers = cache.lookup(cache_key)
+        if fresh:
+            logging.info(f"Response cache: {cache_key} is fresh; request skipped.")
+            return UNCHANGED
+    try:
+        with span("extract.fetch") as fetch_span:
+            response = client.get(url, timeout=timeout, headers=headers)
+            if response.status_code == 304 and cache is not None:
+                cache.not_modified(cache_key)
+                logging.info(f"Response cache: {cache_key} not modified (304).")
+                return UNCHANGED
+            response.raise_for_status()
+            fetch_span.add(bytes_in=len(response.content))
+        with span("extract.parse") as parse_span:
+            data = response.json()
+            parse_span.add(bytes_in=len(response.content), records_out=1)
+        if cache is not None and not cache.stage(cache_key, data, response.headers.get('ETag'),
+                                                 response.headers.get('Last-Modified')):
+            logging.info(f"Response cache: {cache_key} time series unchanged.")
+            return UNCHANGED
+        return data
+    except requests.exceptions.Timeout:
+        logging.error(f"Request timed out after {timeout} seconds.")
+        raise
+    except requests.exceptions.ConnectionError:
+        logging.error("A connection error occurred.")
+        raise
+    except requests.exceptions.HTTPError as http_err:
+        logging.error(f"HTTP error occurred: {http_err}")
+        raise
+    except requests.exceptions.RequestException as err:
+        logging.error(f"An unexpected error occurred: {err}")
+        raise
+
+def download_api_data(url, timeout, file_path, client=None, cache=None, cache_key=None):
+    """
+    Stream an API response straight to `file_path` without parsing it.
+
+    With a ResponseCache this behaves like fetch_api_data: UNCHANGED is
+    returned (and `file_path` may be left empty or holding the unchanged
+    body) when the cached response is fresh, the server answers 304 or the
+    streamed series hashes the same as the cached one. A changed response is
+    only staged: call `cache.commit(cache_key)` once the file is saved.
 
-def fetch_api_data(url, timeout):
-    """Send a GET request to the API and return the data."""
+    Returns:
+        int: Bytes written, or UNCHANGED.
+    """
+    client = client or get_default_client()
+    headers = {}
+    if cache is not None:
+        fresh, headers = cache.lookup(cache_key)
+        if fresh:
+            logging.info(f"Response cache: {cache_key} is fresh; request skipped.")
+            return UNCHANGED
     try:
-        response = requests.get(url, timeout=timeout)
-        response.raise_for_status()
-        return response.json()
+        with span("extract.download") as download_span, open(file_path, 'wb') as file:
+            response, written = client.download(url, file, timeout=timeout, headers=headers)
+            download_span.add(bytes_out=written)
+        if cache is not None:
+            if response.status_code == 304:
+                cache.not_modified(cache_key)
+                logging.info(f"Response cache: {cache_key} not modified (304).")
+                return UNCHANGED
+            if not cache.stage_file(cache_key, file_path, response.headers.get('ETag'),
+                                    response.headers.get('Last-Modified')):
+                logging.info(f"Response cache: {cache_key} time series unchanged.")
+                return UNCHANGED
+        return written
     except requests.exceptions.Timeout:
         logging.error(f"Request timed out after {timeout} seconds.")
         raise
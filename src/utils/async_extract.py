@@ -0,0 +1,248 @@
+##############################################
+# Title: Modular Async Extraction Script
+# Author: Christopher Romanillos
+# Description: Concurrent multi-symbol fetch
+# engine with rate limiting and retries.
+# Date: 01/11/25
+# Version: 1.4
+##############################################
+import time
+import random
+import asyncio
+import logging
+import threading
+import httpx
+from utils.utils import check_api_errors, is_rate_limited
+from utils.rate_limiter import TokenBucket
+from utils.instrumentation import span
+from utils.response_cache import UNCHANGED, request_key
+
+class RateLimitedError(Exception):
+    """Raised when a symbol is still rate limited after all retry attempts."""
+
+def backoff_delay(attempt, base, cap):
+    """Exponential backoff with full jitter for the given (0-based) attempt."""
+    return random.uniform(0, min(cap, base * (2 ** attempt)))
+
+def _retry_after(response):
+    """Seconds asked for by a Retry-After header (0 when absent or an HTTP date)."""
+    try:
+        return float(response.headers.get('Retry-After', 0))
+    except ValueError:
+        return 0.0
+
+async def fetch_symbol(client, limiter, endpoint, params, retry, cache=None):
+    """
+    Fetch one symbol, retrying transient failures, HTTP 429 and rate-limit notices.
+
+    Args:
+        client (httpx.AsyncClient): Shared pooled client.
+        limiter (TokenBucket): Shared limiter, awaited before every request.
+        endpoint (str): API endpoint URL.
+        params (dict): Query parameters for this symbol.
+        retry (dict): max_attempts, backoff_base and backoff_max settings.
+        cache (ResponseCache): Optional response cache; see fetch_api_data for the semantics.
+
+    Returns:
+        dict: The API response data, or UNCHANGED when it matches the cache.
+    """
+    max_attempts = retry.get('max_attempts', 5)
+    base = retry.get('backoff_base', 2)
+    cap = retry.get('backoff_max', 60)
+    symbol = params.get('symbol')
+    headers = {}
+    if cache is not None:
+        key = request_key(params)
+        fresh, headers = cache.lookup(key)
+        if fresh:
+            # Served from the cache without spending a rate-limit token
+            return UNCHANGED
+
+    for attempt in range(max_attempts):
+        await limiter.acquire()
+        try:
+            with span("extract.fetch", symbol=symbol) as fetch_span:
+                response = await client.get(endpoint, params=params, headers=headers)
+                if response.status_code == 304 and cache is not None:
+                    cache.not_modified(key)
+                    return UNCHANGED
+                response.raise_for_status()
+                data = response.json()
+                fetch_span.add(bytes_in=len(response.content), records_out=1)
+        except (httpx.TransportError, httpx.HTTPStatusError) as e:
+            if isinstance(e, httpx.HTTPStatusError) and e.response.status_code == 429:
+                # Same as a rate-limit notice: back off every worker, at least as long as asked
+                delay = max(backoff_delay(attempt, base, cap) + base, _retry_after(e.response))
+                limiter.pause(delay)
+                logging.warning(f"HTTP 429 for {symbol}. Backing off {delay:.1f}s.")
+                continue
+            if isinstance(e, httpx.HTTPStatusError) and e.response.status_code < 500:
+                logging.error(f"HTTP error occurred for {symbol}: {e}")
+                raise
+            delay = backoff_delay(attempt, base, cap)
+            logging.warning(f"Request for {symbol} failed ({e}). Retrying in {delay:.1f}s.")
+            await asyncio.sleep(delay)
+            continue
+
+        if is_rate_limited(data):
+            # Back off every worker, not just this one
+            delay = backoff_delay(attempt, base, cap) + base
+            limiter.pause(delay)
+            logging.warning(f"Rate limit notice for {symbol}. Backing off {delay:.1f}s.")
+            continue
+
+        if not check_api_errors(data):
+            raise ValueError(f"API returned an error for {symbol}. See logs for details.")
+        if cache is not None and not cache.stage(key, data, response.headers.get('ETag'),
+                                                 response.headers.get('Last-Modified')):
+            return UNCHANGED
+        return data
+
+    raise RateLimitedError(f"Giving up on {symbol} after {max_attempts} attempts.")
+
+def _open_client(settings):
+    concurrency = settings.get('concurrency', 10)
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    return httpx.AsyncClient(timeout=settings.get('timeout', 30), limits=limits)
+
+def _open_limiter(settings):
+    rate_limit = settings.get('rate_limit', {})
+    return TokenBucket(rate_limit.get('requests_per_minute', 5), rate_limit.get('burst', 1))
+
+async def extract_requests(requests, endpoint, settings, on_result=None, client=None, limiter=None, cache=None):
+    """
+    Fetch every request concurrently under a shared token-bucket limiter.
+
+    Args:
+        requests (dict): key -> query parameters (symbol, interval, apikey...) for one request.
+        endpoint (str): API endpoint URL.
+        settings (dict): The `api` config section (timeout, concurrency, rate_limit, retry).
+        on_result (callable): Optional callback(key, data) invoked as each request succeeds,
+            so downstream stages can start before every request is fetched.
+        client (httpx.AsyncClient): Client to reuse (left open); a new one is opened and closed otherwise.
+        limiter (TokenBucket): Limiter to reuse across calls; a new one otherwise.
+        cache (ResponseCache): Optional response cache. Unchanged responses are
+            not handed to on_result, so they skip transform and load entirely;
+            changed ones are staged and must be committed with
+            `cache.commit(request_key(params))` once saved or loaded.
+
+    Returns:
+        dict: key -> response data (True when handed to on_result, so payloads
+            are not retained), UNCHANGED, or the exception raised for that request.
+    """
+    if client is None:
+        async with _open_client(settings) as client:
+            return await extract_requests(requests, endpoint, settings, on_result, client, limiter, cache)
+
+    limiter = limiter or _open_limiter(settings)
+    retry = settings.get('retry', {})
+    semaphore = asyncio.Semaphore(settings.get('concurrency', 10))
+
+    async def run(key, params):
+        async with semaphore:
+            try:
+                data = await fetch_symbol(client, limiter, endpoint, params, retry, cache)
+            except Exception as e:
+                logging.error(f"Extraction failed for {key}: {e}")
+                return e
+            if data is UNCHANGED:
+                logging.info(f"Response for {key} unchanged since the last extraction; skipped.")
+                return data
+            if on_result:
+                on_result(key, data)
+                return True
+            return data
+
+    results = await asyncio.gather(*(run(key, params) for key, params in requests.items()))
+    return dict(zip(requests, results))
+
+async def extract_symbols(symbols, endpoint, base_params, settings, on_result=None):
+    """
+    Fetch every symbol concurrently under a shared token-bucket limiter.
+
+    Args:
+        symbols (list): Ticker symbols to fetch.
+        endpoint (str): API endpoint URL.
+        base_params (dict): Query parameters shared by every request (function, interval, apikey...).
+        settings (dict): The `api` config section (timeout, concurrency, rate_limit, retry).
+        on_result (callable): Optional callback(symbol, data) invoked as each symbol succeeds.
+
+    Returns:
+        dict: symbol -> response data, True or exception (see extract_requests).
+    """
+    requests = {symbol: dict(base_params, symbol=symbol) for symbol in symbols}
+    return await extract_requests(requests, endpoint, settings, on_result)
+
+def _log_rate(symbols, results, elapsed):
+    succeeded = sum(1 for result in results.values() if not isinstance(result, Exception))
+    unchanged = sum(1 for result in results.values() if result is UNCHANGED)
+    rate = succeeded / elapsed * 60 if elapsed else 0.0
+    logging.info(
+        f"Extracted {succeeded}/{len(symbols)} symbols ({unchanged} unchanged) in {elapsed:.2f}s "
+        f"({rate:.1f} symbols/minute)."
+    )
+
+def run_extraction(symbols, endpoint, base_params, settings, on_result=None, cache=None):
+    """Synchronous wrapper around extract_symbols that also logs symbols/minute."""
+    requests = {symbol: dict(base_params, symbol=symbol) for symbol in symbols}
+    return run_requests(requests, endpoint, settings, on_result, cache)
+
+def run_requests(requests, endpoint, settings, on_result=None, cache=None):
+    """Synchronous wrapper around extract_requests (e.g. keyed by (symbol, interval)) that logs the rate."""
+    start = time.perf_counter()
+    results = asyncio.run(extract_requests(requests, endpoint, settings, on_result, cache=cache))
+    _log_rate(requests, results, time.perf_counter() - start)
+    return results
+
+class AsyncExtractor:
+    """
+    Long-lived extractor for resident processes (see main_scheduler.py).
+
+    Keeps one event loop running in a background thread, with a pooled
+    keep-alive AsyncClient and a token bucket that persist across runs, so
+    repeated extractions reuse connections and respect the rate limit over
+    the life of the process instead of per call.
+
+    Args:
+        settings (dict): The `api` config section (timeout, concurrency, rate_limit, retry).
+        cache (ResponseCache): Optional response cache shared by every run.
+    """
+
+    def __init__(self, settings, cache=None):
+        self.settings = settings
+        self.cache = cache
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self.loop.run_forever, name='async-extractor', daemon=True)
+        self.thread.start()
+        self.client, self.limiter = self._call(self._open())
+
+    async def _open(self):
+        return _open_client(self.settings), _open_limiter(self.settings)
+
+    def _call(self, coroutine):
+        return asyncio.run_coroutine_threadsafe(coroutine, self.loop).result()
+
+    def run(self, symbols, endpoint, base_params, on_result=None):
+        """Blocking equivalent of run_extraction over the persistent client."""
+        requests = {symbol: dict(base_params, symbol=symbol) for symbol in symbols}
+        return self.run_requests(requests, endpoint, on_result)
+
+    def run_requests(self, requests, endpoint, on_result=None):
+        """Blocking extract_requests over the persistent client (arbitrary request keys)."""
+        start = time.perf_counter()
+        results = self._call(extract_requests(requests, endpoint, self.settings, on_result, self.client, self.limiter,
+                                               self.cache))
+        _log_rate(requests, results, time.perf_counter() - start)
+        return results
+
+    def close(self):
+        self._call(self.client.aclose())
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join()
+        self.loop.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
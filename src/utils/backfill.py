@@ -0,0 +1,175 @@
+##############################################
+# Title: Modular Backfill Script
+# Author: Christopher Romanillos
+# Description: Month-sliced historical extract
+# streamed into the loader, checkpointed in
+# the manifest so it can resume.
+# Date: 03/01/25
+# Version: 1.2
+##############################################
+import time
+import queue
+import asyncio
+import logging
+import threading
+from datetime import datetime, timedelta
+from utils.utils import validate_data
+from utils.partitions import month_start, next_month
+from utils.bar_batch import transform_batch
+from utils.async_extract import extract_requests
+from utils.payloads import get_descriptor
+
+CHECKPOINT_STAGE = 'backfill'
+
+# Bars can arrive after midnight UTC (the API runs on US/Eastern time), so a
+# month only counts as finished this long after it ends
+MONTH_SETTLE = timedelta(days=1)
+
+# Marks the end of the extract stage's output
+_DONE = object()
+
+def parse_month(value):
+    """Parse "YYYY-MM" into the first instant of that month."""
+    return datetime.strptime(value, '%Y-%m')
+
+def backfill_slices(symbols, intervals, start, end):
+    """
+    Every (symbol, interval, month) slice for the months in [start, end].
+
+    Args:
+        symbols (list): Ticker symbols.
+        intervals (list): Bar sizes, e.g. ["5min", "60min"].
+        start (datetime): Any instant in the first month.
+        end (datetime): Any instant in the last month.
+
+    Returns:
+        list: (symbol, interval, "YYYY-MM") tuples, oldest month first.
+    """
+    months = []
+    month = month_start(start)
+    while month <= end:
+        months.append(month.strftime('%Y-%m'))
+        month = next_month(month)
+    return [(symbol, interval, month) for month in months for symbol in symbols for interval in intervals]
+
+def slice_key(symbol, interval, month):
+    """Checkpoint key for one slice, e.g. "IBM/5min/2024-01"."""
+    return f"{symbol}/{interval}/{month}"
+
+def month_closed_at(month):
+    """UTC instant after which a "YYYY-MM" month has all its bars."""
+    return next_month(parse_month(month)) + MONTH_SETTLE
+
+def run_backfill(config, api_key, slices, load_slice, manifest, now=None):
+    """
+    Fetch month slices concurrently and stream each one into the loader.
+
+    Slices already checkpointed in the manifest are skipped. The remaining
+    slices are fetched with `month=` and `outputsize=full` under the shared
+    `api.rate_limit` token bucket, `backfill.concurrency` at a time, and
+    handed through a bounded queue to the calling thread, which transforms,
+    loads and checkpoints each slice as soon as it arrives. An interrupted
+    backfill therefore resumes after the last committed slice.
+
+    Only finished months are checkpointed. Slices of the current month (or
+    a later one) are loaded but fetched again on every run, as are slices
+    checkpointed before their month had finished.
+
+    Args:
+        config (dict): Parsed config.yaml.
+        api_key (str): Alpha Vantage API key.
+        slices (list): (symbol, interval, month) tuples from backfill_slices.
+        load_slice (callable): load_slice(symbol, interval, batch) -> number of rows written,
+            where batch is a BarBatch (see utils/bar_batch.py).
+        manifest (FileManifest): Checkpoint store.
+        now (datetime): Current UTC time (defaults to utcnow), which decides the open months.
+
+    Returns:
+        dict: Counts of slices (total, already done, loaded, failed, open) and rows.
+            Open slices were loaded but not checkpointed.
+    """
+    api_config = config['api']
+    settings = config.get('backfill', {})
+    transform_engine = config.get('transform', {}).get('engine', 'threaded')
+    # Month slicing is an intraday feature of the API
+    descriptors = {entry[1]: get_descriptor('TIME_SERIES_INTRADAY', entry[1]) for entry in slices}
+
+    now = now or datetime.utcnow()
+    done = manifest.completed_keys(CHECKPOINT_STAGE)
+    pending = [
+        entry for entry in slices
+        if slice_key(*entry) not in done or done[slice_key(*entry)] < month_closed_at(entry[2])
+    ]
+    summary = {"slices": len(slices), "already_done": len(slices) - len(pending), "loaded": 0, "failed": 0,
+               "open": 0, "rows": 0}
+    if not pending:
+        logging.info("Backfill: every slice is already checkpointed. Nothing to do.")
+        return summary
+
+    requests = {
+        entry: dict(
+            descriptors[entry[1]].request_params,
+            symbol=entry[0],
+            month=entry[2],
+            outputsize=settings.get('outputsize', 'full'),
+            apikey=api_key,
+        )
+        for entry in pending
+    }
+    extract_settings = dict(api_config, concurrency=settings.get('concurrency', 4))
+    fetched = queue.Queue(maxsize=settings.get('queue_size', 8))
+
+    def extract():
+        try:
+            # Blocking put applies backpressure to the fetch loop
+            asyncio.run(extract_requests(requests, api_config['endpoint'], extract_settings,
+                                         on_result=lambda entry, data: fetched.put((entry, data))))
+        except Exception as e:
+            logging.error(f"Backfill extract stage failed: {e}")
+        finally:
+            fetched.put(_DONE)
+
+    start = time.monotonic()
+    thread = threading.Thread(target=extract, name='backfill-extract', daemon=True)
+    thread.start()
+
+    while True:
+        item = fetched.get()
+        if item is _DONE:
+            break
+        (symbol, interval, month), data = item
+        key = slice_key(symbol, interval, month)
+        descriptor = descriptors[interval]
+        if not validate_data(data, ['Meta Data', descriptor.series_key]):
+            logging.error(f"Backfill: skipping {key}, response failed validation.")
+            summary["failed"] += 1
+            continue
+
+        batch, rejected = transform_batch(data[descriptor.series_key], symbol, interval, descriptor, transform_engine)
+        if rejected:
+            logging.warning(f"Backfill: {rejected} bars rejected for {key}.")
+        try:
+            written = load_slice(symbol, interval, batch) if len(batch) else 0
+        except Exception as e:
+            logging.error(f"Backfill: load failed for {key}: {e}")
+            summary["failed"] += 1
+            continue
+
+        summary["loaded"] += 1
+        summary["rows"] += written
+        if now < month_closed_at(month):
+            # Still collecting bars: load what exists now, refetch on the next run
+            summary["open"] += 1
+            logging.info(f"Backfill: {key} loaded ({len(batch)} bars); month still open, not checkpointed.")
+            continue
+        manifest.record_key(CHECKPOINT_STAGE, key, len(batch))
+        logging.info(f"Backfill: {key} loaded ({len(batch)} bars).")
+
+    thread.join()
+    summary["failed"] += len(pending) - summary["loaded"] - summary["failed"]  # Extraction failures
+    elapsed = time.monotonic() - start
+    summary["elapsed"] = round(elapsed, 2)
+    logging.info(
+        f"Backfill summary: {summary} ({summary['loaded'] / elapsed * 60 if elapsed else 0:.1f} slices/minute)."
+    )
+    return summary
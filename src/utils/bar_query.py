@@ -0,0 +1,242 @@
+##############################################
+# Title: Modular Bar Query Script
+# Author: Christopher Romanillos
+# Description: Read side of intraday_data: bars
+# by symbol/interval/time range as arrays or a
+# DataFrame, over prepared statements, with an
+# LRU/TTL cache of recent windows invalidated
+# when loads commit.
+# Date: 05/24/25
+# Version: 1.1
+##############################################
+import time
+import logging
+import threading
+from collections import OrderedDict
+from datetime import datetime
+import numpy as np
+from utils.bar_batch import BarBatch
+
+# Loaders notify this channel in the committing transaction (see utils/db_loader.py),
+# one "symbol/interval/first/last" payload per pair they touched
+LOADED_CHANNEL = 'intraday_data_loaded'
+
+# Bars come back with epoch-second timestamps (as BarBatch stores them), so no
+# datetime object is created per row
+_SELECT = 'SELECT extract(epoch FROM "timestamp")::bigint, open, high, low, close, volume FROM intraday_data'
+
+# Prepared per connection on first use: name -> (parameter types, statement)
+STATEMENTS = {
+    'intraday_range': (
+        'text, text, timestamp, timestamp',
+        f'{_SELECT} WHERE symbol = $1 AND "interval" = $2 AND "timestamp" >= $3 AND "timestamp" < $4 '
+        f'ORDER BY "timestamp"',
+    ),
+    'intraday_last': (
+        'text, text, bigint',
+        f'SELECT * FROM ({_SELECT} WHERE symbol = $1 AND "interval" = $2 ORDER BY "timestamp" DESC LIMIT $3) b '
+        f'ORDER BY 1',
+    ),
+}
+
+NOTIFY_STAGED_SQL = f"""
+    SELECT pg_notify('{LOADED_CHANNEL}', concat_ws('/', symbol, "interval", min("timestamp"), max("timestamp")))
+    FROM {{table}}
+    WHERE code IS NULL
+    GROUP BY symbol, "interval"
+"""
+
+def notify_loaded(cursor, ranges=None, table=None):
+    """
+    Queue a load notification in the current transaction (delivered on commit).
+
+    Args:
+        cursor: psycopg2 cursor of the loading transaction.
+        ranges (dict): (symbol, interval) -> (first, last) datetimes loaded (see rollups.time_ranges_by_pair).
+        table (str): Or: a checked staging table (utils/quality.py) whose clean rows were merged into intraday_data.
+    """
+    if table is not None:
+        cursor.execute(NOTIFY_STAGED_SQL.format(table=table))
+        return
+    for (symbol, interval), (first, last) in (ranges or {}).items():
+        cursor.execute("SELECT pg_notify(%s, %s)", (LOADED_CHANNEL, f"{symbol}/{interval}/{first}/{last}"))
+
+def parse_notification(payload):
+    """(symbol, interval, first, last) from a load notification payload."""
+    symbol, interval, first, last = payload.split('/')
+    return symbol, interval, datetime.fromisoformat(first), datetime.fromisoformat(last)
+
+def _frozen(batch):
+    # Cached batches are shared between callers
+    for name in BarBatch.COLUMNS:
+        getattr(batch, name).flags.writeable = False
+    return batch
+
+class BarQuery:
+    """
+    Bars from intraday_data by symbol, interval and time range.
+
+    Results are BarBatch arrays (`.to_table()` for Arrow, `.to_pandas()` for
+    a DataFrame). Queries run as statements prepared once per pooled
+    connection. Recent windows are kept in an LRU cache of `cache_size`
+    entries, each trusted for at most `ttl` seconds; with `listen`, the cache
+    also LISTENs for load notifications and drops the windows a committed load
+    overlaps, so a fresh bar is visible on the next call rather than after the
+    TTL. Safe to share between threads.
+
+    Args:
+        engine: SQLAlchemy engine backed by psycopg2.
+        cache_size (int): Windows cached (0 disables the cache).
+        ttl (float): Seconds a cached window is reused.
+        listen (bool): Invalidate on load notifications (one extra connection).
+    """
+
+    def __init__(self, engine, cache_size=256, ttl=30, listen=True):
+        self.engine = engine
+        self.cache_size = cache_size
+        self.ttl = ttl
+        self.listen = listen and cache_size > 0
+        self.hits = 0
+        self.misses = 0
+        self._cache = OrderedDict()  # (symbol, interval, start, end or -count) -> (expires, BarBatch)
+        self._generation = 0  # Bumped by every invalidation, so a query racing one is not cached
+        self._lock = threading.Lock()
+        self._listener = None
+        self._listener_lock = threading.Lock()
+
+    @classmethod
+    def from_config(cls, config, engine):
+        """Query layer with the `query` config section."""
+        settings = config.get('query', {})
+        return cls(
+            engine,
+            cache_size=settings.get('cache_size', 256),
+            ttl=settings.get('ttl', 30),
+            listen=settings.get('listen', True),
+        )
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def bars(self, symbol, interval='5min', start=None, end=None):
+        """
+        Bars with start <= timestamp < end, oldest first.
+
+        Args:
+            symbol (str): Ticker, e.g. "IBM".
+            interval (str): Bar size, e.g. "5min" or "daily".
+            start, end (datetime): Range bounds (naive, as stored); None leaves a side open.
+
+        Returns:
+            BarBatch: Read-only arrays when served from the cache.
+        """
+        start = start or datetime.min
+        end = end or datetime.max
+        return self._cached((symbol, interval, start, end), 'intraday_range', (symbol, interval, start, end))
+
+    def last_bars(self, symbol, interval='5min', count=100):
+        """The latest `count` bars, oldest first."""
+        return self._cached((symbol, interval, None, -count), 'intraday_last', (symbol, interval, count))
+
+    def frame(self, symbol, interval='5min', start=None, end=None):
+        """`bars` as a pandas DataFrame."""
+        return self.bars(symbol, interval, start, end).to_pandas()
+
+    def invalidate(self, symbol=None, interval=None, first=None, last=None):
+        """
+        Drop cached windows: everything, one symbol/interval, or the windows
+        of a pair that overlap [first, last]. Windows of the latest bars always
+        overlap a load.
+        """
+        with self._lock:
+            for key in list(self._cache):
+                key_symbol, key_interval, start, end = key
+                if symbol is not None and (key_symbol, key_interval) != (symbol, interval):
+                    continue
+                if first is not None and start is not None and not (start <= last and first < end):
+                    continue
+                del self._cache[key]
+            self._generation += 1
+
+    def close(self):
+        with self._listener_lock:
+            if self._listener is not None:
+                self._listener.close()
+                self._listener = None
+        with self._lock:
+            self._cache.clear()
+
+    def _cached(self, key, statement, params):
+        if not self.cache_size:
+            self.misses += 1
+            return self._execute(statement, params, *key[:2])
+
+        self._drain_notifications()
+        now = time.monotonic()
+        with self._lock:
+            entry = self._cache.get(key)
+            if entry is not None and entry[0] > now:
+                self._cache.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+            generation = self._generation
+
+        batch = _frozen(self._execute(statement, params, *key[:2]))
+        with self._lock:
+            if generation != self._generation:
+                return batch
+            self._cache[key] = (now + self.ttl, batch)
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return batch
+
+    def _execute(self, statement, params, symbol, interval):
+        connection = self.engine.raw_connection()
+        try:
+            cursor = connection.cursor()
+            # connection.info lives as long as the pooled DBAPI connection, like its prepared statements
+            prepared = connection.info.setdefault('prepared_statements', set())
+            if statement not in prepared:
+                types, sql = STATEMENTS[statement]
+                cursor.execute(f"PREPARE {statement} ({types}) AS {sql}")
+                prepared.add(statement)
+            cursor.execute(f"EXECUTE {statement} ({', '.join(['%s'] * len(params))})", params)
+            rows = cursor.fetchall()
+        finally:
+            connection.close()
+
+        if not rows:
+            return BarBatch.empty(symbol, interval)
+        columns = list(zip(*rows))
+        return BarBatch(symbol, interval, *(np.array(column) for column in columns))
+
+    def _drain_notifications(self):
+        """Apply pending load notifications (non-blocking; reads what the socket already holds)."""
+        if not self.listen:
+            return
+        with self._listener_lock:
+            try:
+                if self._listener is None:
+                    # A dedicated connection, detached so it never returns to the pool still listening
+                    self._listener = self.engine.raw_connection()
+                    self._listener.detach()
+                    # (detached, the proxy keeps dbapi_connection but no longer reports driver_connection)
+                    self._listener.dbapi_connection.autocommit = True
+                    self._listener.cursor().execute(f"LISTEN {LOADED_CHANNEL}")
+                    # Anything cached before the LISTEN may have missed a load
+                    self.invalidate()
+                dbapi_connection = self._listener.dbapi_connection
+                dbapi_connection.poll()
+                while dbapi_connection.notifies:
+                    self.invalidate(*parse_notification(dbapi_connection.notifies.pop(0).payload))
+            except Exception as e:
+                logging.warning(f"Bar query cache lost its load notifications ({e}); cache cleared.")
+                if self._listener is not None:
+                    self._listener.invalidate()
+                    self._listener = None
+                self.invalidate()
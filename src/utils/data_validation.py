@@ -3,26 +3,94 @@
 # Author: Christopher Romanillos
 # Description: modular utils script
 # Date: 12/01/24
-# Version: 1.0
+# Version: 1.4
 ##############################################
-import logging
+import math
 from datetime import datetime
+from utils.payloads import get_descriptor
+from utils.dead_letter import (
+    get_dead_letters, MISSING_FIELDS, BAD_TIMESTAMP, BAD_VALUE, OHLC_INVARIANT, NEGATIVE_VOLUME
+)
 
-def transform_and_validate_data(item, required_fields):
+# Intraday bars unless a descriptor is given (field names are the same for every intraday interval)
+DEFAULT_DESCRIPTOR = get_descriptor('TIME_SERIES_INTRADAY', '5min')
+
+def transform_and_validate_data(item, required_fields=None, descriptor=DEFAULT_DESCRIPTOR, symbol=None, interval=None):
+    """
+    Validate and type one (timestamp, bar) pair.
+
+    Invalid bars go to the dead letter queue (utils/dead_letter.py) with an
+    error code instead of being logged one by one. The checks and codes are
+    the same as utils/vectorized_transform.py, so both engines keep and
+    reject the same bars.
+
+    Args:
+        item (tuple): (timestamp string, raw bar values).
+        required_fields (list): Field names every bar must contain; defaults to the descriptor's.
+        descriptor (PayloadDescriptor): Payload layout (field names, timestamp format).
+        symbol (str): Symbol the bar belongs to (recorded with dead letters).
+        interval (str): Interval the bar belongs to (recorded with dead letters).
+
+    Returns:
+        dict: Processed record, or None if the bar is invalid.
+    """
+    timestamp, values = item
+    if not all(field in values for field in required_fields or descriptor.required_fields):
+        _reject(MISSING_FIELDS, item, "missing required fields", descriptor, symbol, interval)
+        return None
+    try:
+        if len(timestamp) != descriptor.timestamp_length:
+            raise ValueError(f"unexpected timestamp format '{timestamp}'")
+        parsed_timestamp = datetime.fromisoformat(timestamp)
+    except ValueError as e:
+        _reject(BAD_TIMESTAMP, item, str(e), descriptor, symbol, interval)
+        return None
     try:
-        timestamp, values = item
-        if not all(field in values for field in required_fields):
-            logging.warning(f"Missing required fields for timestamp {timestamp}. Skipping entry.")
-            return None
-
-        return {
-            "timestamp": datetime.strptime(timestamp, '%Y-%m-%d %H:%M:%S'),
-            "open": float(values["1. open"]),
-            "high": float(values["2. high"]),
-            "low": float(values["3. low"]),
-            "close": float(values["4. close"]),
-            "volume": int(values["5. volume"]),
-        }
-    except (ValueError, KeyError) as e:
-        logging.error(f"Error validating data for timestamp {timestamp}: {e}")
+        open_, high, low, close, volume = (float(value) for value in descriptor.extract(values))
+    except (TypeError, ValueError, KeyError) as e:
+        _reject(BAD_VALUE, item, str(e), descriptor, symbol, interval)
         return None
+    if not all(math.isfinite(value) for value in (open_, high, low, close, volume)) or not volume.is_integer():
+        _reject(BAD_VALUE, item, "non-numeric or non-finite value", descriptor, symbol, interval)
+        return None
+    if high < max(open_, close) or low > min(open_, close):
+        _reject(OHLC_INVARIANT, item, "high below open/close or low above open/close", descriptor, symbol, interval)
+        return None
+    if volume < 0:
+        _reject(NEGATIVE_VOLUME, item, "negative volume", descriptor, symbol, interval)
+        return None
+    return {
+        "timestamp": parsed_timestamp,
+        "open": open_,
+        "high": high,
+        "low": low,
+        "close": close,
+        "volume": int(volume),
+    }
+
+def _reject(code, item, error, descriptor, symbol, interval):
+    timestamp, values = item
+    get_dead_letters().add('transform', code, values, error, symbol, interval, descriptor.function, timestamp)
+
+def transform_time_series(time_series, required_fields=None, descriptor=DEFAULT_DESCRIPTOR, symbol=None, interval=None):
+    """
+    Transform every bar of a "Time Series (...)" block in the calling thread.
+
+    Args:
+        time_series (dict): Mapping of timestamp -> raw bar values.
+        required_fields (list): Field names every bar must contain; defaults to the descriptor's.
+        descriptor (PayloadDescriptor): Payload layout (see utils/payloads.py).
+        symbol, interval (str): Recorded with dead letters.
+
+    Returns:
+        tuple: (processed records, count of rejected bars).
+    """
+    processed = []
+    rejected = 0
+    for item in time_series.items():
+        record = transform_and_validate_data(item, required_fields, descriptor, symbol, interval)
+        if record is None:
+            rejected += 1
+        else:
+            processed.append(record)
+    return processed, rejected
@@ -0,0 +1,409 @@
+##############################################
+# Title: Modular Database Loader Script
+# Author: Christopher Romanillos
+# Description: Bulk loading helpers for the
+# intraday_data table (COPY, upsert and ORM paths).
+# COPY and upsert batches are checked in SQL on
+# a staging table (utils/quality.py).
+# Date: 01/04/25
+# Version: 2.4
+##############################################
+import io
+import csv
+import logging
+from datetime import datetime
+from utils.partitions import ensure_partitions
+from utils.bar_batch import BarBatch
+from utils.bar_query import notify_loaded
+from utils.dead_letter import get_dead_letters, MISSING_KEYS, MISSING_SYMBOL, BAD_VALUE
+from utils.quality import RAW_STAGE, STAGE, create_raw_stage, check_staged
+
+# Column order used for every COPY into intraday_data
+INTRADAY_COLUMNS = ('symbol', 'interval', 'timestamp', 'open', 'high', 'low', 'close', 'volume', 'created_at')
+REQUIRED_KEYS = {'timestamp', 'open', 'high', 'low', 'close', 'volume'}
+
+# Columns compared/overwritten when an incoming bar conflicts with a stored one
+UPSERT_VALUE_COLUMNS = ('open', 'high', 'low', 'close', 'volume')
+CONFLICT_COLUMNS = ('symbol', 'interval', 'timestamp')
+
+# Column order of the raw stage COPY: the source (processed file name, NULL for a single
+# source) tells the quality checks one file's copies of a bar from another's
+STAGE_COLUMNS = INTRADAY_COLUMNS + ('source',)
+
+def column_list(columns, prefix=''):
+    """Quoted, comma-separated column list ("interval" and "timestamp" are SQL keywords)."""
+    return ', '.join(f'{prefix}"{column}"' for column in columns)
+
+def iter_valid_rows(data, symbol=None, interval=None):
+    """
+    Validate processed records and yield them as plain row tuples.
+
+    Used by the ORM path and replay dry runs; COPY and upsert loads check
+    records in SQL instead (utils/quality.py). Invalid records go to the dead
+    letter queue (utils/dead_letter.py) rather than being logged one by one.
+
+    Args:
+        data (iterable): Processed records (dicts) as written by the transform step.
+        symbol (str): Symbol for records that do not carry one (older processed files).
+        interval (str): Interval for records that do not carry one.
+
+    Yields:
+        tuple: (symbol, interval, timestamp, open, high, low, close, volume) with parsed values.
+    """
+    dead_letters = get_dead_letters()
+    for record in data:
+        missing_keys = REQUIRED_KEYS - record.keys()
+        record_symbol = record.get('symbol', symbol)
+        record_interval = record.get('interval', interval)
+        if missing_keys:
+            dead_letters.add('load', MISSING_KEYS, record, f"missing keys {sorted(missing_keys)}",
+                             record_symbol, record_interval, bar_timestamp=record.get('timestamp'))
+            continue
+        if not record_symbol or not record_interval:
+            dead_letters.add('load', MISSING_SYMBOL, record, "no symbol/interval",
+                             record_symbol, record_interval, bar_timestamp=record['timestamp'])
+            continue
+        try:
+            timestamp = record['timestamp']
+            if not isinstance(timestamp, datetime):
+                timestamp = datetime.fromisoformat(timestamp)
+            yield (
+                record_symbol,
+                record_interval,
+                timestamp,
+                float(record['open']),
+                float(record['high']),
+                float(record['low']),
+                float(record['close']),
+                int(record['volume']),
+            )
+        except Exception as e:
+            dead_letters.add('load', BAD_VALUE, record, str(e), record_symbol, record_interval,
+                             bar_timestamp=record['timestamp'])
+
+def raw_rows(data, symbol=None, interval=None):
+    """
+    Processed records as row tuples, values as received (absent ones None).
+
+    Nothing is parsed or validated here: the rows are COPY'd into the raw
+    stage and checked there (utils/quality.py).
+
+    Yields:
+        tuple: (symbol, interval, timestamp, open, high, low, close, volume, source).
+    """
+    for record in data:
+        yield (record.get('symbol', symbol), record.get('interval', interval), record.get('timestamp'),
+               *(record.get(column) for column in UPSERT_VALUE_COLUMNS), record.get('source'))
+
+def copy_rows(cursor, rows, table='intraday_data', chunk_size=50000, columns=INTRADAY_COLUMNS):
+    """
+    Stream row tuples into a table with COPY FROM STDIN.
+
+    Rows are written as CSV into an in-memory buffer which is flushed to the
+    server every `chunk_size` rows, so memory stays bounded for large batches.
+
+    Args:
+        cursor: A psycopg2 cursor (must support copy_expert).
+        rows (iterable): Tuples ordered like `columns`.
+        table (str): Target table name.
+        chunk_size (int): Number of rows buffered per COPY call.
+        columns (tuple): Target columns.
+
+    Returns:
+        int: Number of rows copied.
+    """
+    copy_sql = f"COPY {table} ({column_list(columns)}) FROM STDIN WITH (FORMAT csv)"
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    pending = 0
+    total = 0
+
+    for row in rows:
+        writer.writerow(row)
+        pending += 1
+        if pending >= chunk_size:
+            buffer.seek(0)
+            cursor.copy_expert(copy_sql, buffer)
+            total += pending
+            pending = 0
+            buffer.seek(0)
+            buffer.truncate()
+
+    if pending:
+        buffer.seek(0)
+        cursor.copy_expert(copy_sql, buffer)
+        total += pending
+    return total
+
+def copy_arrow_table(cursor, table, created_at, target='intraday_data', chunk_size=50000,
+                     symbol=None, interval=None, columns=INTRADAY_COLUMNS):
+    """
+    Stream a typed Arrow table (see utils.parquet_store) into a table with COPY.
+
+    The CSV is encoded by Arrow in C++ batch by batch, so no Python object is
+    created per row.
+
+    Args:
+        cursor: A psycopg2 cursor (must support copy_expert).
+        table (pyarrow.Table): Table with at least the INTRADAY_COLUMNS value columns.
+        created_at (datetime): Value written to created_at for every row.
+        target (str): Target table name.
+        chunk_size (int): Rows per COPY call.
+        symbol (str): Symbol used when the table has no symbol column.
+        interval (str): Interval used when the table has no interval column.
+        columns (tuple): Target columns; a missing source column is copied as NULL.
+
+    Returns:
+        int: Number of rows copied.
+    """
+    import pyarrow as pa
+    import pyarrow.csv as pa_csv
+
+    value_columns = [column for column in columns if column != 'created_at']
+    copy_sql = f"COPY {target} ({column_list(value_columns + ['created_at'])}) FROM STDIN WITH (FORMAT csv)"
+    write_options = pa_csv.WriteOptions(include_header=False)
+    total = 0
+
+    # Older Parquet files predate the symbol/interval columns
+    for name, default in (('symbol', symbol), ('interval', interval)):
+        if name not in table.column_names:
+            if not default:
+                raise ValueError(f"Arrow table has no {name} column and no default was given.")
+            table = table.append_column(name, pa.repeat(pa.scalar(default, pa.string()), table.num_rows))
+    if 'source' in value_columns and 'source' not in table.column_names:
+        table = table.append_column('source', pa.nulls(table.num_rows, pa.string()))
+
+    for batch in table.select(value_columns).to_batches(max_chunksize=chunk_size):
+        batch = pa.RecordBatch.from_arrays(
+            batch.columns + [pa.repeat(pa.scalar(created_at, pa.timestamp('us')), batch.num_rows)],
+            names=value_columns + ['created_at'],
+        )
+        sink = pa.BufferOutputStream()
+        pa_csv.write_csv(batch, sink, write_options)
+        cursor.copy_expert(copy_sql, pa.BufferReader(sink.getvalue()))
+        total += batch.num_rows
+    return total
+
+def stage_rows(cursor, data, created_at, table=RAW_STAGE, chunk_size=50000, symbol=None, interval=None):
+    """COPY processed-record dicts, a BarBatch or an Arrow table, unvalidated, into `table` (the raw stage)."""
+    if isinstance(data, BarBatch):
+        data = data.to_table()
+    if hasattr(data, 'to_batches'):
+        return copy_arrow_table(cursor, data, created_at, target=table, chunk_size=chunk_size,
+                                symbol=symbol, interval=interval, columns=STAGE_COLUMNS)
+    rows = (row[:-1] + (created_at, row[-1]) for row in raw_rows(data, symbol, interval))
+    return copy_rows(cursor, rows, table=table, chunk_size=chunk_size, columns=STAGE_COLUMNS)
+
+def stage_checked(cursor, data, created_at, chunk_size=50000, symbol=None, interval=None, quality=None):
+    """
+    COPY a batch into the raw stage and check it there (see quality.check_staged).
+
+    Returns:
+        dict: The quality summary; the batch's clean rows are those of the
+            intraday_stage table with a NULL code.
+    """
+    create_raw_stage(cursor)
+    stage_rows(cursor, data, created_at, chunk_size=chunk_size, symbol=symbol, interval=interval)
+    return check_staged(cursor, quality)
+
+def ensure_staged_partitions(cursor):
+    """Create the monthly partitions covering the clean rows of the checked stage."""
+    cursor.execute(f'SELECT min("timestamp"), max("timestamp") FROM {STAGE} WHERE code IS NULL')
+    start, end = cursor.fetchone()
+    if start is not None:
+        ensure_partitions(cursor, start, end)
+
+def copy_records(engine, data, chunk_size=50000, symbol=None, interval=None, quality=None):
+    """
+    Load processed records into intraday_data using PostgreSQL COPY.
+
+    The batch is COPY'd into a staging table and checked there; only clean
+    rows are inserted (one copy per bar, the last staged). Monthly partitions
+    covering the batch are created first if missing.
+
+    Args:
+        engine: SQLAlchemy engine backed by psycopg2.
+        data (iterable | BarBatch | pyarrow.Table): Processed records (dicts), a BarBatch or a typed Arrow table.
+        chunk_size (int): Number of rows buffered per COPY call.
+        symbol (str): Symbol for records that do not carry one.
+        interval (str): Interval for records that do not carry one.
+        quality (dict): The `quality` config section (see utils/quality.py).
+
+    Returns:
+        int: Number of rows loaded.
+    """
+    created_at = datetime.utcnow()
+    columns = column_list(INTRADAY_COLUMNS)
+    conflict_target = column_list(CONFLICT_COLUMNS)
+
+    connection = engine.raw_connection()
+    try:
+        cursor = connection.cursor()
+        if not hasattr(cursor, 'copy_expert'):
+            raise NotImplementedError("Database driver does not support COPY FROM STDIN.")
+        stage_checked(cursor, data, created_at, chunk_size, symbol, interval, quality)
+        ensure_staged_partitions(cursor)
+        cursor.execute(
+            f"INSERT INTO intraday_data ({columns}) "
+            f"SELECT DISTINCT ON ({conflict_target}) {columns} FROM {STAGE} WHERE code IS NULL "
+            f"ORDER BY {conflict_target}, row_id DESC"
+        )
+        count = cursor.rowcount
+        if count:
+            # Query caches drop the windows this batch touched once it commits (see utils/bar_query.py)
+            notify_loaded(cursor, table=STAGE)
+        connection.commit()
+        logging.info(f"Successfully copied {count} records into the database.")
+        return count
+    except Exception:
+        connection.rollback()
+        raise
+    finally:
+        connection.close()
+
+def _upsert_sql(on_conflict):
+    """
+    Build the INSERT ... SELECT ... ON CONFLICT statement used by upsert_records.
+
+    Updates leave created_at alone, so rows returned with the batch's
+    created_at (the %(created_at)s parameter) were inserted. PostgreSQL does
+    not allow system columns such as xmax in RETURNING on a partitioned table.
+
+    Of several clean staged rows for one bar (copies from different files),
+    the last staged (highest row_id) wins, e.g. the newest file of a
+    catch-up load.
+    """
+    columns = column_list(INTRADAY_COLUMNS)
+    conflict_target = column_list(CONFLICT_COLUMNS)
+
+    if on_conflict == 'nothing':
+        conflict_action = "DO NOTHING"
+    elif on_conflict == 'update':
+        assignments = ', '.join(f'"{col}" = EXCLUDED."{col}"' for col in UPSERT_VALUE_COLUMNS)
+        current = column_list(UPSERT_VALUE_COLUMNS, prefix='intraday_data.')
+        incoming = column_list(UPSERT_VALUE_COLUMNS, prefix='EXCLUDED.')
+        # Only touch rows whose values actually changed, so unchanged overlaps count as skipped
+        conflict_action = f"DO UPDATE SET {assignments} WHERE ({current}) IS DISTINCT FROM ({incoming})"
+    else:
+        raise ValueError(f"Unsupported on_conflict action: {on_conflict}")
+
+    return f"""
+        WITH upserted AS (
+            INSERT INTO intraday_data ({columns})
+            SELECT DISTINCT ON ({conflict_target}) {columns}
+            FROM {STAGE}
+            WHERE code IS NULL
+            ORDER BY {conflict_target}, row_id DESC
+            ON CONFLICT ({conflict_target}) {conflict_action}
+            RETURNING ("created_at" IS NOT DISTINCT FROM %(created_at)s) AS inserted
+        )
+        SELECT
+            count(*) FILTER (WHERE inserted),
+            count(*) FILTER (WHERE NOT inserted)
+        FROM upserted
+    """
+
+def upsert_records(engine, data, on_conflict='update', chunk_size=50000, symbol=None, interval=None,
+                   quality=None):
+    """
+    Idempotently load processed records into intraday_data.
+
+    Rows are COPY'd into a temporary staging table, checked there (see
+    utils/quality.py) and the clean ones merged with a single
+    INSERT ... ON CONFLICT statement, so overlapping extraction windows and
+    reruns never fail the batch. Monthly partitions covering the batch are
+    created first if missing.
+
+    Args:
+        engine: SQLAlchemy engine backed by psycopg2.
+        data (iterable | BarBatch | pyarrow.Table): Processed records (dicts), a BarBatch or a typed Arrow table.
+        on_conflict (str): "update" to overwrite changed bars, "nothing" to keep stored bars.
+        chunk_size (int): Number of rows buffered per COPY call.
+        symbol (str): Symbol for records that do not carry one.
+        interval (str): Interval for records that do not carry one.
+        quality (dict): The `quality` config section (see utils/quality.py).
+
+    Returns:
+        dict: Counts of inserted, updated, skipped and rejected rows.
+    """
+    created_at = datetime.utcnow()
+    upsert_sql = _upsert_sql(on_conflict)
+
+    connection = engine.raw_connection()
+    try:
+        cursor = connection.cursor()
+        if not hasattr(cursor, 'copy_expert'):
+            raise NotImplementedError("Database driver does not support COPY FROM STDIN.")
+        checked = stage_checked(cursor, data, created_at, chunk_size, symbol, interval, quality)
+        ensure_staged_partitions(cursor)
+        cursor.execute(upsert_sql, {'created_at': created_at})
+        inserted, updated = cursor.fetchone()
+        if inserted or updated:
+            # Query caches drop the windows this batch touched once it commits (see utils/bar_query.py)
+            notify_loaded(cursor, table=STAGE)
+        connection.commit()
+    except Exception:
+        connection.rollback()
+        raise
+    finally:
+        connection.close()
+
+    counts = {"inserted": inserted, "updated": updated, "skipped": checked['clean'] - inserted - updated,
+              "rejected": checked['rejected']}
+    logging.info(
+        f"Upsert complete: {counts['inserted']} inserted, {counts['updated']} updated, "
+        f"{counts['skipped']} skipped (unchanged or duplicate), {counts['rejected']} rejected."
+    )
+    return counts
+
+def orm_load_records(session_factory, data, symbol=None, interval=None):
+    """
+    Load processed records into intraday_data through the ORM (fallback path).
+    On PostgreSQL the load is notified to query caches like the COPY paths.
+
+    Args:
+        session_factory: SQLAlchemy sessionmaker.
+        data (iterable | BarBatch | pyarrow.Table): Processed records (dicts), a BarBatch or a typed Arrow table.
+        symbol (str): Symbol for records that do not carry one.
+        interval (str): Interval for records that do not carry one.
+
+    Returns:
+        int: Number of rows loaded.
+    """
+    from schema import IntradayData
+
+    if isinstance(data, BarBatch):
+        data = data.to_table()
+    if hasattr(data, 'to_pylist'):
+        data = data.to_pylist()
+
+    created_at = datetime.utcnow()
+    new_records = [
+        IntradayData(
+            symbol=row_symbol,
+            interval=row_interval,
+            timestamp=timestamp,
+            open=open_,
+            high=high,
+            low=low,
+            close=close,
+            volume=volume,
+            created_at=created_at
+        )
+        for row_symbol, row_interval, timestamp, open_, high, low, close, volume
+        in iter_valid_rows(data, symbol, interval)
+    ]
+
+    with session_factory() as session:
+        session.bulk_save_objects(new_records)
+        if new_records and session.get_bind().dialect.name == 'postgresql':
+            # Query caches drop the windows this batch touched once it commits (see utils/bar_query.py)
+            ranges = {}
+            for record in new_records:
+                pair = (record.symbol, record.interval)
+                first, last = ranges.get(pair, (record.timestamp, record.timestamp))
+                ranges[pair] = (min(first, record.timestamp), max(last, record.timestamp))
+            notify_loaded(session.connection().connection.cursor(), ranges)
+        session.commit()
+    logging.info(f"Successfully loaded {len(new_records)} records into the database.")
+    return len(new_records)
@@ -0,0 +1,439 @@
+##############################################
+# Title: Modular Dead Letter Script
+# Author: Christopher Romanillos
+# Description: Buffers rejected bars/records
+# with error codes, writes them in bulk to a
+# JSONL/Parquet file or a Postgres table and
+# logs aggregated counts per error class.
+# Date: 05/03/25
+# Version: 1.1
+##############################################
+import json
+import time
+import atexit
+import logging
+import threading
+from datetime import datetime
+from pathlib import Path
+
+# Error codes, by the stage that rejects the record
+MISSING_FIELDS = 'missing_fields'  # transform: bar lacks an OHLCV field
+BAD_TIMESTAMP = 'bad_timestamp'  # transform: timestamp not in the payload's format
+BAD_VALUE = 'bad_value'  # transform/load: value does not parse (or is not finite)
+OHLC_INVARIANT = 'ohlc_invariant'  # transform/load: high below open/close or low above them
+NEGATIVE_VOLUME = 'negative_volume'  # transform/load: volume below zero
+TRANSFORM_ERROR = 'transform_error'  # transform: anything else raised for the bar
+MISSING_KEYS = 'missing_keys'  # load: processed record lacks a column
+MISSING_SYMBOL = 'missing_symbol'  # load: no symbol/interval on the record or the batch
+DUPLICATE_TIMESTAMP = 'duplicate_timestamp'  # load: conflicting bars for one timestamp in the batch
+OUTLIER_RETURN = 'outlier_return'  # load: close spikes and reverts beyond quality.max_return
+MISSING_BARS = 'missing_bars'  # load: market-hours bars absent (quality report only, never dead-lettered)
+
+# Columns of every dead letter, whatever the sink (see schema.RejectedRecord)
+DEAD_LETTER_COLUMNS = ('rejected_at', 'stage', 'code', 'symbol', 'interval', 'function',
+                       'bar_timestamp', 'payload', 'error')
+
+SINKS = ('none', 'jsonl', 'parquet', 'postgres')
+
+# Reused for every entry (json.dumps builds a new encoder per call when given options)
+_encode = json.JSONEncoder(default=str, separators=(',', ':')).encode
+
+def _with_json_payloads(entries):
+    """Entries with the payload serialized to a JSON string (for string-typed sinks)."""
+    return [dict(entry, payload=_encode(entry["payload"])) for entry in entries]
+
+class JsonlSink:
+    """Dead letters appended to one JSON-lines file per process run (editable before a replay)."""
+
+    def __init__(self, directory, process):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.path = self.directory / f"dead_letters_{process}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.jsonl"
+
+    def write(self, entries):
+        with open(self.path, 'a') as file:
+            # Payloads stay nested objects so the file can be corrected by hand before a replay
+            file.writelines(_encode(entry) + "\n" for entry in entries)
+
+    def __str__(self):
+        return str(self.path)
+
+class ParquetSink:
+    """Dead letters written as one Parquet part file per flush."""
+
+    def __init__(self, directory, process):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.stem = f"dead_letters_{process}_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+        self.parts = 0
+
+    def write(self, entries):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        table = pa.Table.from_pylist(_with_json_payloads(entries), schema=pa.schema([(column, pa.string()) for column in DEAD_LETTER_COLUMNS]))
+        pq.write_table(table, self.directory / f"{self.stem}_{self.parts:04d}.parquet")
+        self.parts += 1
+
+    def __str__(self):
+        return str(self.directory / f"{self.stem}_*.parquet")
+
+class PostgresSink:
+    """Dead letters COPYed into the rejected_records table (see schema.RejectedRecord)."""
+
+    def __init__(self, engine):
+        self.engine = engine
+
+    def write(self, entries):
+        import io
+        import csv
+        from utils.db_loader import column_list
+
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerows([entry[column] for column in DEAD_LETTER_COLUMNS] for entry in _with_json_payloads(entries))
+        buffer.seek(0)
+        connection = self.engine.raw_connection()
+        try:
+            connection.cursor().copy_expert(
+                f"COPY rejected_records ({column_list(DEAD_LETTER_COLUMNS)}) FROM STDIN WITH (FORMAT csv)", buffer
+            )
+            connection.commit()
+        except Exception:
+            connection.rollback()
+            raise
+        finally:
+            connection.close()
+
+    def __str__(self):
+        return "table rejected_records"
+
+class DeadLetterQueue:
+    """
+    Collects rejected records instead of logging each one.
+
+    `add` only counts the reject and, when a sink is configured, buffers it;
+    the buffer is written in one bulk call every `buffer_size` entries (and
+    on flush/close). Logging is aggregated: at most one warning per
+    `log_interval` seconds with the counts per stage/error code since the
+    last one, plus a sample error message for each. Safe to share between
+    threads.
+
+    Args:
+        sink: JsonlSink, ParquetSink, PostgresSink or None to count and log only.
+        buffer_size (int): Entries buffered before a bulk write.
+        log_interval (float): Minimum seconds between summary log lines.
+    """
+
+    def __init__(self, sink=None, buffer_size=10000, log_interval=60):
+        self.sink = sink
+        self.buffer_size = buffer_size
+        self.log_interval = log_interval
+        self.totals = {}  # (stage, code) -> rejects over the queue's life
+        self._pending_counts = {}  # (stage, code) -> rejects since the last summary
+        self._samples = {}
+        self._buffer = []
+        self._lock = threading.Lock()
+        self._last_log = time.monotonic()
+
+    def add(self, stage, code, payload, error=None, symbol=None, interval=None, function=None, bar_timestamp=None):
+        """Record one rejected record (`payload` is the raw bar or processed record)."""
+        self.add_many(stage, code, [(bar_timestamp, payload)], error, symbol, interval, function)
+
+    def add_many(self, stage, code, items, error=None, symbol=None, interval=None, function=None):
+        """
+        Record rejected records sharing an error code.
+
+        Args:
+            stage (str): "transform" or "load".
+            code (str): Error code (MISSING_FIELDS, BAD_VALUE, ...).
+            items (list): (bar timestamp, payload) pairs.
+            error (str): Error message (kept per entry and as the sample in the summary).
+            symbol, interval, function (str): Where the records came from, for replay.
+        """
+        if not items:
+            return
+        key = (stage, code)
+        flush = None
+        with self._lock:
+            self.totals[key] = self.totals.get(key, 0) + len(items)
+            self._pending_counts[key] = self._pending_counts.get(key, 0) + len(items)
+            self._samples.setdefault(key, error)
+            if self.sink is not None:
+                rejected_at = datetime.utcnow().isoformat()
+                self._buffer.extend(
+                    {"rejected_at": rejected_at, "stage": stage, "code": code, "symbol": symbol,
+                     "interval": interval, "function": function,
+                     "bar_timestamp": None if bar_timestamp is None else str(bar_timestamp),
+                     "payload": payload, "error": error}
+                    for bar_timestamp, payload in items
+                )
+                if len(self._buffer) >= self.buffer_size:
+                    flush, self._buffer = self._buffer, []
+        if flush:
+            self._write(flush)
+        if time.monotonic() - self._last_log >= self.log_interval:
+            self.log_summary()
+
+    def _write(self, entries):
+        try:
+            self.sink.write(entries)
+        except Exception as e:
+            logging.error(f"Failed to write {len(entries)} dead letters to {self.sink}: {e}")
+
+    def flush(self):
+        """Write any buffered entries to the sink."""
+        with self._lock:
+            entries, self._buffer = self._buffer, []
+        if entries and self.sink is not None:
+            self._write(entries)
+
+    def log_summary(self):
+        """Log one warning with the reject counts per stage/code since the last summary."""
+        with self._lock:
+            counts, self._pending_counts = self._pending_counts, {}
+            self._last_log = time.monotonic()
+        if not counts:
+            return
+        details = ", ".join(
+            f"{stage}/{code}={count}" + (f" (e.g. {self._samples[(stage, code)]})" if self._samples.get((stage, code)) else "")
+            for (stage, code), count in sorted(counts.items())
+        )
+        destination = f" Written to {self.sink}." if self.sink is not None else ""
+        logging.warning(f"Rejected {sum(counts.values())} records: {details}.{destination}")
+
+    def close(self):
+        self.flush()
+        self.log_summary()
+
+    @property
+    def total(self):
+        return sum(self.totals.values())
+
+_queue = DeadLetterQueue()
+
+def get_dead_letters():
+    """The process-wide dead letter queue (count-and-log only until configured)."""
+    return _queue
+
+def configure_dead_letters(settings, process, engine=None, base_dir=None):
+    """
+    Replace the process-wide queue from the `dead_letter` config section.
+
+    Args:
+        settings (dict): sink, directory, buffer_size and log_interval keys.
+        process (str): Entry point name (transform, load, pipeline...), used in file names.
+        engine: SQLAlchemy engine for the postgres sink (created from
+            POSTGRES_DATABASE_URL when not given).
+        base_dir (Path): Directory relative sink paths are resolved against.
+
+    Returns:
+        DeadLetterQueue: The new queue, flushed and summarized at exit.
+    """
+    global _queue
+    settings = settings or {}
+    sink_name = settings.get('sink', 'jsonl')
+    if sink_name not in SINKS:
+        raise ValueError(f"Unknown dead_letter.sink '{sink_name}'. Expected one of: {', '.join(SINKS)}.")
+
+    directory = Path(settings.get('directory', '../data/dead_letters'))
+    if base_dir and not directory.is_absolute():
+        directory = Path(base_dir) / directory
+    if sink_name == 'jsonl':
+        sink = JsonlSink(directory, process)
+    elif sink_name == 'parquet':
+        sink = ParquetSink(directory, process)
+    elif sink_name == 'postgres':
+        if engine is None:
+            from sqlalchemy import create_engine
+            from utils.config import load_env_variables
+            engine = create_engine(load_env_variables('POSTGRES_DATABASE_URL'))
+        sink = PostgresSink(engine)
+    else:
+        sink = None
+
+    _queue.close()
+    _queue = DeadLetterQueue(sink, settings.get('buffer_size', 10000), settings.get('log_interval', 60))
+    atexit.register(_queue.close)
+    return _queue
+
+class _FileSource:
+    """Pending dead letter files of a jsonl/parquet sink; replayed files get a `.replayed` suffix."""
+
+    def __init__(self, directory, suffix):
+        self.directory = Path(directory)
+        self.suffix = suffix
+
+    def read(self):
+        files = sorted(self.directory.glob(f"dead_letters_*{self.suffix}"))
+        entries = []
+        for path in files:
+            if self.suffix == '.parquet':
+                import pyarrow.parquet as pq
+                entries.extend(pq.read_table(path).to_pylist())
+            else:
+                with open(path) as file:
+                    entries.extend(json.loads(line) for line in file if line.strip())
+        return entries, files
+
+    def mark_replayed(self, files):
+        for path in files:
+            path.rename(path.with_name(path.name + '.replayed'))
+
+class _PostgresSource:
+    """Rows of rejected_records not yet replayed; replayed rows get replayed_at set."""
+
+    def __init__(self, engine):
+        self.engine = engine
+
+    def read(self):
+        from utils.db_loader import column_list
+
+        connection = self.engine.raw_connection()
+        try:
+            cursor = connection.cursor()
+            cursor.execute(f"SELECT id, {column_list(DEAD_LETTER_COLUMNS)} FROM rejected_records "
+                           f"WHERE replayed_at IS NULL ORDER BY id")
+            rows = cursor.fetchall()
+        finally:
+            connection.close()
+        return [dict(zip(DEAD_LETTER_COLUMNS, row[1:])) for row in rows], [row[0] for row in rows]
+
+    def mark_replayed(self, ids):
+        connection = self.engine.raw_connection()
+        try:
+            connection.cursor().execute("UPDATE rejected_records SET replayed_at = now() WHERE id = ANY(%s)", (ids,))
+            connection.commit()
+        except Exception:
+            connection.rollback()
+            raise
+        finally:
+            connection.close()
+
+def open_source(settings, engine=None, base_dir=None):
+    """Where the configured sink keeps its dead letters, for summary and replay."""
+    settings = settings or {}
+    sink_name = settings.get('sink', 'jsonl')
+    if sink_name == 'postgres':
+        return _PostgresSource(engine)
+    if sink_name not in ('jsonl', 'parquet'):
+        raise ValueError(f"dead_letter.sink '{sink_name}' keeps no dead letters to read.")
+    directory = Path(settings.get('directory', '../data/dead_letters'))
+    if base_dir and not directory.is_absolute():
+        directory = Path(base_dir) / directory
+    return _FileSource(directory, '.jsonl' if sink_name == 'jsonl' else '.parquet')
+
+def summarize(entries):
+    """(stage, code) -> count of dead letters."""
+    counts = {}
+    for entry in entries:
+        key = (entry['stage'], entry['code'])
+        counts[key] = counts.get(key, 0) + 1
+    return counts
+
+def _has_timestamp(record):
+    try:
+        timestamp = record['timestamp']
+        return isinstance(timestamp, datetime) or bool(datetime.fromisoformat(timestamp))
+    except (KeyError, TypeError, ValueError):
+        return False
+
+def replay_dead_letters(source, engine, transform_engine='vectorized', on_conflict='update', dry_run=False,
+                        quality=None):
+    """
+    Reprocess pending dead letters (after the data or the code was fixed).
+
+    Raw bars rejected by transform are regrouped into a time series per
+    symbol/interval/function and transformed again; records rejected by the
+    loader are checked again (in SQL, see utils/quality.py; a dry run only
+    repeats the Python parse checks). Whatever now passes is upserted into
+    intraday_data (idempotent, so replaying twice is harmless). Whatever
+    still fails, or lacks the symbol/interval/function needed to replay it,
+    goes to the current dead letter queue again, so the source can be marked
+    replayed in full once the loads committed.
+
+    Args:
+        source: From `open_source`.
+        engine: SQLAlchemy engine backed by psycopg2.
+        transform_engine (str): "vectorized" or "threaded" (see transform_batch).
+        on_conflict (str): "update" or "nothing" (see upsert_records).
+        dry_run (bool): Only count what would be recovered; nothing is loaded or marked.
+        quality (dict): The `quality` config section; e.g. reject_outliers False
+            to load spikes confirmed as real.
+
+    Returns:
+        dict: entries read, rows recovered, entries still rejected and the
+            (symbol, interval) -> (first, last) time ranges loaded.
+    """
+    global _queue
+    entries, marker = source.read()
+    if dry_run:
+        # Count what would fail again without writing it anywhere
+        configured, _queue = _queue, DeadLetterQueue(log_interval=float('inf'))
+    dead_letters = get_dead_letters()
+    rejected_before = dead_letters.total
+    try:
+        recovered, ranges = _replay(entries, engine, transform_engine, on_conflict, dry_run, quality)
+    finally:
+        if dry_run:
+            _queue = configured
+
+    if entries and not dry_run:
+        source.mark_replayed(marker)
+    summary = {"entries": len(entries), "recovered": recovered,
+               "still_rejected": dead_letters.total - rejected_before, "ranges": ranges}
+    logging.info(
+        f"Dead letter replay{' (dry run)' if dry_run else ''}: {summary['entries']} entries, "
+        f"{summary['recovered']} rows recovered, {summary['still_rejected']} still rejected."
+    )
+    if not dry_run:
+        dead_letters.close()
+    return summary
+
+def _replay(entries, engine, transform_engine, on_conflict, dry_run, quality):
+    from utils.bar_batch import transform_batch
+    from utils.db_loader import iter_valid_rows, upsert_records
+    from utils.payloads import get_descriptor
+    from utils.rollups import time_ranges_by_pair
+
+    dead_letters = get_dead_letters()
+
+    raw_series = {}  # (symbol, interval, function) -> {bar timestamp: raw bar}
+    records = {}  # (symbol, interval) -> [processed record]
+    for entry in entries:
+        payload = entry['payload']
+        if isinstance(payload, str):
+            payload = json.loads(payload)
+        if entry['stage'] == 'transform' and entry['symbol'] and entry['interval'] and entry['function'] \
+                and entry['bar_timestamp']:
+            raw_series.setdefault((entry['symbol'], entry['interval'], entry['function']), {})[entry['bar_timestamp']] = payload
+        elif entry['stage'] == 'load':
+            records.setdefault((entry['symbol'], entry['interval']), []).append(payload)
+        else:
+            dead_letters.add(entry['stage'], entry['code'], payload, entry['error'], entry['symbol'],
+                             entry['interval'], entry['function'], entry['bar_timestamp'])
+
+    recovered = 0
+    ranges = {}
+
+    def loaded(data, symbol, interval):
+        for pair, (first, last) in time_ranges_by_pair(data, symbol, interval).items():
+            known = ranges.get(pair)
+            ranges[pair] = (min(first, known[0]), max(last, known[1])) if known else (first, last)
+
+    for (symbol, interval, function), series in raw_series.items():
+        batch, _ = transform_batch(series, symbol, interval, get_descriptor(function, interval), transform_engine)
+        recovered += len(batch)
+        if len(batch) and not dry_run:
+            upsert_records(engine, batch, on_conflict=on_conflict, symbol=symbol, interval=interval,
+                           quality=quality)
+            loaded(batch, symbol, interval)
+    for (symbol, interval), group in records.items():
+        if dry_run:
+            recovered += sum(1 for _ in iter_valid_rows(group, symbol, interval))
+            continue
+        counts = upsert_records(engine, group, on_conflict=on_conflict, symbol=symbol, interval=interval,
+                                quality=quality)
+        recovered += counts['inserted'] + counts['updated'] + counts['skipped']
+        loaded([record for record in group if _has_timestamp(record)], symbol, interval)
+    return recovered, ranges
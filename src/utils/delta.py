@@ -0,0 +1,179 @@
+##############################################
+# Title: Modular Delta Extraction Script
+# Author: Christopher Romanillos
+# Description: High-water marks per symbol/
+# interval so runs only transform and load
+# bars newer than what is already stored.
+# Date: 03/15/25
+# Version: 1.1
+##############################################
+import logging
+import threading
+from datetime import datetime, timedelta
+
+# Alpha Vantage timestamps ("YYYY-MM-DD HH:MM:SS") sort as strings, so bars
+# are compared without parsing them
+TIMESTAMP_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+def query_high_water_marks(engine, pairs):
+    """
+    Latest stored bar for each (symbol, interval), in one round trip.
+
+    Each lookup is a backward scan of the (symbol, interval, timestamp) unique
+    index rather than a GROUP BY over the whole table.
+
+    Returns:
+        dict: (symbol, interval) -> datetime, or None when nothing is stored.
+    """
+    pairs = list(pairs)
+    if not pairs:
+        return {}
+    values = ", ".join(["(%s, %s)"] * len(pairs))
+    connection = engine.raw_connection()
+    try:
+        cursor = connection.cursor()
+        cursor.execute(
+            f"""
+            SELECT v.symbol, v.interval,
+                   (SELECT max(d."timestamp") FROM intraday_data d
+                    WHERE d.symbol = v.symbol AND d."interval" = v.interval)
+            FROM (VALUES {values}) AS v(symbol, interval)
+            """,
+            [value for pair in pairs for value in pair],
+        )
+        return {(symbol, interval): latest for symbol, interval, latest in cursor.fetchall()}
+    finally:
+        connection.close()
+
+class HighWaterMarks:
+    """
+    Latest loaded bar per symbol/interval, cached in the manifest between runs.
+
+    Cached marks older than `cache_ttl` seconds (or missing) are re-read from
+    the database in one query when an engine is available; without one, only
+    the cache is used and unknown pairs are not filtered. Loaders call
+    `advance` after committing so the next run sees the new mark without
+    querying.
+
+    Lookups are thread-safe; the manifest itself is only touched by the
+    constructor and `save`, so call those from the thread that opened it.
+
+    Args:
+        manifest (FileManifest): Cache store.
+        engine: SQLAlchemy engine, or None to rely on the cache only.
+        overlap_minutes (float): Bars this far behind the mark are kept, to pick
+            up provider corrections to recent bars.
+        cache_ttl (float): Seconds a cached mark is trusted before re-reading it.
+    """
+
+    def __init__(self, manifest, engine=None, overlap_minutes=30, cache_ttl=3600):
+        self.manifest = manifest
+        self.engine = engine
+        self.overlap = timedelta(minutes=overlap_minutes)
+        self.cache_ttl = timedelta(seconds=cache_ttl)
+        self._cached = manifest.cached_high_water_marks()
+        self._marks = {}
+        self._pending = {}  # (symbol, interval) -> (timestamp, refreshed_at or None) to write back
+        self._lock = threading.Lock()
+
+    def prefetch(self, pairs):
+        """Resolve marks for every (symbol, interval) up front: cache first, one DB query for the rest."""
+        with self._lock:
+            now = datetime.utcnow()
+            stale = []
+            for pair in set(pairs) - self._marks.keys():
+                entry = self._cached.get(pair)
+                if entry and now - entry[1] < self.cache_ttl:
+                    self._marks[pair] = entry[0]
+                else:
+                    stale.append(pair)
+
+            if stale and self.engine is not None:
+                for pair, latest in query_high_water_marks(self.engine, stale).items():
+                    self._marks[pair] = latest
+                    self._pending[pair] = (latest, now)
+                logging.info(f"Refreshed {len(stale)} high-water mark(s) from the database.")
+            elif stale:
+                for pair in stale:
+                    self._marks[pair] = None
+                logging.info(f"No cached high-water mark for {len(stale)} symbol/interval pair(s); keeping all their bars.")
+
+    def cutoff(self, symbol, interval):
+        """Oldest bar timestamp (string) to keep for a symbol/interval, or None to keep everything."""
+        if (symbol, interval) not in self._marks:
+            self.prefetch([(symbol, interval)])
+        latest = self._marks.get((symbol, interval))
+        if latest is None:
+            return None
+        return (latest - self.overlap).strftime(TIMESTAMP_FORMAT)
+
+    def filter(self, symbol, interval, time_series):
+        """
+        Drop bars already loaded (older than mark - overlap) from a time-series mapping.
+
+        Returns:
+            dict: The bars to transform and load.
+        """
+        cutoff = self.cutoff(symbol, interval)
+        if cutoff is None:
+            return time_series
+        kept = {timestamp: bar for timestamp, bar in time_series.items() if timestamp >= cutoff}
+        logging.info(f"Delta: kept {len(kept)} of {len(time_series)} bars for {symbol}/{interval} (>= {cutoff}).")
+        return kept
+
+    def filter_bars(self, symbol, interval, bars):
+        """Streaming variant of `filter` for (timestamp, bar) pairs."""
+        cutoff = self.cutoff(symbol, interval)
+        if cutoff is None:
+            return bars
+        return ((timestamp, bar) for timestamp, bar in bars if timestamp >= cutoff)
+
+    def advance(self, symbol, interval, latest):
+        """Record that bars up to `latest` (datetime) are now loaded."""
+        pair = (symbol, interval)
+        with self._lock:
+            current = self._marks.get(pair, self._cached.get(pair, (None,))[0])
+            if current is None or latest > current:
+                self._marks[pair] = latest
+                refreshed_at = self._pending.get(pair, (None, None))[1]
+                self._pending[pair] = (latest, refreshed_at)
+
+    def save(self):
+        """Write refreshed and advanced marks back to the manifest cache."""
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        for (symbol, interval), (latest, refreshed_at) in pending.items():
+            self.manifest.store_high_water_mark(symbol, interval, latest, refreshed_at=refreshed_at)
+
+def latest_by_pair(data, symbol=None, interval=None):
+    """
+    Latest bar per (symbol, interval) in a loaded batch.
+
+    Args:
+        data (list | BarBatch | pyarrow.Table): Processed records, a BarBatch or a typed Arrow table.
+        symbol (str): Symbol for records that do not carry one.
+        interval (str): Interval for records that do not carry one.
+
+    Returns:
+        dict: (symbol, interval) -> datetime.
+    """
+    if hasattr(data, 'time_range'):
+        return {(data.symbol, data.interval): data.time_range()[1]} if len(data) else {}
+    if hasattr(data, 'to_batches'):
+        grouped = data.group_by(['symbol', 'interval']).aggregate([('timestamp', 'max')])
+        return {
+            (row['symbol'], row['interval']): row['timestamp_max']
+            for row in grouped.to_pylist()
+        }
+
+    latest = {}
+    for record in data:
+        key = (record.get('symbol', symbol), record.get('interval', interval))
+        timestamp = record.get('timestamp')
+        if timestamp is None:
+            continue
+        if not isinstance(timestamp, datetime):
+            timestamp = datetime.fromisoformat(timestamp)
+        if key not in latest or timestamp > latest[key]:
+            latest[key] = timestamp
+    return latest
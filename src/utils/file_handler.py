@@ -3,7 +3,7 @@
 # Author: Christopher Romanillos
 # Description: Modular utils script
 # Date: 12/01/24
-# Version: 1.1
+# Version: 1.5
 ##############################################
 import json
 import logging
@@ -45,20 +45,66 @@ def get_latest_file(directory: str, pattern: str = "*.json") -> Path:
         raise
 
 
-def save_processed_data(data, processed_data_dir):
+def save_processed_data(data, processed_data_dir, symbol=None, file_name=None):
     try:
         # Ensure the processed data directory exists
         processed_data_path = Path(processed_data_dir)
         processed_data_path.mkdir(parents=True, exist_ok=True)
 
-        # Construct the file name with timestamp
-        file_name = processed_data_path / f"processed_data_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+        # Construct the file name with timestamp (and symbol, so concurrent symbols don't collide)
+        if file_name:
+            file_name = processed_data_path / file_name
+        else:
+            prefix = f"processed_data_{symbol}" if symbol else "processed_data"
+            file_name = processed_data_path / f"{prefix}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
         
         # Save the data to a JSON file
         with open(file_name, 'w') as file:
             json.dump(data, file, default=str)
         
         logging.info(f"Processed data saved to {file_name}.")
+        return file_name
     except Exception as e:
         logging.error(f"Error saving processed data: {e}")
         raise
+
+class JsonChunkWriter:
+    """
+    Write processed records chunk by chunk as one JSON list (the same bytes
+    save_processed_data writes), so a streamed transform never holds its
+    whole output.
+
+    The file is written as `<file_name>.part` and renamed by close(), so the
+    loader never picks up a half-written file; abort() removes it.
+
+    Args:
+        processed_data_dir (str | Path): Directory of processed files.
+        file_name (str): Processed file name.
+    """
+
+    def __init__(self, processed_data_dir, file_name):
+        processed_data_path = Path(processed_data_dir)
+        processed_data_path.mkdir(parents=True, exist_ok=True)
+        self.file_path = processed_data_path / file_name
+        self.partial_path = processed_data_path / f"{file_name}.part"
+        self.records = 0
+        self._file = open(self.partial_path, 'w')
+        self._file.write('[')
+
+    def write(self, records):
+        for record in records:
+            self._file.write((', ' if self.records else '') + json.dumps(record, default=str))
+            self.records += 1
+
+    def close(self):
+        """Finish the file; returns its path (as a one-item list)."""
+        self._file.write(']')
+        self._file.close()
+        self.partial_path.replace(self.file_path)
+        logging.info(f"Processed data saved to {self.file_path}.")
+        return [self.file_path]
+
+    def abort(self):
+        """Drop the partly written file."""
+        self._file.close()
+        self.partial_path.unlink(missing_ok=True)
@@ -0,0 +1,182 @@
+##############################################
+# Title: Modular Instrumentation Script
+# Author: Christopher Romanillos
+# Description: Per-stage timing/throughput spans,
+# structured JSON logs and Prometheus output.
+# Date: 02/22/25
+# Version: 1.0
+##############################################
+import os
+import json
+import time
+import atexit
+import logging
+import threading
+import urllib.request
+from pathlib import Path
+
+_settings = {"enabled": False, "process": "etl"}
+_totals = {}  # stage -> aggregated counters for Prometheus output
+_lock = threading.Lock()
+metrics_logger = logging.getLogger("etl.metrics")
+
+class Span:
+    """
+    Timing and throughput for one unit of work in a stage.
+
+    Use through `span()`; call `add()` inside the block to count records and
+    bytes. On exit the span is logged as one JSON line (with its labels) and
+    folded into the per-stage totals exported to Prometheus (labels are left
+    out there to keep series cardinality low).
+    """
+    __slots__ = ("stage", "labels", "records_in", "records_out", "bytes_in", "bytes_out", "start")
+
+    def __init__(self, stage, labels):
+        self.stage = stage
+        self.labels = labels
+        self.records_in = self.records_out = self.bytes_in = self.bytes_out = 0
+
+    def add(self, records_in=0, records_out=0, bytes_in=0, bytes_out=0):
+        self.records_in += records_in
+        self.records_out += records_out
+        self.bytes_in += bytes_in
+        self.bytes_out += bytes_out
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        duration = time.perf_counter() - self.start
+        records = self.records_out or self.records_in
+        event = {
+            "stage": self.stage,
+            **self.labels,
+            "duration_s": round(duration, 6),
+            "records_in": self.records_in,
+            "records_out": self.records_out,
+            "bytes_in": self.bytes_in,
+            "bytes_out": self.bytes_out,
+            "rows_per_sec": round(records / duration, 1) if duration > 0 else None,
+            "status": "error" if exc_type else "ok",
+        }
+        metrics_logger.info(json.dumps(event))
+
+        with _lock:
+            totals = _totals.setdefault(self.stage, dict.fromkeys(
+                ("count", "errors", "duration", "records_in", "records_out", "bytes_in", "bytes_out"), 0))
+            totals["count"] += 1
+            totals["errors"] += 1 if exc_type else 0
+            totals["duration"] += duration
+            totals["records_in"] += self.records_in
+            totals["records_out"] += self.records_out
+            totals["bytes_in"] += self.bytes_in
+            totals["bytes_out"] += self.bytes_out
+        return False
+
+class _NoopSpan:
+    """Shared do-nothing span returned while instrumentation is disabled."""
+    __slots__ = ()
+
+    def add(self, records_in=0, records_out=0, bytes_in=0, bytes_out=0):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+_NOOP_SPAN = _NoopSpan()
+
+def span(stage, **labels):
+    """
+    Time a block of work for `stage`.
+
+    Example:
+        with span("transform.file", file=name) as s:
+            records = transform(...)
+            s.add(records_in=len(bars), records_out=len(records))
+
+    Returns a shared no-op object when instrumentation is disabled, so the
+    overhead is one function call and an attribute check.
+    """
+    if not _settings["enabled"]:
+        return _NOOP_SPAN
+    return Span(stage, labels)
+
+def configure_metrics(settings, process):
+    """
+    Enable instrumentation from the `metrics` config section.
+
+    Args:
+        settings (dict): enabled, textfile, pushgateway and job keys.
+        process (str): Entry point name (extract, transform, load, ...). Each
+            process exports to its own textfile / Pushgateway group so the
+            separate scripts do not overwrite each other's metrics.
+    """
+    already_exporting = _settings.get("enabled") and (_settings.get("textfile") or _settings.get("pushgateway"))
+    _settings.update(settings or {}, process=process)
+    exporting = _settings.get("enabled") and (_settings.get("textfile") or _settings.get("pushgateway"))
+    if exporting and not already_exporting:
+        atexit.register(export_metrics)
+
+def render_prometheus():
+    """Render the aggregated per-stage totals in the Prometheus text exposition format."""
+    metrics = (
+        ("etl_stage_runs_total", "counter", "Completed spans per stage.", "count"),
+        ("etl_stage_errors_total", "counter", "Spans that raised an error.", "errors"),
+        ("etl_stage_duration_seconds_total", "counter", "Total time spent in the stage.", "duration"),
+        ("etl_stage_records_in_total", "counter", "Records consumed by the stage.", "records_in"),
+        ("etl_stage_records_out_total", "counter", "Records produced by the stage.", "records_out"),
+        ("etl_stage_bytes_in_total", "counter", "Bytes read by the stage.", "bytes_in"),
+        ("etl_stage_bytes_out_total", "counter", "Bytes written by the stage.", "bytes_out"),
+    )
+    with _lock:
+        snapshot = {key: dict(values) for key, values in _totals.items()}
+
+    lines = []
+    for name, kind, help_text, field in metrics:
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {kind}")
+        for stage, values in sorted(snapshot.items()):
+            lines.append(f'{name}{{stage="{stage}"}} {values[field]}')
+
+    lines.append("# HELP etl_stage_rows_per_second Records per second over the run.")
+    lines.append("# TYPE etl_stage_rows_per_second gauge")
+    for stage, values in sorted(snapshot.items()):
+        records = values["records_out"] or values["records_in"]
+        rate = records / values["duration"] if values["duration"] else 0.0
+        lines.append(f'etl_stage_rows_per_second{{stage="{stage}"}} {rate:.3f}')
+    return "\n".join(lines) + "\n"
+
+def export_metrics():
+    """Write the textfile and/or push to a Pushgateway, whichever is configured."""
+    if not _settings.get("enabled") or not _totals:
+        return
+    body = render_prometheus()
+
+    process = _settings["process"]
+    textfile = _settings.get("textfile")
+    if textfile:
+        # One file per process; write then rename so node_exporter never reads a partial file
+        path = Path(textfile)
+        path = path.with_name(f"{path.stem}_{process}{path.suffix}")
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_suffix(path.suffix + f".{os.getpid()}.tmp")
+        tmp_path.write_text(body)
+        os.replace(tmp_path, path)
+
+    pushgateway = _settings.get("pushgateway")
+    if pushgateway:
+        job = _settings.get("job", "rest_api_to_postgres")
+        request = urllib.request.Request(
+            f"{pushgateway.rstrip('/')}/metrics/job/{job}/process/{process}",
+            data=body.encode(),
+            method="PUT",
+            headers={"Content-Type": "text/plain; version=0.0.4"},
+        )
+        try:
+            urllib.request.urlopen(request, timeout=5).close()
+        except OSError as e:
+            logging.error(f"Failed to push metrics to {pushgateway}: {e}")
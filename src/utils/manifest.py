@@ -0,0 +1,183 @@
+##############################################
+# Title: Modular File Manifest Script
+# Author: Christopher Romanillos
+# Description: SQLite watermark store recording
+# which files each stage has handled.
+# Date: 02/01/25
+# Version: 1.3
+##############################################
+import sqlite3
+import hashlib
+import logging
+from datetime import datetime
+from pathlib import Path
+
+def file_checksum(path, chunk_size=1 << 20):
+    """Return the SHA-256 hex digest of a file."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as file:
+        for chunk in iter(lambda: file.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+class FileManifest:
+    """
+    Records which files a stage ("transform", "load", ...) has handled, and
+    checkpoints other units of work by key (see completed_keys/record_key).
+
+    A file counts as handled when the same stage already recorded the same
+    path with the same checksum, so reruns are no-ops while edited or
+    re-extracted files are picked up again. The file's size and mtime are
+    stored with the checksum, and only a file whose size or mtime changed
+    (or that has no row yet) is hashed again, so finding new work costs a
+    stat per file rather than reading all history.
+
+    Args:
+        db_path (str | Path): SQLite database file (created if missing).
+    """
+
+    def __init__(self, db_path):
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self.connection = sqlite3.connect(self.db_path)
+        self.connection.execute(
+            """
+            CREATE TABLE IF NOT EXISTS processed_files (
+                stage TEXT NOT NULL,
+                path TEXT NOT NULL,
+                checksum TEXT NOT NULL,
+                row_count INTEGER NOT NULL,
+                processed_at TEXT NOT NULL,
+                size INTEGER,
+                mtime_ns INTEGER,
+                PRIMARY KEY (stage, path)
+            )
+            """
+        )
+        # Manifests written before size/mtime were stored: their files are hashed once more
+        columns = {row[1] for row in self.connection.execute("PRAGMA table_info(processed_files)")}
+        for column in ('size', 'mtime_ns'):
+            if column not in columns:
+                self.connection.execute(f"ALTER TABLE processed_files ADD COLUMN {column} INTEGER")
+        self.connection.execute(
+            """
+            CREATE TABLE IF NOT EXISTS high_water_marks (
+                symbol TEXT NOT NULL,
+                interval TEXT NOT NULL,
+                timestamp TEXT,
+                refreshed_at TEXT NOT NULL,
+                PRIMARY KEY (symbol, interval)
+            )
+            """
+        )
+        self.connection.commit()
+        self._stats = {}  # Resolved path -> (size, mtime_ns) as seen by pending()
+
+    def pending(self, stage, files):
+        """
+        Filter files down to those the stage has not handled yet.
+
+        Args:
+            stage (str): Stage name.
+            files (iterable): Candidate file paths.
+
+        Returns:
+            list: (path, checksum) tuples for pending files, oldest first by mtime.
+        """
+        handled = {path: (checksum, size, mtime_ns) for path, checksum, size, mtime_ns in self.connection.execute(
+            "SELECT path, checksum, size, mtime_ns FROM processed_files WHERE stage = ?", (stage,)
+        )}
+
+        stats = sorted(((Path(path), Path(path).stat()) for path in files), key=lambda item: item[1].st_mtime_ns)
+        pending = []
+        touched = []
+        for path, stat in stats:
+            key = str(path.resolve())
+            self._stats[key] = (stat.st_size, stat.st_mtime_ns)
+            checksum, size, mtime_ns = handled.get(key, (None, None, None))
+            if checksum is not None and (size, mtime_ns) == (stat.st_size, stat.st_mtime_ns):
+                continue
+            current = file_checksum(path)
+            if current == checksum:
+                # Same contents under a new mtime (touched or copied): remember it so it is not hashed again
+                touched.append((stat.st_size, stat.st_mtime_ns, stage, key))
+            else:
+                pending.append((path, current))
+        if touched:
+            self.connection.executemany(
+                "UPDATE processed_files SET size = ?, mtime_ns = ? WHERE stage = ? AND path = ?", touched
+            )
+            self.connection.commit()
+        logging.info(f"{len(pending)} pending file(s) for stage '{stage}'.")
+        return pending
+
+    def record(self, stage, path, checksum, row_count):
+        """Mark a file as handled by the stage (with the size and mtime pending() saw, when it saw the file)."""
+        key = str(Path(path).resolve())
+        if key not in self._stats:
+            stat = Path(path).stat()
+            self._stats[key] = (stat.st_size, stat.st_mtime_ns)
+        size, mtime_ns = self._stats[key]
+        self.connection.execute(
+            "INSERT OR REPLACE INTO processed_files (stage, path, checksum, row_count, processed_at, size, mtime_ns) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (stage, key, checksum, row_count, datetime.utcnow().isoformat(), size, mtime_ns),
+        )
+        self.connection.commit()
+
+    def completed_keys(self, stage):
+        """
+        Keys (e.g. backfill slices) recorded for a stage with record_key.
+
+        Returns:
+            dict: key -> when it was recorded (UTC datetime).
+        """
+        return {key: datetime.fromisoformat(processed_at) for key, processed_at in self.connection.execute(
+            "SELECT path, processed_at FROM processed_files WHERE stage = ?", (stage,)
+        )}
+
+    def record_key(self, stage, key, row_count):
+        """Mark a non-file unit of work (such as a backfill slice) as handled by the stage."""
+        self.connection.execute(
+            "INSERT OR REPLACE INTO processed_files (stage, path, checksum, row_count, processed_at) "
+            "VALUES (?, ?, ?, ?, ?)",
+            (stage, key, '', row_count, datetime.utcnow().isoformat()),
+        )
+        self.connection.commit()
+
+    def cached_high_water_marks(self):
+        """
+        Cached latest loaded bar per symbol/interval (see utils/delta.py).
+
+        Returns:
+            dict: (symbol, interval) -> (timestamp or None, refreshed_at) as datetimes.
+        """
+        rows = self.connection.execute("SELECT symbol, interval, timestamp, refreshed_at FROM high_water_marks")
+        return {
+            (symbol, interval): (datetime.fromisoformat(timestamp) if timestamp else None,
+                                 datetime.fromisoformat(refreshed_at))
+            for symbol, interval, timestamp, refreshed_at in rows
+        }
+
+    def store_high_water_mark(self, symbol, interval, timestamp, refreshed_at=None):
+        """Cache the latest loaded bar for a symbol/interval (timestamp None when it has no rows)."""
+        existing = self.connection.execute(
+            "SELECT refreshed_at FROM high_water_marks WHERE symbol = ? AND interval = ?", (symbol, interval)
+        ).fetchone()
+        # Advancing after a load keeps the original refresh time, so the TTL still forces a re-read
+        if refreshed_at is None:
+            refreshed_at = datetime.fromisoformat(existing[0]) if existing else datetime.utcnow()
+        self.connection.execute(
+            "INSERT OR REPLACE INTO high_water_marks VALUES (?, ?, ?, ?)",
+            (symbol, interval, timestamp.isoformat() if timestamp else None, refreshed_at.isoformat()),
+        )
+        self.connection.commit()
+
+    def close(self):
+        self.connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
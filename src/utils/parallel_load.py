@@ -0,0 +1,189 @@
+##############################################
+# Title: Modular Parallel Load Script
+# Author: Christopher Romanillos
+# Description: Shards a load batch by symbol
+# and monthly partition and upserts the shards
+# over several pooled connections at once.
+# Date: 04/12/25
+# Version: 1.2
+##############################################
+import time
+import random
+import logging
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+from utils.db_loader import upsert_records
+from utils.bar_batch import BarBatch
+from utils.partitions import ensure_partitions
+
+# SQLSTATEs worth retrying: serialization failure, deadlock, lock timeout,
+# admin shutdown/crash recovery and every connection exception (class 08)
+TRANSIENT_SQLSTATES = {'40001', '40P01', '55P03', '57P01', '57P02', '57P03'}
+
+def is_transient(error):
+    """True for database errors a retry can fix (dropped connections, deadlocks...)."""
+    pgcode = getattr(error, 'pgcode', None) or getattr(getattr(error, 'orig', None), 'pgcode', None)
+    if pgcode:
+        return pgcode in TRANSIENT_SQLSTATES or pgcode.startswith('08')
+    # Connection failures raised before the server answered carry no SQLSTATE
+    return type(error).__name__ in ('OperationalError', 'InterfaceError')
+
+def _month_key(timestamp):
+    if isinstance(timestamp, datetime):
+        return timestamp.strftime('%Y-%m')
+    return str(timestamp)[:7]  # "YYYY-MM-DD HH:MM:SS"
+
+def _shard_key_array(table, symbol):
+    """"<symbol>|<YYYY-MM>" per row of an Arrow table."""
+    import pyarrow as pa
+    import pyarrow.compute as pc
+
+    symbols = table['symbol'] if 'symbol' in table.column_names else pa.repeat(pa.scalar(symbol, pa.string()), table.num_rows)
+    return pc.binary_join_element_wise(symbols, pc.strftime(table['timestamp'], format='%Y-%m'), '|')
+
+def _assign(counts, workers):
+    """Greedy balance: largest group first, onto the shard with the fewest rows so far."""
+    bins = [[] for _ in range(min(workers, len(counts)))]
+    sizes = [0] * len(bins)
+    for key, count in sorted(counts.items(), key=lambda item: item[1], reverse=True):
+        index = sizes.index(min(sizes))
+        bins[index].append(key)
+        sizes[index] += count
+    return bins
+
+def shard_batch(data, workers, symbol=None):
+    """
+    Split a load batch into at most `workers` shards of whole (symbol, month) groups.
+
+    A group never spans shards, so two workers never write the same rows, and
+    each worker touches as few partitions as possible. Groups are assigned
+    largest first to the currently smallest shard to balance row counts.
+
+    Args:
+        data (list | pyarrow.Table): Processed records or a typed Arrow table.
+        workers (int): Number of shards wanted.
+        symbol (str): Symbol for records that do not carry one.
+
+    Returns:
+        tuple: (shards, months) where shards is a list of (group keys, data) and
+            months is the sorted list of "YYYY-MM" months in the batch.
+    """
+    if hasattr(data, 'to_batches'):
+        import pyarrow as pa
+        import pyarrow.compute as pc
+
+        keys = _shard_key_array(data, symbol)
+        value_counts = pc.value_counts(keys)
+        counts = {
+            tuple(key.split('|', 1)): count
+            for key, count in zip(value_counts.field('values').to_pylist(), value_counts.field('counts').to_pylist())
+        }
+        shards = [
+            (groups, data.filter(pc.is_in(keys, value_set=pa.array(['|'.join(group) for group in groups]))))
+            for groups in _assign(counts, workers)
+        ]
+    else:
+        grouped = {}
+        for record in data:
+            timestamp = record.get('timestamp')
+            if timestamp is None:
+                continue  # Rejected (and logged) by the loader's validation anyway
+            grouped.setdefault((record.get('symbol', symbol), _month_key(timestamp)), []).append(record)
+        counts = {key: len(records) for key, records in grouped.items()}
+        shards = [
+            (groups, [record for group in groups for record in grouped[group]])
+            for groups in _assign(counts, workers)
+        ]
+    return shards, sorted({month for _, month in counts})
+
+def _ensure_batch_partitions(engine, months):
+    """Create every partition the batch needs up front, so workers never race to create one."""
+    if not months:
+        return
+    connection = engine.raw_connection()
+    try:
+        ensure_partitions(connection.cursor(), datetime.strptime(months[0], '%Y-%m'), datetime.strptime(months[-1], '%Y-%m'))
+        connection.commit()
+    except Exception:
+        connection.rollback()
+        raise
+    finally:
+        connection.close()
+
+def parallel_upsert(engine, data, workers=4, on_conflict='update', chunk_size=50000, symbol=None, interval=None,
+                    max_attempts=3, backoff_base=1.0, quality=None):
+    """
+    Upsert a batch over `workers` connections, one independently committed shard each.
+
+    Every shard is a complete upsert_records call (its own staging table and
+    transaction), so a shard that fails after its retries leaves the others
+    committed; since upserts are idempotent, rerunning the whole batch later
+    is safe. Size the engine pool to at least `workers`.
+
+    Args:
+        engine: SQLAlchemy engine backed by psycopg2.
+        data (list | BarBatch | pyarrow.Table): Processed records, a BarBatch or a typed Arrow table.
+        workers (int): Concurrent connections.
+        on_conflict (str): "update" or "nothing" (see upsert_records).
+        chunk_size (int): Rows buffered per COPY call.
+        symbol (str): Symbol for records that do not carry one.
+        interval (str): Interval for records that do not carry one.
+        max_attempts (int): Tries per shard on transient errors.
+        backoff_base (float): Seconds before the first retry, doubled per attempt with jitter.
+        quality (dict): The `quality` config section, checked per shard (see utils/quality.py).
+
+    Returns:
+        dict: Summary with shard, row and retry counts, per-shard results and rows/sec.
+    """
+    start = time.monotonic()
+    if isinstance(data, BarBatch):
+        data = data.to_table()
+    shards, months = shard_batch(data, workers, symbol)
+    _ensure_batch_partitions(engine, months)
+
+    def load_shard(index, keys, shard):
+        shard_start = time.monotonic()
+        for attempt in range(max_attempts):
+            try:
+                counts = upsert_records(engine, shard, on_conflict=on_conflict, chunk_size=chunk_size,
+                                        symbol=symbol, interval=interval, quality=quality)
+                return dict(counts, shard=index, groups=len(keys), rows=len(shard), attempts=attempt + 1,
+                            seconds=time.monotonic() - shard_start, status='ok')
+            except Exception as e:
+                if attempt + 1 < max_attempts and is_transient(e):
+                    delay = random.uniform(0, backoff_base * (2 ** attempt))
+                    logging.warning(f"Shard {index} attempt {attempt + 1} failed ({e}); retrying in {delay:.1f}s.")
+                    time.sleep(delay)
+                    continue
+                logging.error(f"Shard {index} ({len(shard)} rows) failed after {attempt + 1} attempt(s): {e}")
+                return {"shard": index, "groups": len(keys), "rows": len(shard), "attempts": attempt + 1,
+                        "seconds": time.monotonic() - shard_start, "status": "failed", "error": str(e)}
+
+    with ThreadPoolExecutor(max_workers=max(1, len(shards)), thread_name_prefix='load-shard') as executor:
+        results = list(executor.map(lambda args: load_shard(*args),
+                                    [(index, keys, shard) for index, (keys, shard) in enumerate(shards)]))
+
+    elapsed = time.monotonic() - start
+    succeeded = [result for result in results if result['status'] == 'ok']
+    summary = {
+        "workers": len(shards),
+        "shards": len(results),
+        "failed": len(results) - len(succeeded),
+        "rows": sum(result['rows'] for result in results),
+        "inserted": sum(result['inserted'] for result in succeeded),
+        "updated": sum(result['updated'] for result in succeeded),
+        "skipped": sum(result['skipped'] for result in succeeded),
+        "rejected": sum(result['rejected'] for result in succeeded),
+        "retries": sum(result['attempts'] - 1 for result in results),
+        "elapsed": elapsed,
+        "rows_per_sec": sum(result['rows'] for result in succeeded) / elapsed if elapsed else 0.0,
+        "results": results,
+    }
+    logging.info(
+        f"Parallel load: {summary['shards']} shard(s) on {summary['workers']} connection(s), "
+        f"{summary['failed']} failed, {summary['rows']} rows ({summary['inserted']} inserted, "
+        f"{summary['updated']} updated, {summary['skipped']} skipped, {summary['rejected']} rejected), "
+        f"{summary['retries']} retries, "
+        f"{summary['rows_per_sec']:,.0f} rows/sec."
+    )
+    return summary
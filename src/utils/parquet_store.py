@@ -0,0 +1,133 @@
+##############################################
+# Title: Modular Parquet Storage Script
+# Author: Christopher Romanillos
+# Description: Typed Parquet output for processed
+# data, partitioned by symbol and date.
+# Date: 02/08/25
+# Version: 1.2
+##############################################
+import logging
+from datetime import datetime
+from pathlib import Path
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+
+# Typed schema matching schema.IntradayData
+PROCESSED_SCHEMA = pa.schema([
+    pa.field("symbol", pa.string(), nullable=False),
+    pa.field("interval", pa.string(), nullable=False),
+    pa.field("timestamp", pa.timestamp("s"), nullable=False),
+    pa.field("open", pa.float64(), nullable=False),
+    pa.field("high", pa.float64(), nullable=False),
+    pa.field("low", pa.float64(), nullable=False),
+    pa.field("close", pa.float64(), nullable=False),
+    pa.field("volume", pa.int64(), nullable=False),
+])
+
+def records_to_table(records, symbol, interval):
+    """Build a typed table from processed-record dicts."""
+    return pa.Table.from_pylist(
+        [dict(record, symbol=symbol, interval=interval) for record in records],
+        schema=PROCESSED_SCHEMA,
+    )
+
+def columns_to_table(columns, reject, symbol, interval):
+    """Build a typed table straight from vectorized transform columns (no per-row objects)."""
+    keep = ~reject
+    rows = int(keep.sum())
+    arrays = [pa.repeat(pa.scalar(symbol, pa.string()), rows), pa.repeat(pa.scalar(interval, pa.string()), rows)]
+    arrays += [pa.array(columns[name][keep]) for name in ("timestamp", "open", "high", "low", "close", "volume")]
+    return pa.Table.from_arrays(arrays, schema=PROCESSED_SCHEMA)
+
+def _partitions(table, root):
+    """(partition directory, rows) for each symbol/date in the table."""
+    dates = pc.cast(table["timestamp"], pa.date32())
+    for symbol in pc.unique(table["symbol"]).to_pylist():
+        symbol_mask = pc.equal(table["symbol"], symbol)
+        for date in pc.unique(pc.filter(dates, symbol_mask)).to_pylist():
+            part = table.filter(pc.and_(symbol_mask, pc.equal(dates, pa.scalar(date, pa.date32()))))
+            yield root / f"symbol={symbol}" / f"date={date.isoformat()}", part
+
+def save_processed_parquet(table, processed_data_dir, stem=None):
+    """
+    Write processed data as Parquet, one file per symbol/date partition.
+
+    Files land in `<dir>/symbol=<SYM>/date=<YYYY-MM-DD>/<stem>.parquet`.
+
+    Args:
+        table (pa.Table): Table with PROCESSED_SCHEMA.
+        processed_data_dir (str | Path): Root of the partitioned dataset.
+        stem (str): File name stem; defaults to a processed_data_<timestamp> name.
+
+    Returns:
+        list: Paths of the files written.
+    """
+    stem = stem or f"processed_data_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+    root = Path(processed_data_dir)
+    written = []
+
+    try:
+        for part_dir, part in _partitions(table, root):
+            part_dir.mkdir(parents=True, exist_ok=True)
+            file_path = part_dir / f"{stem}.parquet"
+            pq.write_table(part, file_path, compression="zstd")
+            written.append(file_path)
+        logging.info(f"Processed data saved to {len(written)} Parquet file(s) under {root}.")
+        return written
+    except Exception as e:
+        logging.error(f"Error saving processed Parquet data: {e}")
+        raise
+
+class ParquetChunkWriter:
+    """
+    Write processed tables chunk by chunk into the files save_processed_parquet
+    would produce, each chunk appended as row groups, so a streamed transform
+    never holds its whole output.
+
+    Files are written as `<stem>.parquet.part` and renamed by close(), so the
+    loader never picks up a half-written file; abort() removes them.
+
+    Args:
+        processed_data_dir (str | Path): Root of the partitioned dataset.
+        stem (str): File name stem.
+    """
+
+    def __init__(self, processed_data_dir, stem):
+        self.root = Path(processed_data_dir)
+        self.stem = stem
+        self.records = 0
+        self._writers = {}  # partition directory -> ParquetWriter
+
+    def write(self, table):
+        for part_dir, part in _partitions(table, self.root):
+            writer = self._writers.get(part_dir)
+            if writer is None:
+                part_dir.mkdir(parents=True, exist_ok=True)
+                writer = pq.ParquetWriter(part_dir / f"{self.stem}.parquet.part", PROCESSED_SCHEMA, compression="zstd")
+                self._writers[part_dir] = writer
+            writer.write_table(part)
+        self.records += table.num_rows
+
+    def close(self):
+        """Finish every file; returns their paths."""
+        written = []
+        for part_dir, writer in self._writers.items():
+            writer.close()
+            file_path = part_dir / f"{self.stem}.parquet"
+            (part_dir / f"{self.stem}.parquet.part").replace(file_path)
+            written.append(file_path)
+        self._writers = {}
+        logging.info(f"Processed data saved to {len(written)} Parquet file(s) under {self.root}.")
+        return written
+
+    def abort(self):
+        """Drop the partly written files."""
+        for part_dir, writer in self._writers.items():
+            writer.close()
+            (part_dir / f"{self.stem}.parquet.part").unlink(missing_ok=True)
+        self._writers = {}
+
+def read_processed_parquet(file_path):
+    """Memory-map a processed Parquet file and return it as a typed table."""
+    return pq.read_table(file_path, memory_map=True, schema=PROCESSED_SCHEMA)
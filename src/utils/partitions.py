@@ -0,0 +1,177 @@
+##############################################
+# Title: Modular Partition Maintenance Script
+# Author: Christopher Romanillos
+# Description: Creates monthly range partitions
+# of intraday_data and migrates legacy tables.
+# Date: 02/15/25
+# Version: 1.0
+##############################################
+import logging
+from datetime import datetime
+
+PARENT_TABLE = 'intraday_data'
+DEFAULT_PARTITION = f'{PARENT_TABLE}_default'
+
+def month_start(value):
+    """First instant of the month containing `value`."""
+    return datetime(value.year, value.month, 1)
+
+def next_month(value):
+    """First instant of the month after `value`."""
+    return datetime(value.year + value.month // 12, value.month % 12 + 1, 1)
+
+def partition_name(month):
+    """Partition table name for a month, e.g. intraday_data_y2024m11."""
+    return f"{PARENT_TABLE}_y{month.year}m{month.month:02d}"
+
+def existing_partitions(cursor):
+    """Names of the partitions currently attached to intraday_data."""
+    cursor.execute(
+        """
+        SELECT child.relname
+        FROM pg_inherits
+        JOIN pg_class parent ON pg_inherits.inhparent = parent.oid
+        JOIN pg_class child ON pg_inherits.inhrelid = child.oid
+        WHERE parent.relname = %s
+        """,
+        (PARENT_TABLE,),
+    )
+    return {row[0] for row in cursor.fetchall()}
+
+def ensure_default_partition(cursor):
+    """Create the catch-all partition for rows outside every monthly partition."""
+    cursor.execute(f"CREATE TABLE IF NOT EXISTS {DEFAULT_PARTITION} PARTITION OF {PARENT_TABLE} DEFAULT")
+
+def create_month_partition(cursor, month):
+    """
+    Create the partition for one month, moving any rows for that month out of
+    the default partition first (PostgreSQL refuses to attach otherwise).
+    """
+    name = partition_name(month)
+    lower, upper = month_start(month), next_month(month)
+
+    cursor.execute(f"CREATE TABLE {name} (LIKE {PARENT_TABLE} INCLUDING DEFAULTS INCLUDING CONSTRAINTS)")
+    cursor.execute(
+        f"""
+        WITH moved AS (
+            DELETE FROM {DEFAULT_PARTITION}
+            WHERE "timestamp" >= %s AND "timestamp" < %s
+            RETURNING *
+        )
+        INSERT INTO {name} SELECT * FROM moved
+        """,
+        (lower, upper),
+    )
+    moved = cursor.rowcount
+    cursor.execute(
+        f"ALTER TABLE {PARENT_TABLE} ATTACH PARTITION {name} FOR VALUES FROM (%s) TO (%s)",
+        (lower, upper),
+    )
+    logging.info(f"Created partition {name} [{lower:%Y-%m-%d}, {upper:%Y-%m-%d}) ({moved} rows moved from default).")
+
+def ensure_partitions(cursor, start, end):
+    """
+    Make sure a monthly partition exists for every month in [start, end].
+
+    Args:
+        cursor: DBAPI cursor on a connection in a transaction (caller commits).
+        start (datetime): Earliest timestamp to cover.
+        end (datetime): Latest timestamp to cover.
+
+    Returns:
+        list: Names of the partitions created.
+    """
+    ensure_default_partition(cursor)
+    existing = existing_partitions(cursor)
+    created = []
+
+    month = month_start(start)
+    while month <= end:
+        if partition_name(month) not in existing:
+            create_month_partition(cursor, month)
+            created.append(partition_name(month))
+        month = next_month(month)
+    return created
+
+def is_partitioned(cursor):
+    """True if intraday_data exists and is a partitioned table."""
+    cursor.execute(
+        """
+        SELECT c.relkind
+        FROM pg_class c JOIN pg_namespace n ON n.oid = c.relnamespace
+        WHERE c.relname = %s AND n.nspname = current_schema()
+        """,
+        (PARENT_TABLE,),
+    )
+    row = cursor.fetchone()
+    return row is not None and row[0] == 'p'
+
+def rename_legacy_table(cursor, legacy_table):
+    """
+    Rename an unpartitioned intraday_data (and its constraints, indexes and id
+    sequence) out of the way so the partitioned table can be created.
+
+    Returns:
+        bool: True if a legacy table was renamed.
+    """
+    cursor.execute("SELECT to_regclass(%s)", (PARENT_TABLE,))
+    if cursor.fetchone()[0] is None or is_partitioned(cursor):
+        return False
+
+    cursor.execute(f"ALTER TABLE {PARENT_TABLE} RENAME TO {legacy_table}")
+
+    # Constraint names (their backing indexes follow the rename)
+    cursor.execute(
+        "SELECT conname FROM pg_constraint WHERE conrelid = %s::regclass AND conname LIKE %s",
+        (legacy_table, f"{PARENT_TABLE}%"),
+    )
+    for (name,) in cursor.fetchall():
+        cursor.execute(
+            f'ALTER TABLE {legacy_table} RENAME CONSTRAINT "{name}" TO "{name.replace(PARENT_TABLE, legacy_table, 1)}"'
+        )
+
+    # Plain indexes, e.g. ix_intraday_data_timestamp
+    cursor.execute(
+        "SELECT indexname FROM pg_indexes WHERE tablename = %s AND indexname LIKE %s",
+        (legacy_table, f"%{PARENT_TABLE}%"),
+    )
+    for (name,) in cursor.fetchall():
+        if legacy_table not in name:
+            cursor.execute(f'ALTER INDEX "{name}" RENAME TO "{name.replace(PARENT_TABLE, legacy_table, 1)}"')
+
+    cursor.execute(f"ALTER SEQUENCE IF EXISTS {PARENT_TABLE}_id_seq RENAME TO {legacy_table}_id_seq")
+    logging.info(f"Renamed unpartitioned {PARENT_TABLE} to {legacy_table}.")
+    return True
+
+def copy_legacy_rows(cursor, legacy_table, symbol, interval):
+    """
+    Copy bars from the legacy single-symbol table into the partitioned table.
+
+    Args:
+        cursor: DBAPI cursor (caller commits).
+        legacy_table (str): Table renamed by rename_legacy_table.
+        symbol (str): Symbol the legacy rows belong to.
+        interval (str): Interval the legacy rows were extracted at.
+
+    Returns:
+        int: Number of rows copied.
+    """
+    cursor.execute(f'SELECT min("timestamp"), max("timestamp") FROM {legacy_table}')
+    start, end = cursor.fetchone()
+    if start is None:
+        return 0
+
+    ensure_partitions(cursor, start, end)
+    cursor.execute(
+        f"""
+        INSERT INTO {PARENT_TABLE}
+            (symbol, "interval", "timestamp", open, high, low, close, volume, created_at)
+        SELECT %s, %s, "timestamp", open, high, low, close, volume, created_at
+        FROM {legacy_table}
+        ON CONFLICT (symbol, "interval", "timestamp") DO NOTHING
+        """,
+        (symbol, interval),
+    )
+    copied = cursor.rowcount
+    logging.info(f"Copied {copied} legacy rows into {PARENT_TABLE} as {symbol}/{interval}.")
+    return copied
@@ -0,0 +1,126 @@
+##############################################
+# Title: Modular Payload Descriptor Script
+# Author: Christopher Romanillos
+# Description: Registry describing each Alpha
+# Vantage time-series payload (series key, field
+# names, timestamp format) by function/interval.
+# Date: 03/29/25
+# Version: 1.0
+##############################################
+from operator import itemgetter
+
+INTRADAY_INTERVALS = ('1min', '5min', '15min', '30min', '60min')
+SERIES_PREFIX = "Time Series"
+
+class PayloadDescriptor:
+    """
+    How to read one kind of time-series payload.
+
+    Field extractors are compiled once (operator.itemgetter), so pulling the
+    OHLCV strings out of a bar is a single C call however many bars there are.
+
+    Args:
+        function (str): API function, e.g. "TIME_SERIES_INTRADAY".
+        interval (str): Interval label stored with the bars, e.g. "5min" or "daily".
+        series_key (str): Top-level key holding the bars, e.g. "Time Series (5min)".
+        fields (dict): Output column (open/high/low/close/volume) -> raw field name.
+        timestamp_length (int): Length of a valid bar timestamp string.
+        request_params (dict): Query parameters selecting this payload.
+    """
+    __slots__ = ("function", "interval", "series_key", "fields", "timestamp_length",
+                 "request_params", "required_fields", "extract")
+
+    def __init__(self, function, interval, series_key, fields, timestamp_length, request_params):
+        self.function = function
+        self.interval = interval
+        self.series_key = series_key
+        self.fields = fields
+        self.timestamp_length = timestamp_length
+        self.request_params = request_params
+        self.required_fields = tuple(fields.values())
+        # bar -> (open, high, low, close, volume) raw strings
+        self.extract = itemgetter(*(fields[column] for column in ("open", "high", "low", "close", "volume")))
+
+    def __repr__(self):
+        return f"PayloadDescriptor({self.function!r}, {self.interval!r})"
+
+_registry = {}
+
+def register(descriptor):
+    """Add (or replace) a descriptor, keyed by (function, interval)."""
+    _registry[(descriptor.function, descriptor.interval)] = descriptor
+    return descriptor
+
+def get_descriptor(function='TIME_SERIES_INTRADAY', interval='5min'):
+    """Descriptor for an API function and interval (interval is ignored for daily functions)."""
+    descriptor = _registry.get((function, interval)) or _registry.get((function, 'daily'))
+    if descriptor is None:
+        raise KeyError(f"No payload descriptor registered for {function} / {interval}.")
+    return descriptor
+
+def detect_descriptor(series_key, meta_data=None):
+    """
+    Descriptor for a payload from its series key (and Meta Data, which tells
+    adjusted daily series apart from raw ones).
+
+    Returns:
+        PayloadDescriptor, or None if the key is not a known series.
+    """
+    information = (meta_data or {}).get("1. Information", "")
+    candidates = [descriptor for descriptor in _registry.values() if descriptor.series_key == series_key]
+    if len(candidates) > 1:
+        # Adjusted daily payloads describe themselves as "... with Splits and Dividend Events"
+        adjusted = "Dividend" in information
+        candidates = [descriptor for descriptor in candidates if descriptor.function.endswith("_ADJUSTED") == adjusted]
+    return candidates[0] if candidates else None
+
+def find_series_key(data):
+    """The "Time Series (...)" key present in a parsed payload, or None."""
+    return next((key for key in data if key.startswith(SERIES_PREFIX)), None)
+
+def describe_payload(data):
+    """Descriptor for a fully parsed payload, or None if it has no known series."""
+    series_key = find_series_key(data)
+    return detect_descriptor(series_key, data.get("Meta Data")) if series_key else None
+
+def configured_descriptors(api_config):
+    """
+    Descriptors selected by the `api` config section: `function` with each of
+    `intervals` (falling back to `interval`). Daily functions yield one descriptor.
+    """
+    function = api_config.get('function', 'TIME_SERIES_INTRADAY')
+    intervals = api_config.get('intervals') or [api_config.get('interval', '5min')]
+    descriptors = []
+    for interval in intervals:
+        descriptor = get_descriptor(function, interval)
+        if descriptor not in descriptors:
+            descriptors.append(descriptor)
+    return descriptors
+
+def meta_symbol_interval(meta_data, descriptor, default_symbol, default_interval):
+    """Symbol and interval for a payload, falling back to config when Meta Data lacks them."""
+    symbol = meta_data.get("2. Symbol", default_symbol)
+    if descriptor.function == 'TIME_SERIES_INTRADAY':
+        return symbol, meta_data.get("4. Interval", descriptor.interval)
+    return symbol, descriptor.interval
+
+# Field layouts
+_OHLCV = {"open": "1. open", "high": "2. high", "low": "3. low", "close": "4. close", "volume": "5. volume"}
+_ADJUSTED_OHLCV = dict(_OHLCV, volume="6. volume")
+_INTRADAY_TIMESTAMP = len("YYYY-MM-DD HH:MM:SS")
+_DAILY_TIMESTAMP = len("YYYY-MM-DD")
+
+for _interval in INTRADAY_INTERVALS:
+    register(PayloadDescriptor(
+        'TIME_SERIES_INTRADAY', _interval, f"{SERIES_PREFIX} ({_interval})", _OHLCV, _INTRADAY_TIMESTAMP,
+        {'function': 'TIME_SERIES_INTRADAY', 'interval': _interval, 'adjusted': 'false'},
+    ))
+
+register(PayloadDescriptor(
+    'TIME_SERIES_DAILY', 'daily', f"{SERIES_PREFIX} (Daily)", _OHLCV, _DAILY_TIMESTAMP,
+    {'function': 'TIME_SERIES_DAILY'},
+))
+register(PayloadDescriptor(
+    'TIME_SERIES_DAILY_ADJUSTED', 'daily', f"{SERIES_PREFIX} (Daily)", _ADJUSTED_OHLCV, _DAILY_TIMESTAMP,
+    {'function': 'TIME_SERIES_DAILY_ADJUSTED'},
+))
@@ -0,0 +1,242 @@
+##############################################
+# Title: Modular Streaming Pipeline Script
+# Author: Christopher Romanillos
+# Description: In-memory extract -> transform
+# -> load pipeline over bounded queues.
+# Date: 01/18/25
+# Version: 1.7
+##############################################
+import time
+import queue
+import logging
+import threading
+from datetime import datetime
+from pathlib import Path
+from utils.utils import save_to_file, validate_data
+from utils.file_handler import save_processed_data
+from utils.bar_batch import transform_batch
+from utils.async_extract import run_requests
+from utils.db_loader import upsert_records
+from utils.instrumentation import span
+from utils.payloads import configured_descriptors
+from utils.rollups import ROLLUP_TARGETS, refresh_rollups
+from utils.response_cache import UNCHANGED, request_key
+
+# Marks the end of a stage's output
+_DONE = object()
+
+def _drain(stage_queue):
+    """Discard items until the upstream stage's _DONE, so it is never left blocked on a full queue."""
+    while stage_queue.get() is not _DONE:
+        pass
+
+def _percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+def run_pipeline(config, engine, api_key, symbols=None, raw_data_dir=None, processed_data_dir=None,
+                 high_water_marks=None, extractor=None, cache=None):
+    """
+    Stream extract -> transform -> load in one process.
+
+    One request is made per symbol and configured payload (`api.function` with
+    each of `api.intervals`), so mixed intervals share a single batched pass.
+
+    Extraction runs in a background thread and hands each symbol's response to
+    a transform thread through a bounded queue; the calling thread loads each
+    transformed batch as soon as it arrives, so rows are committed while later
+    symbols are still being fetched. Full queues block the upstream stage.
+    When a stage fails, the stages before it stop handing on work and their
+    queues are drained, so the run ends instead of blocking on a full queue.
+
+    Args:
+        config (dict): Parsed config.yaml.
+        engine: SQLAlchemy engine used by the loader.
+        api_key (str): Alpha Vantage API key.
+        symbols (list): Symbols to run; defaults to api.symbols / api.symbol.
+        raw_data_dir (Path): Where to write raw side-output when pipeline.save_raw is set.
+        processed_data_dir (Path): Where to write processed side-output when pipeline.save_processed is set.
+        high_water_marks (HighWaterMarks): In delta mode, drops bars already loaded before
+            transforming and advances the marks after each commit.
+        extractor (AsyncExtractor): Long-lived extractor to reuse; a one-off client is used otherwise.
+        cache (ResponseCache): Response cache for the one-off client (an extractor carries its own).
+            Responses unchanged since the last run never reach transform or load;
+            changed ones are committed to the cache only after their load (and
+            rollup refresh) succeeds, so a failed symbol is processed again next run.
+
+    Returns:
+        dict: Run summary with counts and latency statistics. `errors` counts
+            failed fetches, invalid responses and failed stages, loads and rollups.
+    """
+    api_config = config['api']
+    settings = config.get('pipeline', {})
+    load_settings = config.get('load', {})
+    rollup_settings = config.get('rollups', {})
+    transform_engine = config.get('transform', {}).get('engine', 'threaded')
+    symbols = symbols or api_config.get('symbols') or [api_config['symbol']]
+    descriptors = configured_descriptors(api_config)
+    save_raw = settings.get('save_raw', False) and raw_data_dir
+    save_processed = settings.get('save_processed', False) and processed_data_dir
+    response_cache = extractor.cache if extractor else cache
+
+    extracted = queue.Queue(maxsize=settings.get('queue_size', 8))
+    transformed = queue.Queue(maxsize=settings.get('queue_size', 8))
+    # Set when a downstream stage fails; upstream stages then stop handing on work
+    stop = threading.Event()
+    errors = []
+    unchanged = []
+
+    requests = {
+        (symbol, descriptor): dict(descriptor.request_params, symbol=symbol, apikey=api_key)
+        for symbol in symbols
+        for descriptor in descriptors
+    }
+
+    def extract():
+        try:
+            def on_result(key, data):
+                if stop.is_set():
+                    return
+                # Blocking put applies backpressure to the fetch loop
+                extracted.put((key, data, time.monotonic()))
+            if extractor:
+                results = extractor.run_requests(requests, api_config['endpoint'], on_result)
+            else:
+                results = run_requests(requests, api_config['endpoint'], api_config, on_result, cache)
+            unchanged.extend(key for key, result in results.items() if result is UNCHANGED)
+            # Fetch, API and rate-limit failures come back per request instead of raising
+            errors.extend(result for result in results.values() if isinstance(result, Exception))
+        except Exception as e:
+            logging.error(f"Extract stage failed: {e}")
+            errors.append(e)
+        finally:
+            extracted.put(_DONE)
+
+    def transform():
+        try:
+            while True:
+                item = extracted.get()
+                if item is _DONE:
+                    break
+                if stop.is_set():
+                    continue
+                (symbol, descriptor), data, received = item
+                interval = descriptor.interval
+                cache_key = request_key(requests[symbol, descriptor])
+                if not validate_data(data, ['Meta Data', descriptor.series_key]):
+                    logging.error(f"Skipping {symbol}/{interval}: response failed validation.")
+                    errors.append(ValueError(f"Response for {symbol}/{interval} failed validation."))
+                    if response_cache is not None:
+                        response_cache.discard(cache_key)
+                    continue
+
+                stamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+                if save_raw:
+                    data['extraction_time'] = stamp
+                    save_to_file(data, Path(raw_data_dir) / f"data_{symbol}_{interval}_{stamp}.json")
+
+                time_series = data[descriptor.series_key]
+                if high_water_marks:
+                    time_series = high_water_marks.filter(symbol, interval, time_series)
+                with span("pipeline.transform", symbol=symbol, interval=interval) as transform_span:
+                    # Compact arrays from here to the COPY (see utils/bar_batch.py)
+                    batch, rejected = transform_batch(time_series, symbol, interval, descriptor, transform_engine)
+                    transform_span.add(records_in=len(time_series), records_out=len(batch))
+                if rejected:
+                    logging.warning(f"{rejected} bars rejected for {symbol}/{interval}.")
+                if save_processed and len(batch):
+                    save_processed_data(batch.to_records(), processed_data_dir, symbol=f"{symbol}_{interval}")
+                transformed.put((symbol, interval, batch, received, cache_key))
+        except Exception as e:
+            logging.error(f"Transform stage failed: {e}")
+            errors.append(e)
+            stop.set()
+            _drain(extracted)
+        finally:
+            transformed.put(_DONE)
+
+    if high_water_marks:
+        # One query (or none, when cached) for every symbol before anything is fetched
+        high_water_marks.prefetch([(symbol, descriptor.interval) for symbol, descriptor in requests])
+
+    start = time.monotonic()
+    threads = [
+        threading.Thread(target=extract, name='pipeline-extract', daemon=True),
+        threading.Thread(target=transform, name='pipeline-transform', daemon=True),
+    ]
+    for thread in threads:
+        thread.start()
+
+    # Load stage runs in the calling thread
+    latencies = []
+    totals = {"symbols": 0, "inserted": 0, "updated": 0, "skipped": 0, "rejected": 0}
+    try:
+        while True:
+            item = transformed.get()
+            if item is _DONE:
+                break
+            symbol, interval, batch, received, cache_key = item
+            if not len(batch):
+                if response_cache is not None:
+                    response_cache.commit(cache_key)
+                continue
+            try:
+                with span("pipeline.load", symbol=symbol, interval=interval) as load_span:
+                    counts = upsert_records(
+                        engine, batch,
+                        on_conflict=load_settings.get('on_conflict', 'update'),
+                        chunk_size=load_settings.get('copy_chunk_size', 50000),
+                        symbol=symbol,
+                        interval=interval,
+                        quality=config.get('quality', {}),
+                    )
+                    load_span.add(records_in=len(batch), records_out=counts['inserted'] + counts['updated'])
+            except Exception as e:
+                logging.error(f"Load failed for {symbol}/{interval}: {e}")
+                errors.append(e)
+                if response_cache is not None:
+                    response_cache.discard(cache_key)
+                continue
+            if high_water_marks:
+                high_water_marks.advance(symbol, interval, batch.time_range()[1])
+            rolled_up = True
+            if rollup_settings.get('enabled', False):
+                try:
+                    refresh_rollups(engine, {(symbol, interval): batch.time_range()},
+                                    rollup_settings.get('targets', list(ROLLUP_TARGETS)))
+                except Exception as e:
+                    logging.error(f"Rollup refresh failed for {symbol}/{interval}: {e}")
+                    errors.append(e)
+                    # Left uncached so the next run processes this response again
+                    rolled_up = False
+            if response_cache is not None:
+                if rolled_up:
+                    response_cache.commit(cache_key)
+                else:
+                    response_cache.discard(cache_key)
+            latency = time.monotonic() - received
+            latencies.append(latency)
+            totals["symbols"] += 1
+            for key in ("inserted", "updated", "skipped", "rejected"):
+                totals[key] += counts[key]
+            logging.info(f"{symbol}/{interval}: {len(batch)} rows committed {latency * 1000:.0f}ms after the API response.")
+    except BaseException:
+        # Unblock the transform thread (and through it the extract thread) before joining them
+        stop.set()
+        _drain(transformed)
+        raise
+    finally:
+        for thread in threads:
+            thread.join()
+    if high_water_marks:
+        high_water_marks.save()
+
+    summary = dict(totals, unchanged=len(unchanged), elapsed=time.monotonic() - start, errors=len(errors))
+    if latencies:
+        summary.update(
+            latency_p50=_percentile(latencies, 50),
+            latency_p99=_percentile(latencies, 99),
+            latency_max=max(latencies),
+        )
+    logging.info(f"Pipeline summary: {summary}")
+    return summary
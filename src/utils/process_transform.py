@@ -0,0 +1,144 @@
+##############################################
+# Title: Modular Process Transform Script
+# Author: Christopher Romanillos
+# Description: Transforms chunks of raw files in
+# a process pool, returning each file's bars as
+# an Arrow IPC buffer instead of pickled dicts.
+# Date: 05/10/25
+# Version: 1.0
+##############################################
+import os
+import json
+import itertools
+import logging
+from concurrent.futures import ProcessPoolExecutor
+import pyarrow as pa
+from utils.bar_batch import BarBatch, transform_batch
+from utils.dead_letter import configure_dead_letters, get_dead_letters
+from utils.payloads import describe_payload, detect_descriptor, meta_symbol_interval
+
+def _init_worker(dead_letter_settings, base_dir):
+    # Each worker writes its own dead letter file (no interleaved appends between processes)
+    configure_dead_letters(dead_letter_settings, process=f"transform_{os.getpid()}", base_dir=base_dir)
+
+def _cut(time_series, cutoff):
+    if cutoff is None:
+        return time_series
+    return {timestamp: bar for timestamp, bar in time_series.items() if timestamp >= cutoff}
+
+def transform_raw_file(path, settings, cutoffs):
+    """
+    Transform one raw file into a BarBatch (worker side).
+
+    Args:
+        path (str): Raw JSON file written by the extract step.
+        settings (dict): engine, parser, stream_chunk_size, default_symbol and default_interval.
+        cutoffs (dict): (symbol, interval) -> oldest timestamp string to keep (delta mode).
+
+    Returns:
+        tuple: (BarBatch, number of rejected bars). The batch is empty when delta
+            mode drops every bar; a payload with no bars at all raises ValueError
+            with either parser, as in main_transform.py.
+    """
+    engine = settings['engine']
+    if settings['parser'] == 'stream':
+        from utils.stream_parse import open_time_series, iter_chunks
+
+        with open(path, 'rb') as file:
+            header, series_key, bars = open_time_series(file)
+            meta_data = header.get("Meta Data", {})
+            descriptor = detect_descriptor(series_key, meta_data) if series_key else None
+            if descriptor is None:
+                raise ValueError(f"Missing 'Time Series' in raw data file {path}.")
+            first = next(bars, None)
+            if first is None:
+                raise ValueError(f"Missing '{series_key}' in raw data file {path}.")
+            bars = itertools.chain([first], bars)
+            symbol, interval = meta_symbol_interval(meta_data, descriptor, settings['default_symbol'],
+                                                    settings['default_interval'])
+            cutoff = cutoffs.get((symbol, interval))
+            if cutoff is not None:
+                bars = ((timestamp, bar) for timestamp, bar in bars if timestamp >= cutoff)
+            results = [transform_batch(chunk, symbol, interval, descriptor, engine)
+                       for chunk in iter_chunks(bars, settings['stream_chunk_size'])]
+        if not results:
+            return BarBatch.empty(symbol, interval), 0  # Nothing newer than what is already loaded
+        return BarBatch.concat(batch for batch, _ in results), sum(rejected for _, rejected in results)
+
+    with open(path, 'r') as file:
+        raw_data = json.load(file)
+    descriptor = describe_payload(raw_data)
+    if descriptor is None:
+        raise ValueError(f"Missing 'Time Series' in raw data file {path}.")
+    symbol, interval = meta_symbol_interval(raw_data.get("Meta Data", {}), descriptor, settings['default_symbol'],
+                                            settings['default_interval'])
+    time_series = raw_data[descriptor.series_key]
+    if not time_series:
+        raise ValueError(f"Missing '{descriptor.series_key}' in raw data file {path}.")
+    return transform_batch(_cut(time_series, cutoffs.get((symbol, interval))), symbol, interval, descriptor, engine)
+
+def transform_chunk(paths, settings, cutoffs):
+    """
+    Transform a chunk of raw files in one task (worker side).
+
+    Each file's bars come back as an Arrow IPC stream: one bytes object per
+    file holding the column buffers, so pickling the result is a memcpy and
+    no per-bar Python object crosses the process boundary.
+
+    Returns:
+        list: (path, IPC bytes or None, rejected bars, error message or None) per file.
+    """
+    results = []
+    for path in paths:
+        try:
+            batch, rejected = transform_raw_file(path, settings, cutoffs)
+            sink = pa.BufferOutputStream()
+            table = batch.to_table()
+            with pa.ipc.new_stream(sink, table.schema) as writer:
+                writer.write_table(table)
+            results.append((path, sink.getvalue().to_pybytes(), rejected, None))
+        except Exception as e:
+            results.append((path, None, 0, str(e)))
+    # Workers never run atexit handlers, so dead letters are written per task
+    get_dead_letters().close()
+    return results
+
+def read_ipc(buffer):
+    """Arrow table over an IPC buffer returned by transform_chunk (no copy)."""
+    return pa.ipc.open_stream(buffer).read_all()
+
+def transform_files_in_processes(paths, settings, cutoffs=None, workers=None, files_per_task=8,
+                                 dead_letter_settings=None, base_dir=None):
+    """
+    Transform raw files across a process pool, `files_per_task` files per task.
+
+    Tasks are whole chunks of files rather than single bars or files, so
+    per-task overhead (pickling arguments, scheduling, result transfer) is
+    paid once per chunk. Results are yielded in input order as each chunk
+    completes.
+
+    Args:
+        paths (list): Raw file paths.
+        settings (dict): See transform_raw_file.
+        cutoffs (dict): (symbol, interval) -> oldest timestamp string to keep, in delta mode.
+        workers (int): Processes (default: one per CPU).
+        files_per_task (int): Files transformed per task.
+        dead_letter_settings (dict): The `dead_letter` config section, applied in each worker.
+        base_dir (Path): Directory relative dead letter paths resolve against.
+
+    Yields:
+        tuple: (path, pyarrow.Table or None, rejected bars, error message or None).
+    """
+    paths = [str(path) for path in paths]
+    chunks = [paths[start:start + files_per_task] for start in range(0, len(paths), files_per_task)]
+    workers = min(workers or os.cpu_count() or 1, len(chunks)) or 1
+
+    # Buffered dead letters must not be inherited (and written again) by forked workers
+    get_dead_letters().close()
+    logging.info(f"Transforming {len(paths)} files in {len(chunks)} tasks on {workers} processes.")
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(dead_letter_settings or {}, base_dir)) as executor:
+        futures = [executor.submit(transform_chunk, chunk, settings, cutoffs or {}) for chunk in chunks]
+        for future in futures:
+            for path, buffer, rejected, error in future.result():
+                yield path, read_ipc(buffer) if buffer is not None else None, rejected, error
@@ -0,0 +1,275 @@
+##############################################
+# Title: Modular Load Quality Script
+# Author: Christopher Romanillos
+# Description: Set-based data quality checks on
+# a staged load batch (unparseable values,
+# duplicate timestamps, OHLC invariants, outlier
+# returns, missing market-hours bars), written
+# to load_quality_reports.
+# Date: 06/01/25
+# Version: 1.0
+##############################################
+import uuid
+import logging
+from datetime import datetime
+from utils.dead_letter import (
+    get_dead_letters, MISSING_KEYS, MISSING_SYMBOL, BAD_VALUE, OHLC_INVARIANT, NEGATIVE_VOLUME,
+    DUPLICATE_TIMESTAMP, OUTLIER_RETURN, MISSING_BARS,
+)
+
+RAW_STAGE = 'intraday_stage_raw'  # Rows as received: every value column is text
+STAGE = 'intraday_stage'  # Typed rows with a rejection code (NULL = clean, promoted)
+REPORT_TABLE = 'load_quality_reports'
+
+DEFAULT_SETTINGS = {
+    'max_return': 0.2,  # |log return| into and back out of a spike bar
+    'reject_outliers': True,
+    'market_open': '09:30',  # Exchange-local, like Alpha Vantage intraday timestamps (US/Eastern)
+    'market_close': '16:00',
+    'report': True,  # Write load_quality_reports rows
+}
+
+ERRORS = {
+    MISSING_KEYS: "missing column value",
+    MISSING_SYMBOL: "no symbol/interval",
+    BAD_VALUE: "value does not parse",
+    OHLC_INVARIANT: "high below open/close, low above them or a non-positive price",
+    NEGATIVE_VOLUME: "volume below zero",
+    DUPLICATE_TIMESTAMP: "same symbol/interval/timestamp with different values in one source file",
+    OUTLIER_RETURN: "close jumps and reverts by more than quality.max_return",
+}
+
+VALUE_COLUMNS = ('open', 'high', 'low', 'close', 'volume')
+
+# Shapes accepted before casting, so a bad value marks its row instead of failing the batch.
+# Lengths are bounded so a cast can never overflow.
+_TIMESTAMP = (r"^(19|20)[0-9]{2}-(0[1-9]|1[0-2])-(0[1-9]|[12][0-9]|3[01])"
+              r"([ T]([01][0-9]|2[0-3]):[0-5][0-9](:[0-5][0-9](\.[0-9]{1,6})?)?)?$")
+_PRICE = r"^[+-]?([0-9]{1,15}(\.[0-9]*)?|\.[0-9]+)([eE][+-]?[0-9]{1,2})?$"
+_VOLUME = r"^[+-]?[0-9]{1,18}$"
+
+def create_raw_stage(cursor):
+    """Temporary text-typed staging table, dropped at commit (COPY target, see db_loader.stage_rows)."""
+    cursor.execute(
+        f"""
+        CREATE TEMP TABLE {RAW_STAGE} (
+            row_id bigint GENERATED ALWAYS AS IDENTITY,
+            symbol text, "interval" text, "timestamp" text,
+            open text, high text, low text, close text, volume text,
+            created_at timestamp, source text
+        ) ON COMMIT DROP
+        """
+    )
+
+def _parse_sql():
+    """Typed stage from the raw stage, in one pass: rows that do not parse get a code and NULL values."""
+    missing = ' OR '.join(f'r."{column}" IS NULL' for column in ('timestamp',) + VALUE_COLUMNS)
+    bad_shape = ' OR '.join([f"r.\"timestamp\" !~ '{_TIMESTAMP}'", f"r.volume !~ '{_VOLUME}'"]
+                            + [f"r.{column} !~ '{_PRICE}'" for column in VALUE_COLUMNS[:-1]])
+    # Day of month beyond the month's last day (e.g. 02-30) passes the pattern but not the cast
+    month_days = ("extract(day FROM (substr(r.\"timestamp\", 1, 7) || '-01')::date + interval '1 month - 1 day')")
+    casts = ', '.join(
+        ["CASE WHEN p.code IS NULL THEN p.\"timestamp\"::timestamp END AS \"timestamp\""]
+        + [f"CASE WHEN p.code IS NULL THEN p.{column}::float8 END AS {column}" for column in VALUE_COLUMNS[:-1]]
+        + ["CASE WHEN p.code IS NULL THEN p.volume::bigint END AS volume"]
+    )
+    return f"""
+        CREATE TEMP TABLE {STAGE} ON COMMIT DROP AS
+        SELECT p.row_id, p.symbol, p."interval", {casts}, p.created_at, p.source, p.code
+        FROM (
+            SELECT r.*,
+                   CASE
+                       WHEN {missing} THEN '{MISSING_KEYS}'
+                       WHEN coalesce(r.symbol, '') = '' OR coalesce(r."interval", '') = '' THEN '{MISSING_SYMBOL}'
+                       WHEN {bad_shape} THEN '{BAD_VALUE}'
+                       WHEN substr(r."timestamp", 9, 2)::int > {month_days} THEN '{BAD_VALUE}'
+                   END AS code
+            FROM {RAW_STAGE} r
+        ) p
+    """
+
+# Value checks on the parsed rows. Copies of a bar that disagree within one source are
+# rejected in every copy of that source. Copies from different sources (overlapping
+# files, the later one possibly revising the bar) are merged by the loaders' DISTINCT ON,
+# the last staged copy winning.
+_VALUE_CHECK_SQL = f"""
+    UPDATE {STAGE} s SET code = c.code
+    FROM (
+        SELECT row_id,
+               CASE
+                   WHEN least(open, high, low, close) <= 0
+                        OR high < greatest(open, close) OR low > least(open, close) THEN '{OHLC_INVARIANT}'
+                   WHEN volume < 0 THEN '{NEGATIVE_VOLUME}'
+                   WHEN {' OR '.join(f'min({column}) OVER w <> max({column}) OVER w' for column in VALUE_COLUMNS)}
+                       THEN '{DUPLICATE_TIMESTAMP}'
+               END AS code
+        FROM {STAGE}
+        WHERE code IS NULL
+        WINDOW w AS (PARTITION BY symbol, "interval", "timestamp", source)
+    ) c
+    WHERE s.row_id = c.row_id AND c.code IS NOT NULL
+"""
+
+# Spikes: the close moves more than max_return (log return) into a bar and back out of
+# it. A level shift that holds is not flagged. Edge bars are compared with the stored
+# bars just before and after the batch. Only the copy of a bar that will be loaded (the
+# last staged) is compared, and a spike rejects every copy of that bar.
+_OUTLIER_SQL = f"""
+    WITH clean AS (
+        SELECT DISTINCT ON (symbol, "interval", "timestamp") row_id, symbol, "interval", "timestamp", close
+        FROM {STAGE}
+        WHERE code IS NULL
+        ORDER BY symbol, "interval", "timestamp", row_id DESC
+    ),
+    bounds AS (
+        SELECT symbol, "interval", min("timestamp") AS first, max("timestamp") AS last FROM clean GROUP BY 1, 2
+    ),
+    neighbours AS (
+        SELECT NULL::bigint, b.symbol, b."interval", n."timestamp", n.close
+        FROM bounds b
+        CROSS JOIN LATERAL (
+            (SELECT d."timestamp", d.close FROM intraday_data d
+             WHERE d.symbol = b.symbol AND d."interval" = b."interval" AND d."timestamp" < b.first
+             ORDER BY d."timestamp" DESC LIMIT 1)
+            UNION ALL
+            (SELECT d."timestamp", d.close FROM intraday_data d
+             WHERE d.symbol = b.symbol AND d."interval" = b."interval" AND d."timestamp" > b.last
+             ORDER BY d."timestamp" LIMIT 1)
+        ) n
+        WHERE n.close > 0
+    ),
+    returns AS (
+        SELECT row_id, symbol, "interval", "timestamp",
+               ln(close / lag(close) OVER w) AS r_in,
+               ln(lead(close) OVER w / close) AS r_out
+        FROM (SELECT * FROM clean UNION ALL SELECT * FROM neighbours) series
+        WINDOW w AS (PARTITION BY symbol, "interval" ORDER BY "timestamp", row_id)
+    )
+    UPDATE {STAGE} s SET code = '{OUTLIER_RETURN}'
+    FROM returns r
+    WHERE r.row_id IS NOT NULL AND s.code IS NULL
+      AND (s.symbol, s."interval", s."timestamp") = (r.symbol, r."interval", r."timestamp")
+      AND abs(r.r_in) > %(max_return)s AND abs(r.r_out) > %(max_return)s AND sign(r.r_in) <> sign(r.r_out)
+"""
+
+# Intraday bars expected on weekdays between market open and close that are neither in
+# the batch (clean) nor already stored. Only the span the batch covers is checked, and
+# exchange holidays are not known, so they show up as gaps.
+_MISSING_BARS_CTE = f"""
+    pairs AS (
+        SELECT symbol, "interval", min("timestamp") AS first, max("timestamp") AS last,
+               make_interval(mins => substr("interval", 1, length("interval") - 3)::int) AS step
+        FROM {STAGE}
+        WHERE code IS NULL AND "interval" ~ '^[0-9]+min$'
+        GROUP BY symbol, "interval"
+    ),
+    missing AS (
+        SELECT p.symbol, p."interval", t AS "timestamp"
+        FROM pairs p
+        CROSS JOIN LATERAL generate_series(p.first, p.last, p.step) t
+        WHERE extract(isodow FROM t) < 6
+          AND t::time >= %(market_open)s::time AND t::time < %(market_close)s::time
+          AND NOT EXISTS (SELECT 1 FROM {STAGE} s WHERE s.code IS NULL AND s.symbol = p.symbol
+                          AND s."interval" = p."interval" AND s."timestamp" = t)
+          AND NOT EXISTS (SELECT 1 FROM intraday_data d WHERE d.symbol = p.symbol
+                          AND d."interval" = p."interval" AND d."timestamp" = t)
+    )
+"""
+
+def _report_sql(report):
+    """Findings per code/action; with `report`, also written to load_quality_reports in the same statement."""
+    insert = f"""
+    , reported AS (
+        INSERT INTO {REPORT_TABLE} (batch_id, checked_at, code, symbol, "interval", rows,
+                                    first_timestamp, last_timestamp, action)
+        SELECT %(batch_id)s, %(checked_at)s, code, symbol, "interval", rows, first, last, action
+        FROM findings
+    )""" if report else ""
+    return f"""
+    WITH {_MISSING_BARS_CTE},
+    findings AS (
+        SELECT code, symbol, "interval", count(*) AS rows, min("timestamp") AS first, max("timestamp") AS last,
+               'rejected' AS action
+        FROM {STAGE} WHERE code IS NOT NULL
+        GROUP BY code, symbol, "interval"
+        UNION ALL
+        SELECT '{DUPLICATE_TIMESTAMP}', symbol, "interval", count(*) - count(DISTINCT "timestamp"),
+               min("timestamp"), max("timestamp"), 'merged'
+        FROM {STAGE} WHERE code IS NULL
+        GROUP BY symbol, "interval"
+        HAVING count(*) > count(DISTINCT "timestamp")
+        UNION ALL
+        SELECT '{MISSING_BARS}', symbol, "interval", count(*), min("timestamp"), max("timestamp"), 'reported'
+        FROM missing
+        GROUP BY symbol, "interval"
+    ){insert}
+    SELECT code, action, sum(rows) FROM findings GROUP BY code, action
+    """
+
+_REJECTED_SQL = f"""
+    SELECT s.code, r.symbol, r."interval", r."timestamp", r.open, r.high, r.low, r.close, r.volume
+    FROM {STAGE} s JOIN {RAW_STAGE} r USING (row_id)
+    WHERE s.code IS NOT NULL
+    ORDER BY s.code, r.symbol, r."interval"
+"""
+
+def check_staged(cursor, settings=None):
+    """
+    Check a batch COPY'd into the raw stage and build the typed stage.
+
+    Runs a fixed handful of statements whatever the batch size: one parse
+    pass, one value check, one outlier pass, one report. Rows of the typed
+    stage with a NULL `code` are clean; loaders promote only those. Rejected
+    rows go to the dead letter queue (stage "load") with their raw values.
+    Missing market-hours bars are reported only (there is no row to reject).
+    Copies of a bar from different source files are not a conflict: the
+    last staged one is loaded and the others are reported as merged.
+
+    Args:
+        cursor: psycopg2 cursor of the loading transaction.
+        settings (dict): The `quality` config section (see DEFAULT_SETTINGS).
+
+    Returns:
+        dict: staged, clean and rejected row counts, merged duplicate rows and missing bars.
+    """
+    settings = dict(DEFAULT_SETTINGS, **(settings or {}))
+    cursor.execute(_parse_sql())
+    cursor.execute(f"ANALYZE {STAGE}")  # Row estimates for the window and anti-join plans below
+    cursor.execute(_VALUE_CHECK_SQL)
+    if settings['reject_outliers']:
+        cursor.execute(_OUTLIER_SQL, {'max_return': settings['max_return']})
+
+    cursor.execute(_report_sql(settings['report']), {
+        'batch_id': str(uuid.uuid4()),
+        'checked_at': datetime.utcnow(),
+        'market_open': settings['market_open'],
+        'market_close': settings['market_close'],
+    })
+    findings = {(code, action): int(rows) for code, action, rows in cursor.fetchall()}
+    rejected = sum(rows for (_, action), rows in findings.items() if action == 'rejected')
+    if rejected:
+        _dead_letter_rejected(cursor)
+
+    cursor.execute(f"SELECT count(*) FROM {RAW_STAGE}")
+    staged = cursor.fetchone()[0]
+    summary = {
+        "staged": staged,
+        "clean": staged - rejected,
+        "rejected": rejected,
+        "merged_duplicates": findings.get((DUPLICATE_TIMESTAMP, 'merged'), 0),
+        "missing_bars": findings.get((MISSING_BARS, 'reported'), 0),
+    }
+    if rejected or summary['missing_bars']:
+        counts = ', '.join(f"{code}: {rows}" for (code, action), rows in sorted(findings.items()) if action != 'merged')
+        logging.warning(f"Load quality: {rejected} of {staged} staged rows rejected ({counts}).")
+    return summary
+
+def _dead_letter_rejected(cursor):
+    cursor.execute(_REJECTED_SQL)
+    groups = {}
+    for code, symbol, interval, timestamp, *values in cursor.fetchall():
+        payload = dict(zip(VALUE_COLUMNS, values), timestamp=timestamp, symbol=symbol, interval=interval)
+        groups.setdefault((code, symbol, interval), []).append((timestamp, payload))
+    dead_letters = get_dead_letters()
+    for (code, symbol, interval), items in groups.items():
+        dead_letters.add_many('load', code, items, ERRORS.get(code), symbol, interval)
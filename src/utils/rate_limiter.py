@@ -0,0 +1,53 @@
+##############################################
+# Title: Modular Rate Limiter Script
+# Author: Christopher Romanillos
+# Description: Token-bucket limiter shared by
+# concurrent API requests.
+# Date: 01/11/25
+# Version: 1.0
+##############################################
+import time
+import asyncio
+
+class TokenBucket:
+    """
+    Asyncio token bucket sized to the API plan.
+
+    Tokens refill continuously at `rate_per_minute / 60` per second up to
+    `burst`. Every request awaits one token. `pause` empties the bucket and
+    blocks all callers for a while, which is how a rate-limit response from
+    one request backs off every other in-flight worker.
+    """
+
+    def __init__(self, rate_per_minute, burst=1):
+        self.rate = rate_per_minute / 60.0
+        self.capacity = max(1, burst)
+        self.tokens = float(self.capacity)
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+        self._lock = asyncio.Lock()
+
+    def _refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    async def acquire(self):
+        """Wait until a token is available, then consume it."""
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                if now < self.paused_until:
+                    await asyncio.sleep(self.paused_until - now)
+                    continue
+                self._refill(now)
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+    def pause(self, seconds):
+        """Drain the bucket and hold every caller for `seconds`."""
+        now = time.monotonic()
+        self.paused_until = max(self.paused_until, now + seconds)
+        self.tokens = 0.0
+        self.updated = self.paused_until
@@ -0,0 +1,274 @@
+##############################################
+# Title: Modular Response Cache Script
+# Author: Christopher Romanillos
+# Description: Content-addressed SQLite cache
+# of raw API responses so unchanged payloads
+# skip transform and load.
+# Date: 04/26/25
+# Version: 1.0
+##############################################
+import json
+import zlib
+import sqlite3
+import hashlib
+import logging
+import threading
+from datetime import datetime, timedelta
+from pathlib import Path
+from utils.payloads import find_series_key
+
+class _Unchanged:
+    """Sentinel returned by the fetch paths when a response matches the cache."""
+
+    def __repr__(self):
+        return "UNCHANGED"
+
+UNCHANGED = _Unchanged()
+
+def request_key(params):
+    """Canonical cache key for a request: sorted query parameters without the API key."""
+    return "&".join(f"{name}={params[name]}" for name in sorted(params) if name != 'apikey')
+
+def series_digest(data):
+    """SHA-256 of a payload's "Time Series (...)" body (None when there is no series)."""
+    series_key = find_series_key(data)
+    if series_key is None:
+        return None
+    return hashlib.sha256(json.dumps(data[series_key], separators=(',', ':')).encode()).hexdigest()
+
+def file_series_digest(file_path):
+    """series_digest of a payload file, hashed bar by bar as it is streamed (see utils/stream_parse.py)."""
+    from utils.stream_parse import open_time_series
+
+    with open(file_path, 'rb') as file:
+        _, series_key, bars = open_time_series(file)
+        if series_key is None:
+            return None
+        # The same bytes json.dumps writes for the whole series (numbers the way json.load reads them)
+        digest = hashlib.sha256(b'{')
+        for index, (timestamp, bar) in enumerate(bars):
+            item = f"{',' if index else ''}{json.dumps(timestamp)}:{json.dumps(bar, separators=(',', ':'), default=float)}"
+            digest.update(item.encode())
+        digest.update(b'}')
+    return digest.hexdigest()
+
+class ResponseCache:
+    """
+    Raw responses keyed by request (symbol/interval/params), stored by the
+    hash of their "Time Series" body.
+
+    Each request key points at the content hash of its latest body, so a
+    response is "unchanged" when its series hashes to the same digest, whatever
+    the surrounding Meta Data says. Responses whose ETag/Last-Modified the
+    server honours are revalidated with conditional requests (304 means
+    unchanged without a body).
+
+    Entries unused for `ttl` seconds are evicted, then the least recently used
+    ones until bodies fit in `max_bytes`. Safe to share between threads.
+
+    Fetches only `stage` a changed response; callers `commit` it once it has
+    been saved or loaded, so an entry never marks a payload as done before
+    it reached its destination. Uncommitted responses are forgotten on close.
+
+    Args:
+        db_path (str | Path): SQLite database file (created if missing).
+        fresh_seconds (float): Reuse a cached response this long without any request.
+        ttl (float): Seconds an unused entry is kept.
+        max_bytes (int): Upper bound on stored (compressed) bodies.
+    """
+
+    def __init__(self, db_path, fresh_seconds=0, ttl=86400, max_bytes=256 * 2 ** 20):
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self.fresh = timedelta(seconds=fresh_seconds)
+        self.ttl = timedelta(seconds=ttl)
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        # request key -> (digest, compressed body or None, etag, last_modified) awaiting commit
+        self._pending = {}
+        self.connection = sqlite3.connect(self.db_path, check_same_thread=False)
+        self.connection.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS bodies (
+                digest TEXT PRIMARY KEY,
+                body BLOB NOT NULL,
+                size INTEGER NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS entries (
+                request_key TEXT PRIMARY KEY,
+                digest TEXT NOT NULL REFERENCES bodies (digest),
+                etag TEXT,
+                last_modified TEXT,
+                fetched_at TEXT NOT NULL,
+                used_at TEXT NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS ix_entries_used_at ON entries (used_at);
+            """
+        )
+        self.connection.commit()
+
+    @classmethod
+    def from_config(cls, config, base_dir):
+        """Cache from the `response_cache` config section, or None when disabled."""
+        settings = config.get('response_cache', {})
+        if not settings.get('enabled', False):
+            return None
+        return cls(
+            Path(base_dir) / settings.get('path', '../data/response_cache.db'),
+            fresh_seconds=settings.get('fresh_seconds', 0),
+            ttl=settings.get('ttl', 86400),
+            max_bytes=int(settings.get('max_mb', 256) * 2 ** 20),
+        )
+
+    def lookup(self, key):
+        """
+        How to fetch `key`: skip the request, or which conditional headers to send.
+
+        Returns:
+            tuple: (fresh, headers) where fresh is True when the cached response
+                can be reused without a request.
+        """
+        with self._lock:
+            row = self.connection.execute(
+                "SELECT etag, last_modified, fetched_at FROM entries WHERE request_key = ?", (key,)
+            ).fetchone()
+        if row is None:
+            return False, {}
+        etag, last_modified, fetched_at = row
+        if datetime.utcnow() - datetime.fromisoformat(fetched_at) < self.fresh:
+            self._touch(key, refetched=False)
+            return True, {}
+        headers = {}
+        if etag:
+            headers['If-None-Match'] = etag
+        if last_modified:
+            headers['If-Modified-Since'] = last_modified
+        return False, headers
+
+    def not_modified(self, key):
+        """Record a 304 for `key` (the cached body is still current)."""
+        self._touch(key, refetched=True)
+
+    def stage(self, key, data, etag=None, last_modified=None):
+        """
+        Compare the response for `key` with the cached one and hold it as
+        pending. Nothing is written until `commit(key)`, so a response whose
+        save, transform or load fails is fetched and processed again next run.
+
+        Returns:
+            bool: True if its time series differs from the cached one (or nothing was cached).
+        """
+        return self._stage(key, series_digest(data), lambda: zlib.compress(json.dumps(data).encode(), 1),
+                           etag, last_modified)
+
+    def stage_file(self, key, file_path, etag=None, last_modified=None):
+        """
+        `stage` for a response streamed to `file_path`: the series is hashed and
+        the body compressed chunk by chunk, without loading the payload.
+        """
+        def compress_file():
+            compressor = zlib.compressobj(1)
+            with open(file_path, 'rb') as file:
+                chunks = [compressor.compress(chunk) for chunk in iter(lambda: file.read(1 << 20), b'')]
+            return b''.join(chunks) + compressor.flush()
+
+        return self._stage(key, file_series_digest(file_path), compress_file, etag, last_modified)
+
+    def _stage(self, key, digest, compress_body, etag, last_modified):
+        if digest is None:
+            return True
+        with self._lock:
+            previous = self.connection.execute(
+                "SELECT digest FROM entries WHERE request_key = ?", (key,)
+            ).fetchone()
+            if previous is not None and previous[0] == digest:
+                return False
+            body = None
+            if not self.connection.execute("SELECT 1 FROM bodies WHERE digest = ?", (digest,)).fetchone():
+                body = compress_body()
+            self._pending[key] = (digest, body, etag, last_modified)
+        return True
+
+    def commit(self, key):
+        """Store the pending response for `key` once downstream stages have committed it."""
+        with self._lock:
+            pending = self._pending.pop(key, None)
+            if pending is None:
+                return
+            digest, body, etag, last_modified = pending
+            if body is not None and not self.connection.execute(
+                    "SELECT 1 FROM bodies WHERE digest = ?", (digest,)).fetchone():
+                self.connection.execute("INSERT INTO bodies VALUES (?, ?, ?)", (digest, body, len(body)))
+            now = datetime.utcnow().isoformat()
+            self.connection.execute(
+                "INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?, ?)",
+                (key, digest, etag, last_modified, now, now),
+            )
+            self.connection.commit()
+
+    def discard(self, key):
+        """Drop the pending response for `key` (a later stage failed)."""
+        with self._lock:
+            self._pending.pop(key, None)
+
+    def load(self, key):
+        """The cached payload for `key`, or None."""
+        with self._lock:
+            row = self.connection.execute(
+                "SELECT b.body FROM entries e JOIN bodies b ON b.digest = e.digest WHERE e.request_key = ?", (key,)
+            ).fetchone()
+        return json.loads(zlib.decompress(row[0])) if row else None
+
+    def _touch(self, key, refetched):
+        now = datetime.utcnow().isoformat()
+        with self._lock:
+            if refetched:
+                self.connection.execute("UPDATE entries SET used_at = ?, fetched_at = ? WHERE request_key = ?", (now, now, key))
+            else:
+                self.connection.execute("UPDATE entries SET used_at = ? WHERE request_key = ?", (now, key))
+            self.connection.commit()
+
+    def evict(self):
+        """
+        Drop entries unused for `ttl`, then least recently used entries until
+        the remaining bodies fit in `max_bytes`.
+
+        Returns:
+            int: Entries evicted.
+        """
+        cutoff = (datetime.utcnow() - self.ttl).isoformat()
+        with self._lock:
+            evicted = self.connection.execute("DELETE FROM entries WHERE used_at < ?", (cutoff,)).rowcount
+            self._drop_orphans()
+            total = self.connection.execute("SELECT coalesce(sum(size), 0) FROM bodies").fetchone()[0]
+            if total > self.max_bytes:
+                # Walk entries oldest first until enough distinct bodies are released
+                for key, digest in self.connection.execute(
+                    "SELECT request_key, digest FROM entries ORDER BY used_at"
+                ).fetchall():
+                    self.connection.execute("DELETE FROM entries WHERE request_key = ?", (key,))
+                    evicted += 1
+                    if not self.connection.execute("SELECT 1 FROM entries WHERE digest = ?", (digest,)).fetchone():
+                        total -= self.connection.execute("SELECT size FROM bodies WHERE digest = ?", (digest,)).fetchone()[0]
+                        self.connection.execute("DELETE FROM bodies WHERE digest = ?", (digest,))
+                    if total <= self.max_bytes:
+                        break
+            self.connection.commit()
+        if evicted:
+            logging.info(f"Response cache: evicted {evicted} entries ({total / 2 ** 20:.1f} MB of bodies kept).")
+        return evicted
+
+    def _drop_orphans(self):
+        self.connection.execute("DELETE FROM bodies WHERE digest NOT IN (SELECT digest FROM entries)")
+
+    def close(self):
+        if self._pending:
+            logging.info(f"Response cache: {len(self._pending)} uncommitted response(s) will be fetched again.")
+        self.evict()
+        self.connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,265 @@
+##############################################
+# Title: Modular Rollup Script
+# Author: Christopher Romanillos
+# Description: Maintains downsampled OHLCV
+# tables (15min, 60min, daily) from
+# intraday_data: incremental refresh of the
+# buckets a load touched, rebuild, verify.
+# Date: 04/05/25
+# Version: 1.1
+##############################################
+import logging
+from datetime import datetime
+from utils.partitions import month_start, next_month
+from utils.payloads import INTRADAY_INTERVALS
+
+SOURCE_TABLE = 'intraday_data'
+
+# Target -> (table, bucket width in minutes); a day is 1440 minutes
+ROLLUP_TARGETS = {
+    '15min': ('intraday_rollup_15min', 15),
+    '60min': ('intraday_rollup_60min', 60),
+    'daily': ('intraday_rollup_daily', 1440),
+}
+
+ROLLUP_COLUMNS = ('symbol', 'source_interval', 'bucket', 'open', 'high', 'low', 'close', 'volume', 'bar_count', 'updated_at')
+
+def source_intervals(target):
+    """Intraday intervals that roll up exactly into `target` (finer, and dividing its width)."""
+    width = ROLLUP_TARGETS[target][1]
+    return [
+        interval for interval in INTRADAY_INTERVALS
+        if int(interval[:-len('min')]) < width and width % int(interval[:-len('min')]) == 0
+    ]
+
+def bucket_sql(target, column='"timestamp"'):
+    """SQL expression for the start of the `target` bucket containing `column`."""
+    width = ROLLUP_TARGETS[target][1]
+    if width == 1440:
+        return f"date_trunc('day', {column})"
+    if width == 60:
+        return f"date_trunc('hour', {column})"
+    return (
+        f"(date_trunc('hour', {column}) "
+        f"+ (floor(extract(minute FROM {column}) / {width})::int * {width}) * interval '1 minute')"
+    )
+
+def width_sql(target):
+    """SQL interval literal for one `target` bucket."""
+    return f"interval '{ROLLUP_TARGETS[target][1]} minutes'"
+
+def _aggregate_sql(target, where):
+    """SELECT producing rollup rows for every bucket of source rows matching `where` (alias d)."""
+    bucket = bucket_sql(target, 'd."timestamp"')
+    return f"""
+        SELECT d.symbol, d."interval" AS source_interval, {bucket} AS bucket,
+               (array_agg(d.open ORDER BY d."timestamp"))[1] AS open,
+               max(d.high) AS high,
+               min(d.low) AS low,
+               (array_agg(d.close ORDER BY d."timestamp" DESC))[1] AS close,
+               sum(d.volume) AS volume,
+               count(*) AS bar_count
+        FROM {SOURCE_TABLE} d
+        WHERE {where}
+        GROUP BY d.symbol, d."interval", {bucket}
+    """
+
+def _upsert_sql(target, select_sql):
+    table = ROLLUP_TARGETS[target][0]
+    columns = ', '.join(ROLLUP_COLUMNS)
+    updates = ', '.join(f"{column} = EXCLUDED.{column}" for column in ROLLUP_COLUMNS[3:])
+    return f"""
+        INSERT INTO {table} ({columns})
+        SELECT r.*, now() AT TIME ZONE 'utc' FROM ({select_sql}) r
+        ON CONFLICT (symbol, source_interval, bucket) DO UPDATE SET {updates}
+    """
+
+def time_ranges_by_pair(data, symbol=None, interval=None):
+    """
+    Earliest and latest bar per (symbol, interval) in a loaded batch.
+
+    Args:
+        data (list | BarBatch | pyarrow.Table): Processed records, a BarBatch or a typed Arrow table.
+        symbol (str): Symbol for records that do not carry one.
+        interval (str): Interval for records that do not carry one.
+
+    Returns:
+        dict: (symbol, interval) -> (first datetime, last datetime).
+    """
+    if hasattr(data, 'time_range'):
+        return {(data.symbol, data.interval): data.time_range()} if len(data) else {}
+    if hasattr(data, 'to_batches'):
+        grouped = data.group_by(['symbol', 'interval']).aggregate([('timestamp', 'min'), ('timestamp', 'max')])
+        return {
+            (row['symbol'], row['interval']): (row['timestamp_min'], row['timestamp_max'])
+            for row in grouped.to_pylist()
+        }
+
+    ranges = {}
+    for record in data:
+        key = (record.get('symbol', symbol), record.get('interval', interval))
+        timestamp = record.get('timestamp')
+        if timestamp is None:
+            continue
+        if not isinstance(timestamp, datetime):
+            timestamp = datetime.fromisoformat(timestamp)
+        first, last = ranges.get(key, (timestamp, timestamp))
+        ranges[key] = (min(first, timestamp), max(last, timestamp))
+    return ranges
+
+def refresh_rollups(engine, ranges, targets=tuple(ROLLUP_TARGETS)):
+    """
+    Recompute only the rollup buckets overlapping each (symbol, interval) time range.
+
+    Every touched bucket is re-aggregated from all of its source bars (not
+    just the new ones), so reloading or correcting bars stays exact. Each
+    target takes a transaction-level advisory lock so concurrent loaders
+    refreshing the same table do not interleave.
+
+    Args:
+        engine: SQLAlchemy engine backed by psycopg2.
+        ranges (dict): (symbol, interval) -> (first, last) from time_ranges_by_pair.
+        targets (iterable): Rollup targets to refresh (keys of ROLLUP_TARGETS).
+
+    Returns:
+        dict: target -> number of rollup rows written.
+    """
+    written = {}
+    connection = engine.raw_connection()
+    try:
+        cursor = connection.cursor()
+        for target in targets:
+            eligible = set(source_intervals(target))
+            touched = [(symbol, interval, first, last) for (symbol, interval), (first, last) in ranges.items()
+                       if interval in eligible]
+            if not touched:
+                continue
+
+            values = ", ".join(["(%s, %s, %s::timestamp, %s::timestamp)"] * len(touched))
+            where = f"""
+                EXISTS (
+                    SELECT 1 FROM (VALUES {values}) AS t(symbol, source_interval, first_bar, last_bar)
+                    WHERE d.symbol = t.symbol AND d."interval" = t.source_interval
+                      AND d."timestamp" >= {bucket_sql(target, 't.first_bar')}
+                      AND d."timestamp" < {bucket_sql(target, 't.last_bar')} + {width_sql(target)}
+                )
+            """
+            cursor.execute("SELECT pg_advisory_xact_lock(hashtext(%s))", (ROLLUP_TARGETS[target][0],))
+            cursor.execute(_upsert_sql(target, _aggregate_sql(target, where)), [value for row in touched for value in row])
+            written[target] = cursor.rowcount
+        connection.commit()
+    except Exception:
+        connection.rollback()
+        raise
+    finally:
+        connection.close()
+
+    if written:
+        logging.info(f"Rollups refreshed: {', '.join(f'{target} {rows} rows' for target, rows in written.items())}.")
+    return written
+
+def _range_filter(start, end, symbols, column='d."timestamp"', alias='d'):
+    """WHERE clause (and parameters) for `start <= column < end`, optionally limited to symbols."""
+    where = f"{column} >= %s AND {column} < %s"
+    params = [start, end]
+    if symbols:
+        where += f" AND {alias}.symbol = ANY(%s)"
+        params.append(list(symbols))
+    return where, params
+
+def rebuild_rollups(engine, start, end, targets=tuple(ROLLUP_TARGETS), symbols=None):
+    """
+    Rebuild rollups from scratch for every month in [start, end].
+
+    Each month is deleted and re-aggregated in its own transaction, so a
+    rebuild of years of history holds locks briefly and can be rerun after
+    an interruption.
+
+    Args:
+        engine: SQLAlchemy engine backed by psycopg2.
+        start (datetime): Any instant in the first month.
+        end (datetime): Any instant in the last month.
+        targets (iterable): Rollup targets to rebuild.
+        symbols (list): Restrict to these symbols (default: all).
+
+    Returns:
+        dict: target -> number of rollup rows written.
+    """
+    written = {target: 0 for target in targets}
+    month = month_start(start)
+    while month <= end:
+        upper = next_month(month)
+        connection = engine.raw_connection()
+        try:
+            cursor = connection.cursor()
+            for target in targets:
+                table = ROLLUP_TARGETS[target][0]
+                cursor.execute("SELECT pg_advisory_xact_lock(hashtext(%s))", (table,))
+                where, params = _range_filter(month, upper, symbols, column='r.bucket', alias='r')
+                cursor.execute(f"DELETE FROM {table} r WHERE {where}", params)
+
+                where, params = _range_filter(month, upper, symbols)
+                where += ' AND d."interval" = ANY(%s)'
+                cursor.execute(_upsert_sql(target, _aggregate_sql(target, where)), params + [source_intervals(target)])
+                written[target] += cursor.rowcount
+            connection.commit()
+        except Exception:
+            connection.rollback()
+            raise
+        finally:
+            connection.close()
+        logging.info(f"Rebuilt rollups for {month:%Y-%m}.")
+        month = upper
+    return written
+
+def verify_rollups(engine, start, end, targets=tuple(ROLLUP_TARGETS), symbols=None):
+    """
+    Compare stored rollups with a fresh aggregation of intraday_data.
+
+    Args:
+        engine: SQLAlchemy engine backed by psycopg2.
+        start (datetime): First bucket to check (inclusive).
+        end (datetime): Last bucket to check (exclusive).
+        targets (iterable): Rollup targets to verify.
+        symbols (list): Restrict to these symbols (default: all).
+
+    Returns:
+        dict: target -> {"checked", "missing", "extra", "mismatched"} bucket counts;
+            the rollups are correct when the last three are all zero.
+    """
+    results = {}
+    connection = engine.raw_connection()
+    try:
+        cursor = connection.cursor()
+        for target in targets:
+            table = ROLLUP_TARGETS[target][0]
+            # Filter the source on its bucket, so partial buckets at the edges compare like for like
+            expected_where, expected_params = _range_filter(start, end, symbols, column=bucket_sql(target, 'd."timestamp"'))
+            expected_where += ' AND d."interval" = ANY(%s)'
+            # Sargable bounds on the raw timestamp so the partitions/BRIN index prune the scan
+            expected_where += f' AND d."timestamp" >= %s::timestamp - {width_sql(target)} AND d."timestamp" < %s::timestamp + {width_sql(target)}'
+            actual_where, actual_params = _range_filter(start, end, symbols, column='a.bucket', alias='a')
+            cursor.execute(
+                f"""
+                WITH expected AS ({_aggregate_sql(target, expected_where)}),
+                     actual AS (SELECT * FROM {table} a WHERE {actual_where})
+                SELECT count(*),
+                       count(*) FILTER (WHERE a.bucket IS NULL),
+                       count(*) FILTER (WHERE e.bucket IS NULL),
+                       count(*) FILTER (WHERE a.bucket IS NOT NULL AND e.bucket IS NOT NULL AND (
+                           e.open IS DISTINCT FROM a.open OR e.high IS DISTINCT FROM a.high
+                           OR e.low IS DISTINCT FROM a.low OR e.close IS DISTINCT FROM a.close
+                           OR e.volume IS DISTINCT FROM a.volume OR e.bar_count IS DISTINCT FROM a.bar_count))
+                FROM expected e
+                FULL OUTER JOIN actual a
+                  ON e.symbol = a.symbol AND e.source_interval = a.source_interval AND e.bucket = a.bucket
+                """,
+                expected_params + [source_intervals(target), start, end] + actual_params,
+            )
+            checked, missing, extra, mismatched = cursor.fetchone()
+            results[target] = {"checked": checked, "missing": missing, "extra": extra, "mismatched": mismatched}
+            level = logging.INFO if not (missing or extra or mismatched) else logging.ERROR
+            logging.log(level, f"Rollup {target}: {checked} buckets, {missing} missing, {extra} extra, {mismatched} mismatched.")
+    finally:
+        connection.close()
+    return results
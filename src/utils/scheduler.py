@@ -0,0 +1,91 @@
+##############################################
+# Title: Modular Scheduler Script
+# Author: Christopher Romanillos
+# Description: Interval-aligned trigger loop
+# with graceful SIGTERM/SIGINT shutdown.
+# Date: 03/22/25
+# Version: 1.0
+##############################################
+import time
+import signal
+import logging
+import threading
+from datetime import datetime, timedelta
+
+def interval_minutes(interval):
+    """Bar size in minutes for an intraday interval such as "5min"."""
+    if not interval.endswith('min'):
+        raise ValueError(f"Scheduler only supports intraday intervals like '5min', got '{interval}'.")
+    return int(interval[:-len('min')])
+
+def next_trigger(now, minutes, delay_seconds):
+    """
+    First trigger strictly after `now`: `delay_seconds` after a bar boundary.
+
+    Boundaries are aligned to midnight, so 5-minute bars close at :00, :05, ...
+    and with a 5 second delay the triggers are :00:05, :05:05, ...
+    """
+    midnight = now.replace(hour=0, minute=0, second=0, microsecond=0)
+    step = timedelta(minutes=minutes)
+    delay = timedelta(seconds=delay_seconds)
+    boundaries = (now - midnight - delay) // step + 1
+    return midnight + boundaries * step + delay
+
+class IntervalScheduler:
+    """
+    Run a job just after every bar closes until asked to stop.
+
+    SIGTERM/SIGINT let the running cycle finish and then end the loop; a
+    second signal exits immediately. Cycles that overrun the next trigger
+    skip the missed triggers rather than running back to back.
+
+    Args:
+        job (callable): Called with the trigger time (datetime) once per cycle.
+        minutes (int): Bar size in minutes.
+        delay_seconds (float): Wait after each boundary so the provider has published the bar.
+    """
+
+    def __init__(self, job, minutes, delay_seconds=5):
+        self.job = job
+        self.minutes = minutes
+        self.delay_seconds = delay_seconds
+        self.stop_event = threading.Event()
+
+    def install_signal_handlers(self):
+        """Stop gracefully on SIGTERM/SIGINT (call from the main thread)."""
+        for signum in (signal.SIGTERM, signal.SIGINT):
+            signal.signal(signum, self._handle_signal)
+
+    def _handle_signal(self, signum, frame):
+        if self.stop_event.is_set():
+            logging.warning("Second shutdown signal received. Exiting immediately.")
+            raise SystemExit(1)
+        logging.info(f"Received {signal.Signals(signum).name}. Finishing the current cycle, then stopping.")
+        self.stop_event.set()
+
+    def stop(self):
+        self.stop_event.set()
+
+    def run(self):
+        """Loop until stopped. Returns the number of cycles run."""
+        cycles = 0
+        while not self.stop_event.is_set():
+            trigger = next_trigger(datetime.now(), self.minutes, self.delay_seconds)
+            # Event.wait wakes as soon as a signal sets the stop event
+            if self.stop_event.wait(max(0.0, (trigger - datetime.now()).total_seconds())):
+                break
+
+            lateness = (datetime.now() - trigger).total_seconds()
+            logging.info(f"Cycle for {trigger:%Y-%m-%d %H:%M:%S} started {lateness * 1000:.0f}ms after its trigger.")
+            start = time.monotonic()
+            try:
+                self.job(trigger)
+            except Exception as e:
+                logging.error(f"Cycle for {trigger:%Y-%m-%d %H:%M:%S} failed: {e}")
+            cycles += 1
+
+            elapsed = time.monotonic() - start
+            if elapsed > self.minutes * 60:
+                logging.warning(f"Cycle took {elapsed:.1f}s, longer than the {self.minutes}min interval; skipping missed triggers.")
+        logging.info(f"Scheduler stopped after {cycles} cycle(s).")
+        return cycles
@@ -0,0 +1,128 @@
+##############################################
+# Title: Modular Streaming Parse Script
+# Author: Christopher Romanillos
+# Description: Incremental (ijson) parsing of
+# raw payloads, yielding time-series bars one
+# at a time instead of loading the whole file.
+# Date: 03/08/25
+# Version: 1.0
+##############################################
+import os
+import json
+import logging
+from itertools import islice
+
+SERIES_PREFIX = "Time Series"
+
+def _ijson():
+    # Only the streaming parser needs ijson, so the default json path runs without it
+    try:
+        import ijson
+    except ImportError as e:
+        raise ImportError("transform.parser 'stream' requires ijson (pip install ijson).") from e
+    return ijson
+
+def _build_value(events, first_event, first_value, ijson):
+    """Build one complete JSON value (starting at the given event) from the event stream."""
+    builder = ijson.ObjectBuilder()
+    builder.event(first_event, first_value)
+    depth = 1 if first_event in ("start_map", "start_array") else 0
+    while depth:
+        _, event, value = next(events)
+        builder.event(event, value)
+        if event in ("start_map", "start_array"):
+            depth += 1
+        elif event in ("end_map", "end_array"):
+            depth -= 1
+    return builder.value
+
+def _iter_bars(events, ijson):
+    """Yield (timestamp, bar) pairs from inside the time-series object."""
+    for _, event, value in events:
+        if event == "end_map":
+            return
+        if event == "map_key":
+            _, first_event, first_value = next(events)
+            yield value, _build_value(events, first_event, first_value, ijson)
+
+def open_time_series(file_obj):
+    """
+    Start streaming a raw payload.
+
+    Reads top-level keys until the "Time Series (...)" object begins, building
+    the (small) values seen on the way such as "Meta Data" or an API error.
+    Alpha Vantage writes "Meta Data" first, so it is available before any bar.
+
+    Args:
+        file_obj: Binary file object positioned at the start of the JSON document.
+
+    Returns:
+        tuple: (header, series_key, bars) where header maps the top-level keys read
+            before the series, series_key is e.g. "Time Series (5min)" (None if the
+            payload has no series) and bars lazily yields (timestamp, values) pairs.
+            Bars must be consumed before the file is closed.
+    """
+    ijson = _ijson()
+    # Alpha Vantage sends prices as strings, so bars match what json.load returns
+    events = iter(ijson.parse(file_obj))
+    header = {}
+
+    _, event, _ = next(events)
+    if event != "start_map":
+        raise ValueError("Raw payload is not a JSON object.")
+    for _, event, value in events:
+        if event == "end_map":
+            break
+        key = value
+        _, first_event, first_value = next(events)
+        if key.startswith(SERIES_PREFIX) and first_event == "start_map":
+            if file_obj.seekable():
+                # Re-read from the start with kvitems, which builds each bar in C
+                file_obj.seek(0)
+                return header, key, ijson.kvitems(file_obj, key)
+            return header, key, _iter_bars(events, ijson)
+        header[key] = _build_value(events, first_event, first_value, ijson)
+    return header, None, iter(())
+
+def iter_chunks(bars, size):
+    """Group streamed bars into dicts of at most `size` bars, the shape the transforms expect."""
+    bars = iter(bars)
+    while True:
+        chunk = dict(islice(bars, size))
+        if not chunk:
+            return
+        yield chunk
+
+def inspect_payload(file_path):
+    """
+    Check a downloaded payload without loading its time series.
+
+    Returns:
+        tuple: (header, series_key). For payloads without a series (API errors,
+            rate-limit notes) the header holds the whole, small, document.
+    """
+    with open(file_path, "rb") as file:
+        header, series_key, bars = open_time_series(file)
+        if series_key is not None:
+            first = next(bars, None)
+            if first is None:
+                logging.error(f"{series_key} in {file_path} is empty.")
+                series_key = None
+    return header, series_key
+
+def append_top_level_key(file_path, key, value):
+    """
+    Add `"key": value` to the JSON object in `file_path` in place, without
+    reading the document (e.g. `extraction_time` on a streamed download).
+    """
+    with open(file_path, "r+b") as file:
+        start = max(0, file.seek(0, os.SEEK_END) - 64)
+        file.seek(start)
+        tail = file.read().rstrip()
+        if not tail.endswith(b"}"):
+            raise ValueError(f"{file_path} does not end with a JSON object.")
+        # Only an empty object has its opening brace right before the closing one
+        separator = "" if tail[:-1].rstrip().endswith(b"{") else ", "
+        file.seek(start + len(tail) - 1)
+        file.write(f"{separator}{json.dumps(key)}: {json.dumps(value)}}}".encode())
+        file.truncate()
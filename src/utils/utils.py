@@ -50,6 +50,18 @@ def validate_data(data, required_fields):
             return False
     return True
 
+def is_rate_limited(data):
+    """
+    Check whether the API response is a rate-limit notice rather than data.
+
+    Args:
+        data (dict): The API response data.
+
+    Returns:
+        bool: True if the response is a rate-limit "Note".
+    """
+    return "Note" in data
+
 def check_api_errors(data):
     """
     Check for API-specific error messages in the response.
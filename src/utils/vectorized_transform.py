@@ -0,0 +1,125 @@
+##############################################
+# Title: Modular Vectorized Transform Script
+# Author: Christopher Romanillos
+# Description: Columnar (NumPy) transform and
+# validation of a whole time series at once.
+# Date: 01/25/25
+# Version: 1.2
+##############################################
+import numpy as np
+from utils.payloads import get_descriptor
+from utils.dead_letter import (
+    get_dead_letters, MISSING_FIELDS, BAD_TIMESTAMP, BAD_VALUE, OHLC_INVARIANT, NEGATIVE_VOLUME
+)
+
+PRICE_COLUMNS = ("open", "high", "low", "close")
+DEFAULT_DESCRIPTOR = get_descriptor('TIME_SERIES_INTRADAY', '5min')
+
+def _safe_float(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return np.nan
+
+def _to_float_array(strings):
+    """Parse a string array in one call, falling back per element only if something is malformed."""
+    try:
+        return strings.astype(np.float64)
+    except ValueError:
+        return np.fromiter((_safe_float(s) for s in strings), dtype=np.float64, count=len(strings))
+
+def _safe_datetime(value):
+    try:
+        return np.datetime64(value, 's')
+    except ValueError:
+        return np.datetime64('NaT')
+
+def _to_datetime_array(strings, timestamp_length):
+    try:
+        parsed = strings.astype('datetime64[s]')
+    except ValueError:
+        parsed = np.array([_safe_datetime(s) for s in strings], dtype='datetime64[s]')
+    # NumPy accepts several forms; require the payload's own (e.g. "YYYY-MM-DD HH:MM:SS")
+    parsed[np.char.str_len(strings) != timestamp_length] = np.datetime64('NaT')
+    return parsed
+
+def transform_columnar(time_series, required_fields=None, descriptor=DEFAULT_DESCRIPTOR, symbol=None, interval=None):
+    """
+    Transform a whole "Time Series (...)" block into typed columns in one pass.
+
+    Rejected bars go to the dead letter queue in one call per error code.
+
+    Args:
+        time_series (dict): Mapping of timestamp -> raw bar values.
+        required_fields (list): Field names every bar must contain; defaults to the descriptor's.
+        descriptor (PayloadDescriptor): Payload layout (see utils/payloads.py).
+        symbol, interval (str): Recorded with dead letters.
+
+    Returns:
+        tuple: (columns, reject) where columns maps timestamp/open/high/low/close/volume
+            to NumPy arrays (datetime64[s], float64 x4, int64) covering every input bar,
+            and reject is a boolean mask of bars that failed validation.
+    """
+    count = len(time_series)
+    timestamps = np.array(list(time_series.keys()), dtype=str)
+    values = list(time_series.values())
+
+    # Missing required fields become "nan" and are rejected by the finiteness check below
+    missing = np.zeros(count, dtype=bool)
+    for field in required_fields or descriptor.required_fields:
+        missing |= np.fromiter((field not in bar for bar in values), dtype=bool, count=count)
+
+    columns = {"timestamp": _to_datetime_array(timestamps, descriptor.timestamp_length)}
+    for column in PRICE_COLUMNS:
+        raw_field = descriptor.fields[column]
+        columns[column] = _to_float_array(np.array([bar.get(raw_field, "nan") for bar in values], dtype=str))
+    volume_field = descriptor.fields["volume"]
+    volume = _to_float_array(np.array([bar.get(volume_field, "nan") for bar in values], dtype=str))
+
+    open_, high, low, close = (columns[c] for c in PRICE_COLUMNS)
+    bad_timestamp = np.isnat(columns["timestamp"]) & ~missing
+    bad_value = (
+        ~np.isfinite(open_) | ~np.isfinite(high) | ~np.isfinite(low) | ~np.isfinite(close)
+        | ~np.isfinite(volume) | (volume != np.floor(volume))
+    ) & ~missing & ~bad_timestamp
+    reject = missing | bad_timestamp | bad_value
+    # OHLC sanity checks (NaN comparisons are False, already rejected above)
+    with np.errstate(invalid='ignore'):
+        ohlc = ((high < np.maximum(open_, close)) | (low > np.minimum(open_, close))) & ~reject
+        negative_volume = (volume < 0) & ~reject & ~ohlc
+    reject |= ohlc | negative_volume
+
+    columns["volume"] = np.where(reject, 0, volume).astype(np.int64)
+
+    if reject.any():
+        dead_letters = get_dead_letters()
+        for code, mask, error in (
+            (MISSING_FIELDS, missing, "missing required fields"),
+            (BAD_TIMESTAMP, bad_timestamp, "unexpected timestamp format"),
+            (BAD_VALUE, bad_value, "non-numeric or non-finite value"),
+            (OHLC_INVARIANT, ohlc, "high below open/close or low above open/close"),
+            (NEGATIVE_VOLUME, negative_volume, "negative volume"),
+        ):
+            indexes = np.flatnonzero(mask)
+            dead_letters.add_many('transform', code, [(str(timestamps[i]), values[i]) for i in indexes],
+                                  error, symbol, interval, descriptor.function)
+    return columns, reject
+
+def columns_to_records(columns, reject):
+    """
+    Convert accepted rows back to processed-record dicts for the JSON output.
+
+    Args:
+        columns (dict): Columns returned by transform_columnar.
+        reject (np.ndarray): Reject mask returned by transform_columnar.
+
+    Returns:
+        list: Records shaped like transform_and_validate_data output.
+    """
+    keep = ~reject
+    timestamps = columns["timestamp"][keep].astype('datetime64[us]').tolist()
+    fields = [columns[name][keep].tolist() for name in ("open", "high", "low", "close", "volume")]
+    return [
+        {"timestamp": ts, "open": o, "high": h, "low": l, "close": c, "volume": v}
+        for ts, o, h, l, c, v in zip(timestamps, *fields)
+    ]
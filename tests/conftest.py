@@ -0,0 +1,41 @@
+##############################################
+# Title: Test Configuration
+# Author: Christopher Romanillos
+# Description: Puts src/ on the import path
+# (the scripts run from src/) and provides
+# the local mock Alpha Vantage server.
+# Date: 10/18/26
+# Version: 1.0
+##############################################
+import sys
+from pathlib import Path
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'src'))
+
+from benchmarks.mock_server import MockAlphaVantage
+
+@pytest.fixture
+def mock_server():
+    """Factory for mock servers (keyword arguments as for MockAlphaVantage), shut down after the test."""
+    servers = []
+
+    def start(**kwargs):
+        kwargs.setdefault('bars', 20)
+        server = MockAlphaVantage(**kwargs).__enter__()
+        servers.append(server)
+        return server
+
+    yield start
+    for server in servers:
+        server.__exit__(None, None, None)
+
+@pytest.fixture
+def api_settings():
+    """`api` config section with a generous rate limit and fast backoff for tests."""
+    return {
+        'timeout': 10,
+        'concurrency': 4,
+        'rate_limit': {'requests_per_minute': 60000, 'burst': 50},
+        'retry': {'max_attempts': 5, 'backoff_base': 0.01, 'backoff_max': 0.05},
+    }
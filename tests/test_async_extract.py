@@ -0,0 +1,76 @@
+import time
+import asyncio
+from utils.async_extract import RateLimitedError, run_extraction
+from utils.rate_limiter import TokenBucket
+
+PARAMS = {'function': 'TIME_SERIES_INTRADAY', 'interval': '5min', 'apikey': 'demo'}
+
+def symbols(count):
+    return [f"SYM{i:03d}" for i in range(count)]
+
+def test_concurrency_stays_within_limit(mock_server, api_settings):
+    mock = mock_server(latency=0.05)
+    settings = dict(api_settings, concurrency=3)
+
+    results = run_extraction(symbols(12), mock.endpoint, PARAMS, settings)
+
+    assert all(isinstance(data, dict) for data in results.values())
+    assert mock.requests == 12
+    assert 1 < mock.peak_in_flight <= 3
+
+def test_token_bucket_paces_requests(mock_server, api_settings):
+    mock = mock_server()
+    settings = dict(api_settings, rate_limit={'requests_per_minute': 600, 'burst': 1})
+
+    start = time.perf_counter()
+    run_extraction(symbols(5), mock.endpoint, PARAMS, settings)
+
+    # One token up front, then one every 0.1s
+    assert time.perf_counter() - start >= 0.35
+
+def test_http_429_is_retried_after_backoff(mock_server, api_settings):
+    mock = mock_server(too_many_every=3)
+
+    results = run_extraction(symbols(9), mock.endpoint, PARAMS, api_settings)
+
+    assert all(isinstance(data, dict) for data in results.values())
+    assert mock.too_many > 0
+    assert mock.requests == 9 + mock.too_many
+
+def test_rate_limit_notice_is_retried(mock_server, api_settings):
+    mock = mock_server(rate_limit_every=4)
+
+    results = run_extraction(symbols(8), mock.endpoint, PARAMS, api_settings)
+
+    assert all(isinstance(data, dict) for data in results.values())
+    assert mock.requests > 8
+
+def test_gives_up_when_always_rate_limited(mock_server, api_settings):
+    mock = mock_server(too_many_every=1)
+    settings = dict(api_settings, retry=dict(api_settings['retry'], max_attempts=3))
+
+    results = run_extraction(['IBM'], mock.endpoint, PARAMS, settings)
+
+    assert isinstance(results['IBM'], RateLimitedError)
+    assert mock.requests == 3
+
+def test_failures_are_returned_per_symbol(mock_server, api_settings):
+    mock = mock_server(error_symbols={'BAD'})
+    handed_on = []
+
+    results = run_extraction(['IBM', 'BAD', 'MSFT'], mock.endpoint, PARAMS, api_settings,
+                             on_result=lambda symbol, data: handed_on.append(symbol))
+
+    assert isinstance(results['BAD'], ValueError)
+    assert results['IBM'] is True and results['MSFT'] is True
+    assert sorted(handed_on) == ['IBM', 'MSFT']
+
+def test_pause_holds_every_caller():
+    async def run():
+        bucket = TokenBucket(60000, burst=10)
+        bucket.pause(0.2)
+        start = time.monotonic()
+        await asyncio.gather(bucket.acquire(), bucket.acquire())
+        return time.monotonic() - start
+
+    assert asyncio.run(run()) >= 0.2
@@ -0,0 +1,70 @@
+from datetime import datetime
+import pytest
+from utils.backfill import CHECKPOINT_STAGE, backfill_slices, run_backfill, slice_key
+from utils.manifest import FileManifest
+
+START, END = datetime(2025, 1, 1), datetime(2025, 3, 1)
+MID_MARCH = datetime(2025, 3, 15)
+
+@pytest.fixture
+def manifest(tmp_path):
+    with FileManifest(tmp_path / 'manifest.db') as manifest:
+        yield manifest
+
+def make_config(mock, api_settings):
+    return {'api': dict(api_settings, endpoint=mock.endpoint), 'backfill': {'concurrency': 2}}
+
+def make_loader(failing=()):
+    """Loader that fails ("crashes") for the given months and counts the rest."""
+    def load_slice(symbol, interval, batch):
+        if batch.time_range()[0].strftime('%Y-%m') in failing:
+            raise RuntimeError("simulated crash")
+        return len(batch)
+    return load_slice
+
+def fetched_months(mock, since=0):
+    return sorted(params['month'] for params in mock.received[since:])
+
+def test_interrupted_backfill_resumes_and_refetches_the_open_month(mock_server, api_settings, manifest):
+    mock = mock_server()
+    config = make_config(mock, api_settings)
+    slices = backfill_slices(['IBM'], ['5min'], START, END)
+
+    # First run crashes on February; January is done, March is still open
+    first = run_backfill(config, 'demo', slices, make_loader(failing={'2025-02'}), manifest, now=MID_MARCH)
+    assert fetched_months(mock) == ['2025-01', '2025-02', '2025-03']
+    assert (first['loaded'], first['failed'], first['open']) == (2, 1, 1)
+    assert set(manifest.completed_keys(CHECKPOINT_STAGE)) == {slice_key('IBM', '5min', '2025-01')}
+
+    # Resumed in the same month: February is retried and March fetched again
+    seen = len(mock.received)
+    second = run_backfill(config, 'demo', slices, make_loader(), manifest, now=MID_MARCH)
+    assert fetched_months(mock, seen) == ['2025-02', '2025-03']
+    assert (second['already_done'], second['loaded'], second['open']) == (1, 2, 1)
+
+    # Once March has finished it is fetched one last time and checkpointed
+    seen = len(mock.received)
+    third = run_backfill(config, 'demo', slices, make_loader(), manifest, now=datetime(2025, 4, 3))
+    assert fetched_months(mock, seen) == ['2025-03']
+    assert third['open'] == 0
+
+    seen = len(mock.received)
+    fourth = run_backfill(config, 'demo', slices, make_loader(), manifest, now=datetime(2025, 4, 3))
+    assert fetched_months(mock, seen) == []
+    assert fourth['already_done'] == 3
+
+def test_month_checkpointed_before_it_finished_is_fetched_again(mock_server, api_settings, manifest):
+    mock = mock_server()
+    slices = backfill_slices(['IBM'], ['5min'], END, END)
+    # As recorded by earlier versions, mid-month
+    manifest.connection.execute(
+        "INSERT INTO processed_files (stage, path, checksum, row_count, processed_at) VALUES (?, ?, '', 0, ?)",
+        (CHECKPOINT_STAGE, slice_key('IBM', '5min', '2025-03'), MID_MARCH.isoformat()),
+    )
+
+    summary = run_backfill(make_config(mock, api_settings), 'demo', slices, make_loader(), manifest,
+                           now=datetime(2025, 4, 3))
+
+    assert fetched_months(mock) == ['2025-03']
+    assert summary['loaded'] == 1
+    assert manifest.completed_keys(CHECKPOINT_STAGE)[slice_key('IBM', '5min', '2025-03')] > MID_MARCH
@@ -0,0 +1,37 @@
+from datetime import datetime
+import numpy as np
+from utils.bar_batch import BarBatch
+
+RECORDS = [
+    {'timestamp': datetime(2025, 3, 3, 9, 35), 'open': 1.5, 'high': 2.0, 'low': 1.0, 'close': 1.75, 'volume': 20},
+    {'timestamp': datetime(2025, 3, 3, 9, 30), 'open': 1.0, 'high': 1.5, 'low': 0.5, 'close': 1.5, 'volume': 10},
+]
+
+def test_records_round_trip():
+    batch = BarBatch.from_records(RECORDS, 'IBM', '5min')
+
+    assert (len(batch), batch.nbytes) == (2, 2 * 48)
+    assert batch.to_records() == [dict(record, symbol='IBM', interval='5min') for record in RECORDS]
+    assert batch.time_range() == (datetime(2025, 3, 3, 9, 30), datetime(2025, 3, 3, 9, 35))
+
+def test_columns_keep_only_accepted_rows():
+    columns = {
+        'timestamp': np.array(['2025-03-03T09:30', '2025-03-03T09:35', 'NaT'], dtype='datetime64[s]'),
+        'open': np.array([1.0, 2.0, np.nan]), 'high': np.array([1.0, 2.0, np.nan]),
+        'low': np.array([1.0, 2.0, np.nan]), 'close': np.array([1.0, 2.0, np.nan]),
+        'volume': np.array([10, 20, 0]),
+    }
+    batch = BarBatch.from_columns(columns, np.array([False, True, True]), 'IBM', '5min')
+
+    assert [(record['timestamp'], record['volume']) for record in batch.to_records()] == [
+        (datetime(2025, 3, 3, 9, 30), 10)]
+
+def test_filter_concat_and_arrow_table():
+    batch = BarBatch.from_records(RECORDS, 'IBM', '5min')
+    joined = BarBatch.concat([batch.filter(batch.volume > 15), batch.filter(batch.volume <= 15)])
+    table = joined.to_table()
+
+    assert joined.volume.tolist() == [20, 10]
+    assert table.column_names[:3] == ['symbol', 'interval', 'timestamp']
+    assert table.to_pylist()[1] == dict(RECORDS[1], symbol='IBM', interval='5min')
+    assert len(BarBatch.empty('IBM', '5min').to_table()) == 0
@@ -0,0 +1,61 @@
+from datetime import datetime
+import pytest
+from utils.bar_batch import BarBatch
+from utils.bar_query import BarQuery
+
+MARCH = (datetime(2025, 3, 1), datetime(2025, 4, 1))
+APRIL = (datetime(2025, 4, 1), datetime(2025, 5, 1))
+
+@pytest.fixture
+def query(monkeypatch):
+    query = BarQuery(engine=None, ttl=3600, listen=False)
+    monkeypatch.setattr(query, '_execute', lambda statement, params, symbol, interval: BarBatch.empty(symbol, interval))
+    return query
+
+def cached_windows(query):
+    """Cache a few windows; returns name -> fetch."""
+    windows = {
+        'ibm_march': lambda: query.bars('IBM', '5min', *MARCH),
+        'ibm_april': lambda: query.bars('IBM', '5min', *APRIL),
+        'ibm_latest': lambda: query.last_bars('IBM', '5min', 10),
+        'ibm_1min_march': lambda: query.bars('IBM', '1min', *MARCH),
+        'aapl_march': lambda: query.bars('AAPL', '5min', *MARCH),
+    }
+    for fetch in windows.values():
+        fetch()
+    return windows
+
+def still_cached(query, windows):
+    """Names of the windows served from the cache (fetching re-caches the others)."""
+    kept = []
+    for name, fetch in windows.items():
+        hits = query.hits
+        fetch()
+        if query.hits > hits:
+            kept.append(name)
+    return kept
+
+@pytest.mark.parametrize('first, last, invalidated', [
+    # Inside March only
+    (datetime(2025, 3, 10), datetime(2025, 3, 11), ['ibm_march', 'ibm_latest']),
+    # The end bound is exclusive, the start inclusive
+    (datetime(2025, 4, 1), datetime(2025, 4, 1), ['ibm_april', 'ibm_latest']),
+    (datetime(2025, 3, 31, 23, 55), datetime(2025, 4, 1), ['ibm_march', 'ibm_april', 'ibm_latest']),
+    # Before every window: only the latest bars
+    (datetime(2025, 1, 1), datetime(2025, 2, 1), ['ibm_latest']),
+])
+def test_invalidate_drops_only_overlapping_windows_of_the_pair(query, first, last, invalidated):
+    windows = cached_windows(query)
+
+    query.invalidate('IBM', '5min', first, last)
+
+    assert still_cached(query, windows) == [name for name in windows if name not in invalidated]
+
+def test_invalidate_a_pair_or_everything(query):
+    windows = cached_windows(query)
+
+    query.invalidate('IBM', '5min')
+    assert still_cached(query, windows) == ['ibm_1min_march', 'aapl_march']
+
+    query.invalidate()
+    assert still_cached(query, windows) == []
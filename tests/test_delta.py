@@ -0,0 +1,41 @@
+from datetime import datetime, timedelta
+import pytest
+from utils.delta import HighWaterMarks
+from utils.manifest import FileManifest
+
+@pytest.fixture
+def manifest(tmp_path):
+    with FileManifest(tmp_path / 'manifest.db') as manifest:
+        yield manifest
+
+def test_advance_only_moves_the_mark_forward(manifest):
+    marks = HighWaterMarks(manifest, overlap_minutes=10)
+    assert marks.cutoff('IBM', '5min') is None
+
+    marks.advance('IBM', '5min', datetime(2025, 3, 3, 9, 30))
+    marks.advance('IBM', '5min', datetime(2025, 3, 3, 9, 20))
+
+    assert marks.cutoff('IBM', '5min') == '2025-03-03 09:20:00'
+    time_series = {'2025-03-03 09:15:00': {}, '2025-03-03 09:20:00': {}, '2025-03-03 09:35:00': {}}
+    assert list(marks.filter('IBM', '5min', time_series)) == ['2025-03-03 09:20:00', '2025-03-03 09:35:00']
+
+def test_advance_is_compared_with_the_cached_mark(manifest):
+    refreshed_at = datetime.utcnow() - timedelta(minutes=5)
+    manifest.store_high_water_mark('IBM', '5min', datetime(2025, 3, 3, 9, 30), refreshed_at=refreshed_at)
+    marks = HighWaterMarks(manifest)
+
+    marks.advance('IBM', '5min', datetime(2025, 3, 3, 9, 25))
+    marks.save()
+    assert manifest.cached_high_water_marks() == {('IBM', '5min'): (datetime(2025, 3, 3, 9, 30), refreshed_at)}
+
+    marks.advance('IBM', '5min', datetime(2025, 3, 3, 9, 35))
+    marks.save()
+    # An advance keeps the refresh time, so the TTL still forces a re-read from the database
+    assert manifest.cached_high_water_marks() == {('IBM', '5min'): (datetime(2025, 3, 3, 9, 35), refreshed_at)}
+    assert HighWaterMarks(manifest, overlap_minutes=0).cutoff('IBM', '5min') == '2025-03-03 09:35:00'
+
+def test_stale_cached_marks_are_not_trusted_without_an_engine(manifest):
+    manifest.store_high_water_mark('IBM', '5min', datetime(2025, 3, 3, 9, 30),
+                                   refreshed_at=datetime.utcnow() - timedelta(hours=2))
+
+    assert HighWaterMarks(manifest, cache_ttl=3600).cutoff('IBM', '5min') is None
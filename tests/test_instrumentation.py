@@ -0,0 +1,49 @@
+import json
+import logging
+import pytest
+import utils.instrumentation as instrumentation
+from utils.instrumentation import export_metrics, render_prometheus, span
+
+@pytest.fixture
+def metrics(monkeypatch, tmp_path):
+    monkeypatch.setattr(instrumentation, '_settings', {'enabled': True, 'process': 'transform',
+                                                       'textfile': str(tmp_path / 'etl.prom')})
+    monkeypatch.setattr(instrumentation, '_totals', {})
+    return tmp_path
+
+def test_disabled_spans_are_a_shared_noop(monkeypatch):
+    monkeypatch.setattr(instrumentation, '_settings', {'enabled': False, 'process': 'etl'})
+    monkeypatch.setattr(instrumentation, '_totals', {})
+
+    with span('load', file='a.json') as s:
+        s.add(records_in=10)
+
+    assert span('load') is span('extract') and instrumentation._totals == {}
+
+def test_spans_log_one_event_and_add_to_the_stage_totals(metrics, caplog):
+    caplog.set_level(logging.INFO, logger='etl.metrics')
+    with span('transform.file', file='a.json') as s:
+        s.add(records_in=10, records_out=8, bytes_in=100)
+    with pytest.raises(ValueError):
+        with span('transform.file', file='b.json') as s:
+            s.add(records_in=5)
+            raise ValueError("bad file")
+
+    events = [json.loads(record.getMessage()) for record in caplog.records]
+    assert [(event['file'], event['records_out'], event['status']) for event in events] == [
+        ('a.json', 8, 'ok'), ('b.json', 0, 'error')]
+    totals = instrumentation._totals['transform.file']
+    assert (totals['count'], totals['errors'], totals['records_in'], totals['records_out'], totals['bytes_in']) == (
+        2, 1, 15, 8, 100)
+
+def test_textfile_export_is_per_process(metrics):
+    with span('load') as s:
+        s.add(records_out=3)
+
+    export_metrics()
+
+    body = (metrics / 'etl_transform.prom').read_text()
+    assert body == render_prometheus()
+    assert 'etl_stage_records_out_total{stage="load"} 3' in body
+    assert 'etl_stage_errors_total{stage="load"} 0' in body
+    assert [path.name for path in metrics.iterdir()] == ['etl_transform.prom']
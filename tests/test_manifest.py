@@ -0,0 +1,64 @@
+import os
+import sqlite3
+import pytest
+import utils.manifest as manifest_module
+from utils.manifest import FileManifest
+
+@pytest.fixture
+def hashed(monkeypatch):
+    """Paths file_checksum was called with, in order."""
+    calls = []
+    checksum = manifest_module.file_checksum
+
+    def counting_checksum(path, *args, **kwargs):
+        calls.append(path.name)
+        return checksum(path, *args, **kwargs)
+
+    monkeypatch.setattr(manifest_module, 'file_checksum', counting_checksum)
+    return calls
+
+def test_only_new_or_changed_files_are_hashed(tmp_path, hashed):
+    old, new = tmp_path / 'data_1.json', tmp_path / 'data_2.json'
+    old.write_text('[1]')
+    with FileManifest(tmp_path / 'manifest.db') as manifest:
+        [(path, checksum)] = manifest.pending('transform', [old])
+        manifest.record('transform', path, checksum, 1)
+        new.write_text('[2]')
+        hashed.clear()
+
+        assert [path for path, _ in manifest.pending('transform', [old, new])] == [new]
+        assert hashed == ['data_2.json']
+
+        # Same contents under a new mtime: hashed once, then remembered
+        stat = old.stat()
+        os.utime(old, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+        hashed.clear()
+        assert manifest.pending('transform', [old]) == []
+        assert manifest.pending('transform', [old]) == []
+        assert hashed == ['data_1.json']
+
+        # New contents of the same size
+        old.write_text('[3]')
+        os.utime(old, ns=(stat.st_atime_ns, stat.st_mtime_ns + 2 * 10**9))
+        assert [path for path, _ in manifest.pending('transform', [old])] == [old]
+
+def test_manifest_without_size_and_mtime_is_migrated(tmp_path, hashed):
+    raw = tmp_path / 'data_1.json'
+    raw.write_text('[1]')
+    db_path = tmp_path / 'manifest.db'
+    connection = sqlite3.connect(db_path)
+    connection.execute(
+        "CREATE TABLE processed_files (stage TEXT NOT NULL, path TEXT NOT NULL, checksum TEXT NOT NULL, "
+        "row_count INTEGER NOT NULL, processed_at TEXT NOT NULL, PRIMARY KEY (stage, path))"
+    )
+    connection.execute("INSERT INTO processed_files VALUES ('load', ?, ?, 1, '2025-01-01T00:00:00')",
+                       (str(raw.resolve()), manifest_module.file_checksum(raw)))
+    connection.commit()
+    connection.close()
+    hashed.clear()
+
+    with FileManifest(db_path) as manifest:
+        assert manifest.pending('load', [raw]) == []
+        assert manifest.pending('load', [raw]) == []
+        manifest.record_key('backfill', 'IBM/5min/2025-01', 10)
+    assert hashed == ['data_1.json']
@@ -0,0 +1,42 @@
+import pytest
+from benchmarks.synthetic import make_intraday_payload
+from utils.payloads import (
+    configured_descriptors, describe_payload, detect_descriptor, get_descriptor, meta_symbol_interval
+)
+
+def test_intraday_payloads_are_detected_by_interval():
+    descriptor = describe_payload(make_intraday_payload('IBM', 2, '15min', seed=1))
+
+    assert descriptor is get_descriptor('TIME_SERIES_INTRADAY', '15min')
+    assert descriptor.extract({'1. open': 'o', '2. high': 'h', '3. low': 'l', '4. close': 'c', '5. volume': 'v'}) == (
+        'o', 'h', 'l', 'c', 'v')
+
+def test_adjusted_daily_payloads_are_told_apart_by_meta_data():
+    raw = detect_descriptor('Time Series (Daily)', {'1. Information': 'Daily Prices (open, high, low, close) and Volumes'})
+    adjusted = detect_descriptor('Time Series (Daily)', {
+        '1. Information': 'Daily Time Series with Splits and Dividend Events'})
+
+    assert (raw.function, adjusted.function) == ('TIME_SERIES_DAILY', 'TIME_SERIES_DAILY_ADJUSTED')
+    assert adjusted.fields['volume'] == '6. volume'
+    assert describe_payload({'Note': 'rate limited'}) is None
+
+def test_daily_descriptors_ignore_the_interval():
+    assert get_descriptor('TIME_SERIES_DAILY', '5min') is get_descriptor('TIME_SERIES_DAILY', 'daily')
+    with pytest.raises(KeyError):
+        get_descriptor('TIME_SERIES_WEEKLY')
+
+def test_configured_descriptors():
+    intraday = configured_descriptors({'intervals': ['1min', '5min', '1min']})
+    daily = configured_descriptors({'function': 'TIME_SERIES_DAILY', 'intervals': ['1min', '5min']})
+
+    assert [descriptor.interval for descriptor in intraday] == ['1min', '5min']
+    assert [descriptor.interval for descriptor in daily] == ['daily']
+    assert configured_descriptors({}) == [get_descriptor()]
+
+def test_meta_symbol_interval_falls_back_to_config():
+    intraday = get_descriptor('TIME_SERIES_INTRADAY', '5min')
+
+    assert meta_symbol_interval({'2. Symbol': 'IBM', '4. Interval': '1min'}, intraday, 'X', '5min') == ('IBM', '1min')
+    assert meta_symbol_interval({}, intraday, 'X', '5min') == ('X', '5min')
+    assert meta_symbol_interval({'4. Interval': '1min'}, get_descriptor('TIME_SERIES_DAILY'), 'X', '5min') == (
+        'X', 'daily')
@@ -0,0 +1,232 @@
+##############################################
+# Integration tests against a real PostgreSQL.
+# Skipped unless TEST_DATABASE_URL points at a
+# disposable database: every test drops and
+# recreates the schema.
+##############################################
+import os
+import json
+from datetime import datetime
+import pytest
+import pyarrow as pa
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import sessionmaker
+from schema import Base
+from utils.db_loader import copy_records, upsert_records, orm_load_records
+from utils.bar_query import BarQuery
+from utils.rollups import refresh_rollups, time_ranges_by_pair, verify_rollups
+from utils.parquet_store import records_to_table, save_processed_parquet
+from utils.pipeline import run_pipeline
+from utils.parallel_load import parallel_upsert
+from utils.bar_batch import BarBatch
+from load_data import read_processed_file
+
+DATABASE_URL = os.getenv('TEST_DATABASE_URL')
+
+pytestmark = pytest.mark.skipif(not DATABASE_URL, reason="TEST_DATABASE_URL is not set")
+
+@pytest.fixture
+def engine():
+    engine = create_engine(DATABASE_URL, pool_size=8)
+    Base.metadata.drop_all(engine)
+    Base.metadata.create_all(engine)
+    yield engine
+    Base.metadata.drop_all(engine)
+    engine.dispose()
+
+def bar(time, close='100.5', day='2025-03-03', **values):
+    """A processed record as received by the loaders (values as text)."""
+    return dict({'timestamp': f'{day} {time}:00', 'open': '100', 'high': '101', 'low': '99', 'close': close,
+                 'volume': '1000'}, **values)
+
+def stored(engine, symbol='TEST'):
+    with engine.connect() as connection:
+        return connection.execute(text(
+            'SELECT "timestamp"::text, close FROM intraday_data WHERE symbol = :symbol ORDER BY "timestamp"'
+        ), {'symbol': symbol}).fetchall()
+
+def test_upsert_counts_on_the_partitioned_table(engine):
+    first = upsert_records(engine, [bar('09:30'), bar('09:35')], symbol='TEST', interval='5min')
+    second = upsert_records(engine, [bar('09:30', close='100.6'), bar('09:35'), bar('09:40')],
+                            symbol='TEST', interval='5min')
+    kept = upsert_records(engine, [bar('09:30', close='100.7')], on_conflict='nothing', symbol='TEST', interval='5min')
+
+    assert (first['inserted'], first['updated'], first['skipped']) == (2, 0, 0)
+    assert (second['inserted'], second['updated'], second['skipped']) == (1, 1, 1)
+    assert (kept['inserted'], kept['updated'], kept['skipped']) == (0, 0, 1)
+    assert stored(engine) == [('2025-03-03 09:30:00', 100.6), ('2025-03-03 09:35:00', 100.5),
+                              ('2025-03-03 09:40:00', 100.5)]
+
+def test_copy_records_creates_the_month_partitions(engine):
+    copy_records(engine, [bar('09:30'), bar('09:30', day='2025-04-01')], symbol='TEST', interval='5min')
+
+    with engine.connect() as connection:
+        partitions = connection.execute(text(
+            'SELECT tableoid::regclass::text FROM intraday_data ORDER BY "timestamp"'
+        )).scalars().all()
+    assert partitions == ['intraday_data_y2025m03', 'intraday_data_y2025m04']
+
+def test_set_based_quality_checks(engine):
+    rows = [
+        bar('09:30'), bar('09:35'),
+        bar('09:40', open='abc'),  # bad_value
+        bar('09:45', high='100'),  # ohlc_invariant
+        bar('09:50', volume='-5'),  # negative_volume
+        bar('09:55'), bar('09:55', close='100.7'),  # duplicate_timestamp, both rejected
+        bar('10:00'), bar('10:00'),  # identical copies, merged
+        bar('10:05', high='200', close='199'),  # outlier_return
+        bar('10:10'),
+        bar('10:00', day='2025-02-30'),  # bad_value: no such day
+    ]
+
+    counts = upsert_records(engine, rows, symbol='TEST', interval='5min')
+
+    assert (counts['inserted'], counts['skipped'], counts['rejected']) == (4, 1, 7)
+    assert [row[0][11:16] for row in stored(engine)] == ['09:30', '09:35', '10:00', '10:10']
+    with engine.connect() as connection:
+        reports = connection.execute(text(
+            "SELECT code, action, sum(rows) FROM load_quality_reports GROUP BY code, action ORDER BY code, action"
+        )).fetchall()
+    assert reports == [
+        ('bad_value', 'rejected', 2),
+        ('duplicate_timestamp', 'merged', 1),
+        ('duplicate_timestamp', 'rejected', 2),
+        ('missing_bars', 'reported', 5),
+        ('negative_volume', 'rejected', 1),
+        ('ohlc_invariant', 'rejected', 1),
+        ('outlier_return', 'rejected', 1),
+    ]
+
+def test_pipeline_loads_from_the_mock_server(engine, mock_server, api_settings):
+    mock = mock_server(bars=50)
+    config = {'api': dict(api_settings, endpoint=mock.endpoint, symbols=['IBM', 'MSFT'],
+                          function='TIME_SERIES_INTRADAY', intervals=['5min', '15min']),
+              'rollups': {'enabled': True}}
+
+    first = run_pipeline(config, engine, 'demo')
+    second = run_pipeline(config, engine, 'demo')
+
+    assert (first['errors'], first['symbols'], first['inserted'] + first['rejected']) == (0, 4, 200)
+    assert (second['errors'], second['inserted'], second['updated']) == (0, 0, 0)
+    assert second['skipped'] == first['inserted']
+    with engine.connect() as connection:
+        pairs = connection.execute(text(
+            'SELECT symbol, "interval", count(*) FROM intraday_data GROUP BY 1, 2 ORDER BY 1, 2'
+        )).fetchall()
+        rollups = connection.execute(text('SELECT count(DISTINCT symbol) FROM intraday_rollup_60min')).scalar()
+    assert [pair[:2] for pair in pairs] == [('IBM', '15min'), ('IBM', '5min'), ('MSFT', '15min'), ('MSFT', '5min')]
+    assert rollups == 2
+
+def test_parallel_upsert_across_symbols_and_months(engine):
+    days = ['2025-01-06', '2025-02-03', '2025-03-03']
+    rows = [
+        bar(time, day=day, symbol=symbol, interval='5min')
+        for symbol in ('IBM', 'MSFT', 'AAPL')
+        for day in days
+        for time in ('09:30', '09:35', '09:40')
+    ]
+
+    first = parallel_upsert(engine, rows, workers=4)
+    second = parallel_upsert(engine, rows, workers=4)
+
+    assert (first['shards'], first['failed'], first['inserted']) == (4, 0, 27)
+    assert (second['failed'], second['inserted'], second['skipped']) == (0, 0, 27)
+    with engine.connect() as connection:
+        partitions = connection.execute(text(
+            "SELECT count(*) FROM pg_inherits WHERE inhparent = 'intraday_data'::regclass"
+        )).scalar()
+    assert partitions == 4  # Three months and the default partition
+    assert len(stored(engine, 'MSFT')) == 9
+
+def test_parallel_upsert_of_a_bar_batch(engine):
+    records = [
+        {'timestamp': f'{day}T{time}:00', 'open': 100.0, 'high': 101.0, 'low': 99.0, 'close': 100.5, 'volume': 1000}
+        for day in ('2025-01-06', '2025-02-03')
+        for time in ('09:30', '09:35')
+    ]
+
+    summary = parallel_upsert(engine, BarBatch.from_records(records, 'TSLA', '5min'), workers=2,
+                              symbol='TSLA', interval='5min')
+
+    assert (summary['shards'], summary['failed'], summary['inserted']) == (2, 0, 4)
+    assert len(stored(engine, 'TSLA')) == 4
+
+def write_json(path, records):
+    path.write_text(json.dumps(records))
+    return path
+
+def test_a_later_file_revises_a_bar(engine, tmp_path):
+    first = write_json(tmp_path / 'first.json', [bar('09:30'), bar('09:35')])
+    second = write_json(tmp_path / 'second.json', [
+        bar('09:35', close='100.7'), bar('09:40'),
+        bar('09:45'), bar('09:45', close='100.8'),  # conflict within one file: both rejected
+    ])
+    records = read_processed_file(first) + read_processed_file(second)
+
+    counts = upsert_records(engine, records, symbol='TEST', interval='5min')
+
+    assert (counts['inserted'], counts['skipped'], counts['rejected']) == (3, 1, 2)
+    assert stored(engine) == [('2025-03-03 09:30:00', 100.5), ('2025-03-03 09:35:00', 100.7),
+                              ('2025-03-03 09:40:00', 100.5)]
+    with engine.connect() as connection:
+        reports = connection.execute(text(
+            "SELECT action, sum(rows) FROM load_quality_reports WHERE code = 'duplicate_timestamp' "
+            "GROUP BY action ORDER BY action"
+        )).fetchall()
+    assert reports == [('merged', 1), ('rejected', 2)]
+
+def test_copy_of_overlapping_parquet_files_keeps_the_later_bar(engine, tmp_path):
+    paths = []
+    for stem, close in (('first', 100.5), ('second', 100.7)):
+        record = {'timestamp': datetime(2025, 3, 3, 9, 30), 'open': 100.0, 'high': 101.0, 'low': 99.0,
+                  'close': close, 'volume': 1000}
+        paths += save_processed_parquet(records_to_table([record], 'TEST', '5min'), tmp_path, stem=stem)
+
+    copy_records(engine, pa.concat_tables([read_processed_file(path) for path in paths]))
+
+    assert stored(engine) == [('2025-03-03 09:30:00', 100.7)]
+
+def test_refreshed_rollups_pass_verification(engine):
+    records = [bar(f'{hour:02d}:{minute:02d}', close=str(100 + minute / 100)) for hour in (9, 10) for minute in range(0, 60, 5)]
+    upsert_records(engine, records, symbol='TEST', interval='5min')
+    start, end = datetime(2025, 3, 3), datetime(2025, 3, 4)
+
+    written = refresh_rollups(engine, time_ranges_by_pair(records, 'TEST', '5min'))
+    clean = {'checked': 0, 'missing': 0, 'extra': 0, 'mismatched': 0}
+
+    assert written == {'15min': 8, '60min': 2, 'daily': 1}
+    assert verify_rollups(engine, start, end) == {
+        target: dict(clean, checked=checked) for target, checked in written.items()
+    }
+    with engine.connect() as connection:
+        assert connection.execute(text(
+            "SELECT open, close, volume, bar_count FROM intraday_rollup_60min WHERE bucket = '2025-03-03 10:00'"
+        )).one() == (100.0, 100.55, 12000, 12)
+
+    # A bar changed behind the rollups' back is reported, and refreshing its bucket fixes it
+    upsert_records(engine, [bar('10:10', close='100.9')], symbol='TEST', interval='5min')
+    assert verify_rollups(engine, start, end, targets=['15min'])['15min']['mismatched'] == 1
+    refresh_rollups(engine, {('TEST', '5min'): (datetime(2025, 3, 3, 10, 10),) * 2})
+    assert verify_rollups(engine, start, end, targets=['15min'])['15min']['mismatched'] == 0
+
+def test_bar_query_cache_is_invalidated_by_a_load(engine):
+    upsert_records(engine, [bar('09:30')], symbol='TEST', interval='5min')
+    with BarQuery(engine, ttl=3600) as query:
+        assert len(query.last_bars('TEST', '5min', 10)) == 1
+        assert len(query.last_bars('TEST', '5min', 10)) == 1
+        assert query.hits == 1
+
+        upsert_records(engine, [bar('09:35')], symbol='TEST', interval='5min')
+
+        assert len(query.last_bars('TEST', '5min', 10)) == 2
+
+def test_orm_fallback_load_invalidates_query_caches(engine):
+    upsert_records(engine, [bar('09:30')], symbol='TEST', interval='5min')
+    with BarQuery(engine, ttl=3600) as query:
+        assert len(query.last_bars('TEST', '5min', 10)) == 1
+        assert len(query.last_bars('TEST', '5min', 10)) == 1
+        assert query.hits == 1
+
+        orm_load_records(sessionmaker(bind=engine), [bar('09:35')], symbol='TEST', interval='5min')
+
+        assert len(query.last_bars('TEST', '5min', 10)) == 2
@@ -0,0 +1,35 @@
+import json
+import pytest
+from benchmarks.synthetic import make_intraday_payload
+from utils.process_transform import transform_raw_file
+
+PARSERS = ['json', 'stream']
+
+def settings(parser):
+    return {'engine': 'vectorized', 'parser': parser, 'stream_chunk_size': 4,
+            'default_symbol': 'IBM', 'default_interval': '5min'}
+
+def write_payload(tmp_path, bars):
+    payload = make_intraday_payload('IBM', bars, '5min', seed=1)
+    path = tmp_path / 'data_IBM_5min.json'
+    path.write_text(json.dumps(payload))
+    return path
+
+@pytest.mark.parametrize('parser', PARSERS)
+def test_bars_are_transformed(tmp_path, parser):
+    batch, rejected = transform_raw_file(str(write_payload(tmp_path, 10)), settings(parser), {})
+
+    assert (batch.symbol, batch.interval, len(batch), rejected) == ('IBM', '5min', 10, 0)
+
+@pytest.mark.parametrize('parser', PARSERS)
+def test_empty_time_series_is_an_error(tmp_path, parser):
+    with pytest.raises(ValueError, match="Missing 'Time Series \\(5min\\)'"):
+        transform_raw_file(str(write_payload(tmp_path, 0)), settings(parser), {})
+
+@pytest.mark.parametrize('parser', PARSERS)
+def test_bars_all_below_the_cutoff_give_an_empty_batch(tmp_path, parser):
+    cutoffs = {('IBM', '5min'): '2099-01-01 00:00:00'}
+
+    batch, rejected = transform_raw_file(str(write_payload(tmp_path, 10)), settings(parser), cutoffs)
+
+    assert (len(batch), rejected) == (0, 0)
@@ -0,0 +1,120 @@
+import pytest
+import json
+from utils.api_requests import ApiClient, fetch_api_data, download_api_data
+from utils.async_extract import run_extraction
+from utils.pipeline import run_pipeline
+from utils.response_cache import ResponseCache, UNCHANGED, request_key, series_digest, file_series_digest
+from utils.stream_parse import append_top_level_key
+
+PARAMS = {'function': 'TIME_SERIES_INTRADAY', 'interval': '5min', 'apikey': 'demo'}
+SYMBOLS = ['IBM', 'MSFT', 'AAPL']
+
+@pytest.fixture
+def cache_path(tmp_path):
+    return tmp_path / 'response_cache.db'
+
+def extract(mock, settings, cache, commit=True):
+    """One extraction pass; returns the symbols handed on, committing them when `commit`."""
+    handed_on = []
+
+    def on_result(symbol, data):
+        handed_on.append(symbol)
+        if commit:
+            cache.commit(request_key(dict(PARAMS, symbol=symbol)))
+
+    run_extraction(SYMBOLS, mock.endpoint, PARAMS, settings, on_result=on_result, cache=cache)
+    return sorted(handed_on)
+
+def test_unchanged_series_is_short_circuited_by_digest(mock_server, api_settings, cache_path):
+    mock = mock_server()
+    with ResponseCache(cache_path) as cache:
+        assert extract(mock, api_settings, cache) == sorted(SYMBOLS)
+        assert extract(mock, api_settings, cache) == []
+        assert mock.requests == 2 * len(SYMBOLS)
+
+        mock.revise()
+        assert extract(mock, api_settings, cache) == sorted(SYMBOLS)
+
+def test_etag_revalidation_answers_304(mock_server, api_settings, cache_path):
+    mock = mock_server(validators=True)
+    with ResponseCache(cache_path) as cache:
+        extract(mock, api_settings, cache)
+        assert extract(mock, api_settings, cache) == []
+        assert mock.not_modified == len(SYMBOLS)
+
+def test_fresh_entries_skip_the_request(mock_server, api_settings, cache_path):
+    mock = mock_server()
+    with ResponseCache(cache_path, fresh_seconds=3600) as cache:
+        extract(mock, api_settings, cache)
+        assert extract(mock, api_settings, cache) == []
+        assert mock.requests == len(SYMBOLS)
+
+def test_uncommitted_response_is_handed_on_again(mock_server, api_settings, cache_path):
+    mock = mock_server(validators=True)
+    # Downstream failed: nothing committed, so neither the digest nor a 304 may skip it
+    with ResponseCache(cache_path) as cache:
+        assert extract(mock, api_settings, cache, commit=False) == sorted(SYMBOLS)
+    with ResponseCache(cache_path) as cache:
+        assert extract(mock, api_settings, cache) == sorted(SYMBOLS)
+        assert mock.not_modified == 0
+
+def test_sync_fetch_stages_until_commit(mock_server, cache_path):
+    mock = mock_server(validators=True)
+    params = dict(PARAMS, symbol='IBM')
+    url = f"{mock.endpoint}?function=TIME_SERIES_INTRADAY&symbol=IBM&interval=5min&apikey=demo"
+    with ResponseCache(cache_path) as cache, ApiClient(log_timings=False) as client:
+        key = request_key(params)
+        assert fetch_api_data(url, 10, client=client, cache=cache, cache_key=key) is not UNCHANGED
+        assert fetch_api_data(url, 10, client=client, cache=cache, cache_key=key) is not UNCHANGED
+        cache.commit(key)
+        assert fetch_api_data(url, 10, client=client, cache=cache, cache_key=key) is UNCHANGED
+
+def test_streamed_download_goes_through_the_cache(mock_server, cache_path, tmp_path):
+    mock = mock_server()
+    key = request_key(dict(PARAMS, symbol='IBM'))
+    url = f"{mock.endpoint}?function=TIME_SERIES_INTRADAY&symbol=IBM&interval=5min&apikey=demo"
+    path = tmp_path / 'data.part'
+    with ResponseCache(cache_path) as cache, ApiClient(log_timings=False) as client:
+        # A series cached by the buffered fetch hashes the same when streamed
+        fetch_api_data(url, 10, client=client, cache=cache, cache_key=key)
+        cache.commit(key)
+        assert download_api_data(url, 10, path, client=client, cache=cache, cache_key=key) is UNCHANGED
+
+        mock.revise()
+        assert download_api_data(url, 10, path, client=client, cache=cache, cache_key=key) > 0
+        assert download_api_data(url, 10, path, client=client, cache=cache, cache_key=key) > 0
+        cache.commit(key)
+        assert download_api_data(url, 10, path, client=client, cache=cache, cache_key=key) is UNCHANGED
+
+def test_streamed_download_revalidates_with_304(mock_server, cache_path, tmp_path):
+    mock = mock_server(validators=True)
+    key = request_key(dict(PARAMS, symbol='IBM'))
+    url = f"{mock.endpoint}?function=TIME_SERIES_INTRADAY&symbol=IBM&interval=5min&apikey=demo"
+    with ResponseCache(cache_path) as cache, ApiClient(log_timings=False) as client:
+        download_api_data(url, 10, tmp_path / 'data.part', client=client, cache=cache, cache_key=key)
+        cache.commit(key)
+        assert download_api_data(url, 10, tmp_path / 'data.part', client=client, cache=cache, cache_key=key) is UNCHANGED
+        assert mock.not_modified == 1
+
+def test_extraction_time_is_added_without_changing_the_series(tmp_path):
+    path = tmp_path / 'data.json'
+    payload = {'Meta Data': {'2. Symbol': 'IBM'}, 'Time Series (5min)': {'2025-03-03 09:30:00': {'1. open': '1.5'}}}
+    path.write_text(json.dumps(payload, indent=2) + '\n')
+
+    append_top_level_key(path, 'extraction_time', '20250303_093500')
+
+    assert json.loads(path.read_text()) == dict(payload, extraction_time='20250303_093500')
+    assert file_series_digest(path) == series_digest(payload)
+
+def test_failed_pipeline_load_leaves_response_uncached(mock_server, api_settings, cache_path):
+    mock = mock_server()
+    config = {'api': dict(api_settings, endpoint=mock.endpoint, symbols=SYMBOLS,
+                          function='TIME_SERIES_INTRADAY', interval='5min')}
+    with ResponseCache(cache_path) as cache:
+        # No engine: every load fails
+        first = run_pipeline(config, None, 'demo', cache=cache)
+        second = run_pipeline(config, None, 'demo', cache=cache)
+
+    assert first['errors'] == len(SYMBOLS)
+    assert second['unchanged'] == 0
+    assert second['errors'] == len(SYMBOLS)
@@ -0,0 +1,49 @@
+from datetime import datetime
+import pytest
+import pyarrow as pa
+from utils.bar_batch import BarBatch
+from utils.rollups import bucket_sql, source_intervals, time_ranges_by_pair
+
+@pytest.mark.parametrize('target, intervals', [
+    ('15min', ['1min', '5min']),
+    ('60min', ['1min', '5min', '15min', '30min']),
+    ('daily', ['1min', '5min', '15min', '30min', '60min']),
+])
+def test_source_intervals_divide_the_target(target, intervals):
+    assert source_intervals(target) == intervals
+
+def test_bucket_sql():
+    assert bucket_sql('daily') == """date_trunc('day', "timestamp")"""
+    assert bucket_sql('60min', 'd.ts') == "date_trunc('hour', d.ts)"
+    assert bucket_sql('15min', 'd.ts') == (
+        "(date_trunc('hour', d.ts) + (floor(extract(minute FROM d.ts) / 15)::int * 15) * interval '1 minute')"
+    )
+
+EXPECTED = {
+    ('IBM', '5min'): (datetime(2025, 3, 3, 9, 30), datetime(2025, 3, 3, 9, 40)),
+    ('AAPL', '1min'): (datetime(2025, 3, 3, 9, 30), datetime(2025, 3, 3, 9, 30)),
+}
+
+def batch(symbol, interval, minutes):
+    records = [{'timestamp': datetime(2025, 3, 3, 9, minute), 'open': 1.0, 'high': 1.0, 'low': 1.0, 'close': 1.0,
+                'volume': 1} for minute in minutes]
+    return BarBatch.from_records(records, symbol, interval)
+
+def test_time_ranges_of_records():
+    records = [
+        {'timestamp': '2025-03-03 09:35:00'},
+        {'timestamp': datetime(2025, 3, 3, 9, 30)},
+        {'timestamp': '2025-03-03 09:40:00'},
+        {'timestamp': '2025-03-03 09:30:00', 'symbol': 'AAPL', 'interval': '1min'},
+        {'timestamp': None},
+    ]
+    assert time_ranges_by_pair(records, symbol='IBM', interval='5min') == EXPECTED
+
+def test_time_ranges_of_a_bar_batch():
+    assert time_ranges_by_pair(batch('IBM', '5min', (40, 30, 35))) == {('IBM', '5min'): EXPECTED[('IBM', '5min')]}
+    assert time_ranges_by_pair(BarBatch.empty('IBM', '5min')) == {}
+
+def test_time_ranges_of_an_arrow_table():
+    table = pa.concat_tables([batch('IBM', '5min', (40, 30, 35)).to_table(), batch('AAPL', '1min', (30,)).to_table()])
+
+    assert time_ranges_by_pair(table) == EXPECTED
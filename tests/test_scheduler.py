@@ -0,0 +1,26 @@
+from datetime import datetime
+import pytest
+from utils.scheduler import interval_minutes, next_trigger
+
+@pytest.mark.parametrize('now, expected', [
+    (datetime(2025, 3, 3, 9, 31, 12), datetime(2025, 3, 3, 9, 35, 5)),
+    # Between a boundary and its delayed trigger: still that boundary's trigger
+    (datetime(2025, 3, 3, 9, 35, 2), datetime(2025, 3, 3, 9, 35, 5)),
+    # Exactly on a trigger: strictly after, so the next one
+    (datetime(2025, 3, 3, 9, 35, 5), datetime(2025, 3, 3, 9, 40, 5)),
+    (datetime(2025, 3, 3, 9, 35, 5, 1), datetime(2025, 3, 3, 9, 40, 5)),
+    # Across midnight
+    (datetime(2025, 3, 3, 23, 57), datetime(2025, 3, 4, 0, 0, 5)),
+    (datetime(2025, 3, 4, 0, 0, 1), datetime(2025, 3, 4, 0, 0, 5)),
+])
+def test_next_trigger_is_aligned_to_bar_boundaries(now, expected):
+    assert next_trigger(now, 5, 5) == expected
+
+def test_next_trigger_for_hourly_bars():
+    assert next_trigger(datetime(2025, 3, 3, 9, 59, 59), 60, 0) == datetime(2025, 3, 3, 10, 0)
+    assert next_trigger(datetime(2025, 3, 3, 10, 0), 60, 0) == datetime(2025, 3, 3, 11, 0)
+
+def test_interval_minutes_rejects_non_intraday_intervals():
+    assert interval_minutes('15min') == 15
+    with pytest.raises(ValueError, match='intraday'):
+        interval_minutes('daily')
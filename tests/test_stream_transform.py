@@ -0,0 +1,60 @@
+import json
+import pytest
+import pyarrow.parquet as pq
+import main_transform
+from benchmarks.synthetic import make_intraday_payload
+from main_transform import WrittenOutput, transform_file
+
+@pytest.fixture
+def processed_dir(tmp_path, monkeypatch):
+    processed_dir = tmp_path / 'processed'
+    monkeypatch.setattr(main_transform, 'config', {'api': {'symbol': 'IBM', 'interval': '5min'},
+                                                   'directories': {'processed_data': str(processed_dir)}})
+    monkeypatch.setattr(main_transform, 'transform_engine', 'vectorized')
+    monkeypatch.setattr(main_transform, 'stream_chunk_size', 3)
+    return processed_dir
+
+@pytest.fixture
+def raw_file(tmp_path):
+    path = tmp_path / 'data_20250303_093000.json'
+    path.write_text(json.dumps(make_intraday_payload('IBM', 10, '5min', seed=1)))
+    return path
+
+def test_streamed_json_output_is_written_chunk_by_chunk(processed_dir, raw_file, monkeypatch):
+    monkeypatch.setattr(main_transform, 'parser', 'json')
+    whole, _ = transform_file(raw_file)
+    monkeypatch.setattr(main_transform, 'parser', 'stream')
+
+    output, rejected = transform_file(raw_file)
+
+    assert isinstance(output, WrittenOutput) and (len(output), rejected) == (10, 0)
+    assert output.paths == [processed_dir / 'processed_data_20250303_093000.json']
+    assert json.loads(output.paths[0].read_text()) == json.loads(json.dumps(whole, default=str))
+    assert not list(processed_dir.rglob('*.part'))
+
+def test_streamed_parquet_output_is_written_as_row_groups(processed_dir, raw_file, monkeypatch):
+    monkeypatch.setattr(main_transform, 'parser', 'stream')
+    monkeypatch.setattr(main_transform, 'output_format', 'parquet')
+
+    output, _ = transform_file(raw_file)
+
+    files = [pq.ParquetFile(path) for path in output.paths]
+    assert sum(file.metadata.num_rows for file in files) == len(output) == 10
+    assert max(file.metadata.num_row_groups for file in files) > 1
+    assert not list(processed_dir.rglob('*.part'))
+
+def test_failed_streamed_transform_leaves_no_output(processed_dir, raw_file, monkeypatch):
+    monkeypatch.setattr(main_transform, 'parser', 'stream')
+    transform_series = main_transform.transform_series
+    calls = []
+
+    def fail_on_second_chunk(*args):
+        calls.append(1)
+        if len(calls) == 2:
+            raise RuntimeError("boom")
+        return transform_series(*args)
+
+    monkeypatch.setattr(main_transform, 'transform_series', fail_on_second_chunk)
+    with pytest.raises(RuntimeError):
+        transform_file(raw_file)
+    assert not [path for path in processed_dir.rglob('*') if path.is_file()]
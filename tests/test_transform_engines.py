@@ -0,0 +1,45 @@
+import pytest
+import utils.dead_letter as dead_letter
+from benchmarks.synthetic import make_intraday_payload
+from utils.bar_batch import transform_batch
+from utils.data_validation import DEFAULT_DESCRIPTOR
+from utils.dead_letter import (
+    DeadLetterQueue, MISSING_FIELDS, BAD_TIMESTAMP, BAD_VALUE, OHLC_INVARIANT, NEGATIVE_VOLUME
+)
+
+def bar(open_, high, low, close, volume):
+    return {'1. open': open_, '2. high': high, '3. low': low, '4. close': close, '5. volume': volume}
+
+BAD_BARS = {
+    '2024-11-02 09:30:00': {'1. open': '1.0', '2. high': '1.0', '3. low': '1.0', '4. close': '1.0'},
+    '2024-11-02 09:35': bar('1.0', '1.0', '1.0', '1.0', '10'),
+    '2024-11-02 09:40:00': bar('abc', '1.0', '1.0', '1.0', '10'),
+    '2024-11-02 09:45:00': bar('nan', '1.0', '1.0', '1.0', '10'),
+    '2024-11-02 09:50:00': bar('1.0', 'inf', '1.0', '1.0', '10'),
+    '2024-11-02 09:55:00': bar('1.0', '1.0', '1.0', '1.0', '10.5'),
+    '2024-11-02 10:00:00': bar('2.0', '1.5', '1.0', '1.2', '10'),
+    '2024-11-02 10:05:00': bar('1.0', '1.5', '1.1', '1.2', '10'),
+    '2024-11-02 10:10:00': bar('1.0', '1.5', '0.5', '1.2', '-10'),
+}
+EXPECTED_CODES = {MISSING_FIELDS: 1, BAD_TIMESTAMP: 1, BAD_VALUE: 4, OHLC_INVARIANT: 2, NEGATIVE_VOLUME: 1}
+
+@pytest.fixture
+def dead_letters(monkeypatch):
+    queue = DeadLetterQueue()
+    monkeypatch.setattr(dead_letter, '_queue', queue)
+    return queue
+
+def run(engine, dead_letters):
+    time_series = dict(make_intraday_payload('IBM', 20, '5min', seed=1)['Time Series (5min)'], **BAD_BARS)
+    dead_letters.totals.clear()
+    batch, rejected = transform_batch(time_series, 'IBM', '5min', DEFAULT_DESCRIPTOR, engine)
+    codes = {code: count for (_, code), count in dead_letters.totals.items()}
+    return batch.to_records(), rejected, codes
+
+def test_both_engines_keep_and_reject_the_same_bars(dead_letters):
+    vectorized = run('vectorized', dead_letters)
+    threaded = run('threaded', dead_letters)
+
+    assert len(vectorized[0]) == 20
+    assert vectorized[1:] == (len(BAD_BARS), EXPECTED_CODES)
+    assert threaded == vectorized